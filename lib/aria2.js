@@ -1,6 +1,7 @@
 import axios from 'axios';
 import fs from 'fs';
 import path from 'path';
+import { hashFromMagnet } from './db';
 
 const ARIA2_URL = 'http://127.0.0.1:6800/jsonrpc';
 const CACHE_DIR = path.join(process.cwd(), 'torrent_cache');
@@ -41,10 +42,11 @@ async function aria2Request(method, params = []) {
 }
 
 export async function getTorrentFile(magnetLink) {
-  const match = magnetLink.match(/btih:([a-fA-F0-9]{40})/);
-  if (!match) throw new Error('Invalid magnet link format');
+  // hex или base32 в магнете — кэш всегда по 40 hex
+  const hash = hashFromMagnet(magnetLink);
+  if (!hash) throw new Error('Invalid magnet link format');
   
-  const infoHash = match[1].toLowerCase();
+  const infoHash = hash.toLowerCase();
   const filePath = path.join(CACHE_DIR, `${infoHash}.torrent`);
 
   if (fs.existsSync(filePath)) {
@@ -262,18 +262,21 @@ function getTorrentsByTmdbId(tmdbId) {
   const dbTorrents = getTorrentsDb();
   const dbData = getTorrentDataDb();
 
-  const torrents = dbTorrents.prepare(
-    'SELECT * FROM torrents WHERE tmdb_id = ? ORDER BY seeders DESC, leechers ASC'
+  // Сжатые магнеты (scripts/compact_magnets.py): в magnet — xt и dn, хвост &tr= — в tracker_sets
+  const compact = dbTorrents.prepare('PRAGMA table_info(torrents)').all().some(c => c.name === 'tracker_set');
+  const torrents = dbTorrents.prepare(compact
+    ? 'SELECT t.*, s.trackers AS trackers FROM torrents t LEFT JOIN tracker_sets s ON s.id = t.tracker_set WHERE t.tmdb_id = ? ORDER BY t.seeders DESC, t.leechers ASC'
+    : 'SELECT * FROM torrents WHERE tmdb_id = ? ORDER BY seeders DESC, leechers ASC'
   ).all(tmdbId) || [];
 
   if (torrents.length === 0) return [];
 
   const hashes = [];
-  const torrentsMap = torrents.map(t => {
-    const match = t.magnet.match(/btih:([a-fA-F0-9]{40})/);
-    const hash = match ? match[1].toUpperCase() : null;
+  const torrentsMap = torrents.map(({ trackers, tracker_set, ...t }) => {
+    // Колонка info_hash (hex и base32 уже приведены к 40 hex), у старых строк — из магнета
+    const hash = t.info_hash || hashFromMagnet(t.magnet);
     if (hash) hashes.push(hash);
-    return { ...t, info_hash: hash };
+    return { ...t, magnet: trackers ? t.magnet + trackers : t.magnet, info_hash: hash };
   });
 
   if (hashes.length === 0) return torrentsMap;
@@ -325,11 +328,32 @@ function getTorrentDetailsByInfoHash(info_hash) {
   } catch (e) { return null; }
 }
 
+// Как normalize_info_hash в scripts/torrent_merge.py: hex или base32 -> 40 hex в верхнем регистре
+const INFO_HASH_RE = /btih:([0-9a-f]{40}|[a-z2-7]{32})(?![0-9a-z])/i;
+const BASE32_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ234567';
+
+function hashFromMagnet(magnet) {
+  const match = magnet ? magnet.match(INFO_HASH_RE) : null;
+  if (!match) return null;
+  const value = match[1].toUpperCase();
+  if (value.length === 40) return value;
+  // 32 символа base32 = 160 бит = 40 hex
+  const bits = [...value].map(ch => BASE32_ALPHABET.indexOf(ch).toString(2).padStart(5, '0')).join('');
+  return bits.match(/.{4}/g).map(b => parseInt(b, 2).toString(16)).join('').toUpperCase();
+}
+
 function getAllInfoHashesFromTorrentsDb() {
-  return getTorrentsDb().prepare('SELECT DISTINCT magnet FROM torrents WHERE magnet IS NOT NULL').all().map(row => {
-    const match = row.magnet.match(/btih:([a-fA-F0-9]{40})/);
-    return match ? match[1].toUpperCase() : null;
-  }).filter(Boolean);
+  const db = getTorrentsDb();
+  const hasColumn = db.prepare('PRAGMA table_info(torrents)').all().some(c => c.name === 'info_hash');
+  if (!hasColumn) {
+    return db.prepare('SELECT DISTINCT magnet FROM torrents WHERE magnet IS NOT NULL').all()
+      .map(row => hashFromMagnet(row.magnet)).filter(Boolean);
+  }
+  // Индекс idx_torrents_info_hash: DISTINCT без разбора магнетов; строки до backfill — по-старому
+  const hashes = db.prepare('SELECT DISTINCT info_hash FROM torrents WHERE info_hash IS NOT NULL').all().map(row => row.info_hash);
+  const legacy = db.prepare('SELECT magnet FROM torrents WHERE info_hash IS NULL AND magnet IS NOT NULL').all()
+    .map(row => hashFromMagnet(row.magnet)).filter(Boolean);
+  return legacy.length ? [...new Set([...hashes, ...legacy])] : hashes;
 }
 
 function getMovieSlugsCount() {
@@ -363,7 +387,14 @@ function insertTorrentDetails(data) {
 }
 
 function getTorrentsForAnalysis(instanceId = 0, totalInstances = 1) {
-    return getTorrentsDb().prepare(`SELECT magnet, torrent_title, size, tmdb_id FROM torrents WHERE (rowid % ?) = ?`).all(totalInstances, instanceId);
+    const db = getTorrentsDb();
+    // Сжатые магнеты: полный магнет = magnet || trackers (как в getTorrentsByTmdbId), клиенту нужны анонсеры
+    const compact = db.prepare('PRAGMA table_info(torrents)').all().some(c => c.name === 'tracker_set');
+    return db.prepare(compact
+      ? `SELECT t.magnet || COALESCE(s.trackers, '') AS magnet, t.torrent_title, t.size, t.tmdb_id
+         FROM torrents t LEFT JOIN tracker_sets s ON s.id = t.tracker_set WHERE (t.rowid % ?) = ?`
+      : `SELECT magnet, torrent_title, size, tmdb_id FROM torrents WHERE (rowid % ?) = ?`
+    ).all(totalInstances, instanceId);
 }
 
 // Новые API-функции
@@ -577,7 +608,7 @@ async function fetchTrailerKey(tmdbId, lang) {
 module.exports = {
   getMovies, getMovieByIdSlug, getAllMovieSlugs, getTorrentsByTmdbId,
   getRandomMovies, getRandomMoviesByYear, searchMovies,
-  getTorrentDetailsByInfoHash, insertTorrentDetails, getAllInfoHashesFromTorrentsDb,
+  getTorrentDetailsByInfoHash, insertTorrentDetails, getAllInfoHashesFromTorrentsDb, hashFromMagnet,
   getMovieSlugsCount, getMovieSlugsPaginated, getTorrentsForAnalysis,
   getLatestUpdateDate,
   getTorrentDataDb, getTorrentsDb,
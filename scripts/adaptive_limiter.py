@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import math
+
+# --- КОНФИГУРАЦИЯ AIMD ---
+AIMD_MIN_TABS = 2             # Нижняя граница окна
+AIMD_WINDOW = 20              # Решение принимается раз в N завершенных запросов
+AIMD_TARGET_P95 = 12.0        # сек: p95 выше — трекер захлебывается, сжимаем окно
+AIMD_MAX_TIMEOUT_RATE = 0.05  # Доля таймаутов/ошибок в окне, выше — сжимаем
+AIMD_MIN_FREE_RAM_MB = 1024   # MemAvailable ниже — сжимаем, чтобы не уйти в swap/OOM
+AIMD_DECREASE = 0.7           # Мультипликативное уменьшение
+AIMD_INCREASE = 1             # Аддитивное увеличение
+
+logger = logging.getLogger(__name__)
+
+def free_ram_mb():
+    """MemAvailable из /proc/meminfo (Linux). None, если узнать нельзя."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+def percentile(values, p):
+    if not values: return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(p * len(ordered)) - 1)]
+
+class AdaptiveLimiter:
+    """
+    Замена asyncio.Semaphore в парсерах (тот же `async with`), размер которого
+    можно менять на ходу. При adaptive=True окно подбирается по AIMD:
+    +1 вкладка за спокойное окно, ×0.7 при росте p95, таймаутах или нехватке RAM.
+    """
+    def __init__(self, max_concurrent, adaptive=False, min_limit=AIMD_MIN_TABS):
+        self.max_limit = max_concurrent
+        self.min_limit = min(min_limit, max_concurrent)
+        self.adaptive = adaptive
+        # Адаптивный режим стартует с середины и сам находит потолок
+        self.limit = max(self.min_limit, max_concurrent // 2) if adaptive else max_concurrent
+        self.active = 0
+        self.saturated = False
+        self._cond = asyncio.Condition()
+        self._latencies = []
+        self._samples = 0
+        self._failures = 0
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+            if self.active >= self.limit:
+                self.saturated = True
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    async def record(self, latency, failed=False):
+        """
+        Итог одного запроса. latency=None — запрос без результатов
+        (его длительность — это таймаут ожидания магнитов, а не скорость трекера).
+        """
+        if not self.adaptive: return
+        self._samples += 1
+        if failed:
+            self._failures += 1
+        elif latency is not None:
+            self._latencies.append(latency)
+        if self._samples >= AIMD_WINDOW:
+            await self._adjust()
+
+    async def _adjust(self):
+        p95 = percentile(self._latencies, 0.95)
+        fail_rate = self._failures / self._samples
+        ram = free_ram_mb()
+
+        reasons = []
+        if p95 is not None and p95 > AIMD_TARGET_P95: reasons.append('p95')
+        if fail_rate > AIMD_MAX_TIMEOUT_RATE: reasons.append('таймауты')
+        if ram is not None and ram < AIMD_MIN_FREE_RAM_MB: reasons.append('RAM')
+
+        old = self.limit
+        if reasons:
+            self.limit = max(self.min_limit, int(self.limit * AIMD_DECREASE))
+        elif self.saturated:
+            # Растем, только если окно действительно было заполнено
+            self.limit = min(self.max_limit, self.limit + AIMD_INCREASE)
+
+        p95_str = f"{p95:.1f}с" if p95 is not None else "-"
+        ram_str = f"{ram} МБ" if ram is not None else "-"
+        log = logger.info if self.limit != old else logger.debug
+        log(
+            f"[AIMD] окно {old} -> {self.limit} (p95 {p95_str}, ошибки {fail_rate:.0%}, "
+            f"RAM {ram_str}{', сжатие: ' + ', '.join(reasons) if reasons else ''})"
+        )
+
+        self._latencies = []
+        self._samples = 0
+        self._failures = 0
+        self.saturated = False
+        if self.limit > old:
+            async with self._cond:
+                self._cond.notify(self.limit - old)
@@ -4,12 +4,17 @@ import aiosqlite
 import sqlite3
 import os
 import re
-import json
 from pathlib import Path
 from datetime import datetime
 from playwright.async_api import async_playwright
 from tqdm import tqdm
 
+from browser_watchdog import MemoryWatchdog
+from metadata_rows import DETAILS_INSERT_SQL, details_row, ensure_details_schema, info_hash_of
+from title_analyzer import AUDIO_TRACKS_DB, TitleAnalyzer
+from torrent_merge import (ensure_info_hash_column, ensure_size_column, ensure_tracker_sets, info_hash_select,
+                           merge_torrents)
+
 # --- КОНФИГУРАЦИЯ ---
 BASE_DIR = Path(os.getcwd())
 TMDB_DB_PATH = BASE_DIR / "tmdb_data" / "tmdb_minimal_no_original.db"
@@ -33,50 +38,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 logging.getLogger("aiosqlite").setLevel(logging.WARNING)
 
-# --- REGEX CONFIG ---
-REGEX_CONFIG = {
-    'resolution': {
-        'pattern': re.compile(r'\b(3840x2160|4K|2160p|1920x1080|1080p|1280x720|720p)\b', re.IGNORECASE), 
-        'type': 'resolution'
-    },
-    'audio_channels': {
-        'pattern': re.compile(r'\b(5\.1|7\.1)\b', re.IGNORECASE), 
-        'type': 'audio_channels'
-    },
-    'quality': {
-        'pattern': re.compile(r'\b(HEVC|HDR10\+|HDR10|HDR|Dolby Vision|DV|BDRemux|BluRay|Web-DL|Hybrid|IMAX)\b', re.IGNORECASE), 
-        'type': 'quality'
-    },
-    'audio_track': {
-        'pattern': re.compile(r'\b('
-                              # --- СОВРЕМЕННЫЕ СТУДИИ / РЕЛИЗ ГРУППЫ ---
-                              r'Red Head Sound|RHS|Bluebird|HDRezka|Rezka|Jaskier|'
-                              r'TVShows|NewStudio|BaibaKo|AlexFilm|LostFilm|Кубик в [Кк]убе|'
-                              r'Octopus|LineFilm|Cold Film|AlphaProject|TVG|Good People|'
-                              r'Pazl Voice|Ultradox|RuDub|Sound Film|ViruseProject|IdeaFilm|Novamedia|Кириллица|'
-                              r'Kerob|Sunshine Studio|NewComers|LakeFilms|HamsterStudio|Paramount Comedy|'
-                              r'Кураж-Бамбей|Kuraj-Bambey|Сыендук|Syenduk|'
-                              # --- АНИМЕ ---
-                              r'AniLibria|AniDUB|AnimeVost|SHIZA Project|Jam Club|Studio Band|Студийная Банда|'
-                              r'SovetRomantica|Kansai|AniStar|AniFilm|Dream Cast|AniMaunt|AniRise|Amazing Dubbing|'
-                              # --- АВТОРСКИЕ / VHS (ЛЕГЕНДЫ) ---
-                              r'Гаврилов|Михалев|Володарский|Сербин|Живов|Пучков|Гоблин|Goblin|'
-                              r'Дохалов|Визгунов|Карцев|Иванов|Санаев|Есарев|Штейн|Либерти|Вартан|Горчаков|'
-                              r'Котов|Яковлев|Гланц|Glanz|'
-                              # --- ОФИЦИАЛЬНЫЕ / ПРОФЕССИОНАЛЬНЫЕ ---
-                              r'Пифагор|Flarrow Films|FF|Videofilm|Мосфильм|Невафильм|SDI Media|ДБ|'
-                              r'Киномания|Tycoon|CPIG|Позитив|Видеосервис|Varus Video|West Video|'
-                              r'iTunes|Amedia|Netflix|'
-                              # --- ОБЩИЕ МЕТКИ ---
-                              r'Дубляж|Dub|MVO|DVO|AVO|Original|ENG|RUS|UKR'
-                              r')\b', re.IGNORECASE), 
-        'type': 'audio_lang'
-    },
-    'subtitles': {
-        'pattern': re.compile(r'Sub\s*[:(]\s*([^)]+)\)?', re.IGNORECASE), 
-        'type': 'subtitles'
-    }
-}
+# --- АНАЛИЗ НАЗВАНИЙ ---
+analyze_title = TitleAnalyzer(AUDIO_TRACKS_DB)  # Словарь этого скрипта — с меткой ДБ
 
 # --- КЛАСС ПАРСЕРА ---
 class JacredParser:
@@ -88,6 +51,10 @@ class JacredParser:
 
     async def start(self):
         self.playwright = await async_playwright().start()
+        await self.launch()
+
+    async def launch(self):
+        """Браузер и контекст поверх уже запущенного Playwright"""
         self.browser = await self.playwright.chromium.launch(
             headless=True,
             args=[
@@ -111,6 +78,12 @@ class JacredParser:
         if self.browser: await self.browser.close()
         if self.playwright: await self.playwright.stop()
 
+    async def restart(self):
+        """Пересоздание браузера для очистки памяти (Playwright не трогаем)"""
+        if self.context: await self.context.close()
+        if self.browser: await self.browser.close()
+        await self.launch()
+
     def filter_by_year(self, torrents, target_year):
         """
         Фильтруем только если год явно указан и не подходит.
@@ -227,60 +200,6 @@ class JacredParser:
                 await page.close()
 
 # --- ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ---
-def parse_size_to_bytes(size_str):
-    if not size_str: return 0
-    match = re.search(r'(\d+(\.\d+)?)\s*(GB|MB|KB|TB|ГБ|МБ|КБ|ТБ)', str(size_str), re.IGNORECASE)
-    if not match: return 0
-    val = float(match.group(1))
-    unit = match.group(3).upper().replace('ГБ','GB').replace('МБ','MB').replace('ТБ','TB').replace('КБ','KB')
-    if unit == 'TB': val *= 1024**4
-    elif unit == 'GB': val *= 1024**3
-    elif unit == 'MB': val *= 1024**2
-    elif unit == 'KB': val *= 1024
-    return int(val)
-
-def calculate_bitrate(size_bytes, runtime_minutes):
-    if not size_bytes or not runtime_minutes or runtime_minutes <= 0: return None
-    size_bits = size_bytes * 8
-    seconds = runtime_minutes * 60
-    mbps = (size_bits / seconds) / 1_000_000
-    return round(mbps, 2)
-
-def analyze_title(title):
-    if not title: return {}
-    found_tags = set()
-    result = {'resolution': 'N/A', 'audio_tags': [], 'quality_tags': [], 'hdr_type': 'SDR', 'codec': None}
-    for key, config in REGEX_CONFIG.items():
-        matches = config['pattern'].finditer(title)
-        for match in matches:
-            content = match.group(0)
-            if key == 'subtitles':
-                inner = match.group(1)
-                subs = re.split(r'[,+]', inner)
-                for s in subs:
-                    clean_tag = f"Sub: {s.strip()}"
-                    if 'rus' in s.lower(): clean_tag = "Sub: Rus"
-                    elif 'eng' in s.lower(): clean_tag = "Sub: Eng"
-                    if clean_tag.lower() not in found_tags:
-                        found_tags.add(clean_tag.lower())
-                        result['audio_tags'].append(clean_tag)
-                continue
-            clean_content = content.strip()
-            if clean_content.lower() in found_tags: continue
-            found_tags.add(clean_content.lower())
-            if config['type'] == 'resolution': result['resolution'] = clean_content
-            elif config['type'] == 'quality': result['quality_tags'].append(clean_content)
-            elif config['type'] in ['audio_lang', 'audio_channels']: result['audio_tags'].append(clean_content)
-    res = result['resolution']
-    if res and res.lower() == '4k': result['resolution'] = '4K'
-    elif not res: result['resolution'] = 'N/A'
-    quality_combined = " ".join(result['quality_tags'])
-    if re.search(r'Dolby|DV', quality_combined, re.IGNORECASE): result['hdr_type'] = 'Dolby Vision'
-    elif re.search(r'HDR', quality_combined, re.IGNORECASE): result['hdr_type'] = 'HDR'
-    if re.search(r'x265|h265|hevc', title, re.IGNORECASE): result['codec'] = 'HEVC'
-    elif re.search(r'x264|h264|avc', title, re.IGNORECASE): result['codec'] = 'H.264'
-    return result
-
 def run_local_parsing(target_tmdb_ids):
     if not target_tmdb_ids: return
     logger.info(f"⚡ Парсинг метаданных для {len(target_tmdb_ids)} фильмов...")
@@ -291,25 +210,17 @@ def run_local_parsing(target_tmdb_ids):
     conn_torrents = sqlite3.connect(TORRENTS_DB_PATH)
     conn_data = sqlite3.connect(DATA_DB_PATH)
     conn_data.execute("PRAGMA journal_mode = WAL;") 
-    conn_data.execute("""CREATE TABLE IF NOT EXISTS torrent_details (
-        info_hash TEXT PRIMARY KEY, resolution TEXT, size INTEGER, files TEXT, 
-        hdr_type TEXT, file_type TEXT, codec TEXT, bitrate REAL, audio TEXT
-    )""")
+    ensure_details_schema(conn_data)
     placeholders = ','.join('?' * len(target_tmdb_ids))
-    cursor = conn_torrents.execute(f"SELECT magnet, torrent_title, size, tmdb_id FROM torrents WHERE tmdb_id IN ({placeholders})", tuple(target_tmdb_ids))
+    cursor = conn_torrents.execute(f"SELECT magnet, torrent_title, size, tmdb_id, {info_hash_select(conn_torrents)} FROM torrents WHERE tmdb_id IN ({placeholders})", tuple(target_tmdb_ids))
     to_insert = []
     for row in cursor:
-        magnet, title, size_str, tmdb_id = row
-        hm = re.search(r'btih:([a-zA-Z0-9]{40})', magnet)
-        if not hm: continue
-        info_hash = hm.group(1).upper()
-        meta = analyze_title(title or "")
-        size_bytes = parse_size_to_bytes(size_str)
-        bitrate = calculate_bitrate(size_bytes, runtime_map.get(tmdb_id, 0))
-        audio_str = " | ".join(meta['audio_tags'])
-        to_insert.append((info_hash, meta['resolution'], size_bytes, json.dumps(['(title_parse)']), meta['hdr_type'], 'mkv', meta['codec'], bitrate, audio_str))
+        magnet, title, size_str, tmdb_id, stored_hash = row
+        info_hash = info_hash_of(magnet, stored_hash)
+        if not info_hash: continue
+        to_insert.append(details_row(info_hash, title, size_str, runtime_map.get(tmdb_id, 0), analyze_title))
     if to_insert:
-        conn_data.executemany("INSERT OR REPLACE INTO torrent_details (info_hash, resolution, size, files, hdr_type, file_type, codec, bitrate, audio) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", to_insert)
+        conn_data.executemany(DETAILS_INSERT_SQL, to_insert)
         conn_data.commit()
     conn_torrents.close()
     conn_data.close()
@@ -357,6 +268,9 @@ async def main():
     
     processed_tmdb_ids = set() 
     total_found_torrents = 0
+    # Между пачками вкладок нет (gather дождался всех) — удобная точка для перезапуска
+    watchdog = MemoryWatchdog()
+    since_restart = 0
 
     async with aiosqlite.connect(TORRENTS_DB_PATH) as db:
         await db.execute("""
@@ -373,6 +287,9 @@ async def main():
             )
         """)
         await db.execute("CREATE INDEX IF NOT EXISTS idx_tmdb_id ON torrents(tmdb_id)")
+        await ensure_size_column(db)
+        await ensure_info_hash_column(db)
+        await ensure_tracker_sets(db)
         await db.commit()
 
         with tqdm(total=len(queue), desc="Processing") as pbar:
@@ -381,39 +298,20 @@ async def main():
                 tasks = [parser.parse_movie(m['id'], m['query'], TARGET_YEAR) for m in batch]
                 results = await asyncio.gather(*tasks)
                 
-                insert_batch = []
-                delete_ids = []
-                
-                for res in results:
-                    t_id = res['tmdb_id']
-                        
-                    if res['torrents']:
-                        processed_tmdb_ids.add(t_id)
-                        delete_ids.append(t_id)
-                        total_found_torrents += len(res['torrents'])
-                        for t in res['torrents']:
-                            insert_batch.append((
-                                t_id, 
-                                t['torrent_title'], 
-                                t['magnet'], 
-                                t['seeders'], 
-                                t['leechers'], 
-                                t['size']
-                            ))
+                found = [res for res in results if res['torrents']]
+                found_ids = [res['tmdb_id'] for res in found]
+                processed_tmdb_ids.update(found_ids)
+                total_found_torrents += sum(len(res['torrents']) for res in found)
                 
-                if insert_batch:
-                    placeholders = ','.join('?' * len(delete_ids))
-                    await db.execute(f"DELETE FROM torrents WHERE tmdb_id IN ({placeholders})", tuple(delete_ids))
-                    await db.executemany("""
-                        INSERT INTO torrents (tmdb_id, torrent_title, magnet, seeders, leechers, size) 
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, insert_batch)
+                if found:
+                    # Старые раздачи фильмов заменяются найденными (дифф по info_hash, вместе с каталогом релизов)
+                    await merge_torrents(db, found)
                     await db.commit()
 
                     current_date = datetime.now().strftime('%Y-%m-%d')
                     async with aiosqlite.connect(TMDB_DB_PATH) as tmdb_db:
-                        placeholders_tmdb = ','.join('?' * len(delete_ids))
-                        params = [current_date] + delete_ids
+                        placeholders_tmdb = ','.join('?' * len(found_ids))
+                        params = [current_date] + found_ids
                         await tmdb_db.execute(
                             f"UPDATE items_minimal SET updated_at = ? WHERE id IN ({placeholders_tmdb})",
                             tuple(params)
@@ -421,7 +319,12 @@ async def main():
                         await tmdb_db.commit()
 
                 pbar.update(len(batch))
+                since_restart += len(batch)
+                if watchdog.due(since_restart):
+                    await watchdog.recycle(parser, since_restart)
+                    since_restart = 0
 
+    logger.info(watchdog.report())
     await parser.stop()
     
     logger.info(f"🏁 Завершено. Обновлено фильмов: {len(processed_tmdb_ids)}. Всего торрентов: {total_found_torrents}")
@@ -0,0 +1,102 @@
+import argparse
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from torrent_merge import INFO_HASH_INDEX_SQLS, normalize_info_hash
+
+# --- КОНФИГУРАЦИЯ ---
+# Разовое заполнение torrents.info_hash у строк, записанных до появления колонки
+# (и дозаполнение строк скриптов, которые колонку не пишут). Хеш приводится к 40 hex
+# и из base32-магнетов. Дубли хеша внутри одного фильма удаляются (остается первая
+# строка по rowid — ту же оставил бы merge_torrents при следующем слиянии), иначе
+# уникальный индекс (tmdb_id, info_hash) не построить. Индексы строятся после заполнения.
+BASE_DIR = Path(os.getcwd())
+TORRENTS_DB_PATH = BASE_DIR / "tmdb_data" / "torrents.db"
+
+CHUNK_ROWS = 50000   # rowid на одну транзакцию
+DELETE_CHUNK = 900   # Лимит переменных SQLite
+
+def ensure_column(conn):
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(torrents)")}
+    if 'info_hash' not in existing:
+        conn.execute("ALTER TABLE torrents ADD COLUMN info_hash TEXT")
+        conn.commit()
+        print("➕ Добавлена колонка torrents.info_hash")
+
+def main():
+    ap = argparse.ArgumentParser(description="Заполнить torrents.info_hash (hex/base32 -> 40 hex) и построить индексы")
+    ap.add_argument('--chunk', type=int, default=CHUNK_ROWS, help="rowid на транзакцию")
+    ap.add_argument('--dry-run', action='store_true', help="Только посчитать, ничего не менять")
+    args = ap.parse_args()
+
+    if not TORRENTS_DB_PATH.exists():
+        print(f"❌ База {TORRENTS_DB_PATH} не найдена!")
+        return
+
+    conn = sqlite3.connect(TORRENTS_DB_PATH)
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    if not args.dry_run:
+        ensure_column(conn)
+    has_column = 'info_hash' in {row[1] for row in conn.execute("PRAGMA table_info(torrents)")}
+    pending_sql = "info_hash IS NULL" if has_column else "1"
+
+    # Уже заполненные пары (фильм, хеш): новая строка с такой же парой — дубль
+    seen = set(conn.execute("SELECT tmdb_id, info_hash FROM torrents WHERE info_hash IS NOT NULL")) if has_column else set()
+    lo, hi = conn.execute("SELECT MIN(rowid), MAX(rowid) FROM torrents").fetchone()
+    pending = conn.execute(f"SELECT COUNT(*) FROM torrents WHERE {pending_sql}").fetchone()[0]
+    print(f"🚀 Строк без info_hash: {pending} (уже заполнено: {len(seen)})")
+
+    started = time.monotonic()
+    stats = {'hex': 0, 'base32': 0, 'no_hash': 0, 'duplicates': 0}
+    if lo is not None and pending:
+        for start in range(lo, hi + 1, args.chunk):
+            rows = conn.execute(
+                f"SELECT rowid, tmdb_id, magnet FROM torrents WHERE rowid >= ? AND rowid < ? AND {pending_sql} ORDER BY rowid",
+                (start, start + args.chunk)
+            ).fetchall()
+            updates, duplicates = [], []
+            for rowid, tmdb_id, magnet in rows:
+                info_hash = normalize_info_hash(magnet)
+                if not info_hash:
+                    stats['no_hash'] += 1
+                    continue
+                if (tmdb_id, info_hash) in seen:
+                    duplicates.append(rowid)
+                    continue
+                seen.add((tmdb_id, info_hash))
+                stats['base32' if info_hash not in (magnet or '').upper() else 'hex'] += 1
+                updates.append((info_hash, rowid))
+            stats['duplicates'] += len(duplicates)
+            if not args.dry_run:
+                for i in range(0, len(duplicates), DELETE_CHUNK):
+                    chunk = duplicates[i:i + DELETE_CHUNK]
+                    conn.execute(f"DELETE FROM torrents WHERE rowid IN ({','.join('?' * len(chunk))})", chunk)
+                conn.executemany("UPDATE torrents SET info_hash = ? WHERE rowid = ?", updates)
+                conn.commit()
+            elapsed = time.monotonic() - started
+            print(f"\r⚡ rowid до {min(start + args.chunk, hi + 1)} из {hi + 1} | hex: {stats['hex']} | "
+                  f"base32: {stats['base32']} | дублей: {stats['duplicates']} | без хеша: {stats['no_hash']}", end="")
+        print()
+
+    if args.dry_run:
+        print(f"🧪 Без записи. Было бы заполнено {stats['hex'] + stats['base32']}, удалено дублей {stats['duplicates']}")
+        conn.close()
+        return
+
+    t0 = time.monotonic()
+    for sql in INFO_HASH_INDEX_SQLS:
+        conn.execute(sql)
+    conn.commit()
+    conn.close()
+    print(f"✅ ГОТОВО! Заполнено: {stats['hex'] + stats['base32']} (из них base32: {stats['base32']}), "
+          f"удалено дублей: {stats['duplicates']}, без хеша: {stats['no_hash']}. "
+          f"{time.monotonic() - started:.1f} с (индексы {time.monotonic() - t0:.1f} с)")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nПрервано.")
@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import catalog_db
+from metadata_rows import calculate_bitrate
+from torrent_merge import info_hash_select, normalize_info_hash
+
+# --- КОНФИГУРАЦИЯ ---
+# Замер catalog_db против прежнего подхода "словари в Python" на настоящих базах.
+# Каждый вариант идет в отдельном процессе (пиковая память не смешивается), все изменения
+# в конце откатываются — базы не меняются. Память — пиковый RSS процесса (ru_maxrss)
+# и прирост над RSS сразу после открытия соединения.
+BASE_DIR = Path(os.getcwd())
+DELETE_CHUNK = 900   # Лимит переменных SQLite
+MOVIES = 200         # Фильмов для каскадного удаления
+VARIANTS = {
+    'year': ('year_dict', 'year_sql'),
+    'bitrate': ('bitrate_dict', 'bitrate_sql'),
+    'cascade': ('cascade_dict', 'cascade_sql'),
+}
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def delete_chunked(conn, sql, ids):
+    deleted = 0
+    for i in range(0, len(ids), DELETE_CHUNK):
+        chunk = ids[i:i + DELETE_CHUNK]
+        deleted += conn.execute(sql.format(','.join('?' * len(chunk))), chunk).rowcount
+    return deleted
+
+# --- ВАРИАНТЫ: СЛОВАРИ (как было в cleand.py / reparse_all.py / clean_movie.py) ---
+def year_dict(conn, _):
+    movie_years = {r[0]: str(r[1]) for r in conn.execute("SELECT id, year FROM tmdb.items_minimal WHERE year IS NOT NULL")}
+    ids_to_delete = []
+    for t_id, tmdb_id, title in conn.execute("SELECT id, tmdb_id, torrent_title FROM torrents").fetchall():
+        target_year = movie_years.get(tmdb_id)
+        if not target_year or title is None or target_year in title: continue
+        try:
+            year_int = int(target_year)
+            if str(year_int + 1) in title or str(year_int - 1) in title: continue
+        except ValueError:
+            pass
+        ids_to_delete.append(t_id)
+    return delete_chunked(conn, "DELETE FROM torrents WHERE id IN ({})", ids_to_delete)
+
+def bitrate_dict(conn, _):
+    runtime_map = {r[0]: r[1] for r in conn.execute("SELECT id, runtime FROM tmdb.items_minimal WHERE runtime IS NOT NULL")}
+    runtime_of = {}
+    for magnet, stored, tmdb_id in conn.execute(
+            f"SELECT magnet, {info_hash_select(conn)}, tmdb_id FROM torrents ORDER BY rowid").fetchall():
+        info_hash = stored or normalize_info_hash(magnet)
+        if info_hash: runtime_of[info_hash] = runtime_map.get(tmdb_id, 0)
+    updates = []
+    for info_hash, size, bitrate in conn.execute("SELECT info_hash, size, bitrate FROM data.torrent_details").fetchall():
+        if info_hash not in runtime_of: continue
+        new = calculate_bitrate(size, runtime_of[info_hash])
+        if new != bitrate: updates.append((new, info_hash))
+    conn.executemany("UPDATE data.torrent_details SET bitrate = ? WHERE info_hash = ?", updates)
+    return len(updates)
+
+def cascade_dict(conn, movies):
+    torrents = details = 0
+    h = info_hash_select(conn)
+    for tmdb_id in movies:
+        hashes = [stored or normalize_info_hash(magnet) for magnet, stored in
+                  conn.execute(f"SELECT magnet, {h} FROM torrents WHERE tmdb_id = ?", (tmdb_id,))]
+        details += delete_chunked(conn, "DELETE FROM data.torrent_details WHERE info_hash IN ({})", [x for x in hashes if x])
+        torrents += conn.execute("DELETE FROM torrents WHERE tmdb_id = ?", (tmdb_id,)).rowcount
+    return torrents, details
+
+# --- ВАРИАНТЫ: ОДИН ЗАПРОС (catalog_db) ---
+def year_sql(conn, _):
+    return catalog_db.delete_year_mismatches(conn)
+
+def bitrate_sql(conn, _):
+    return catalog_db.refresh_bitrates(conn)
+
+def cascade_sql(conn, movies):
+    return catalog_db.delete_movies(conn, movies)
+
+def run_variant(name, movies):
+    """Выполняется в дочернем процессе: результат — одна строка JSON"""
+    conn = catalog_db.connect()
+    conn.execute("SELECT COUNT(*) FROM tmdb.items_minimal").fetchone()
+    base = rss_mb()
+    started = time.perf_counter()
+    result = globals()[name](conn, movies)
+    elapsed = time.perf_counter() - started
+    peak = rss_mb()
+    conn.rollback()
+    conn.close()
+    print(json.dumps({'name': name, 'time': elapsed, 'peak': peak, 'delta': peak - base, 'result': result}))
+
+def spawn(name, movies):
+    cmd = [sys.executable, __file__, '--variant', name, '--movie-ids', ','.join(map(str, movies))]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    ap = argparse.ArgumentParser(description="Замер catalog_db (ATTACH + один запрос) против словарей в Python")
+    ap.add_argument('--only', choices=list(VARIANTS), action='append', help="Только эти операции")
+    ap.add_argument('--movies', type=int, default=MOVIES, help="Фильмов для каскадного удаления")
+    ap.add_argument('--variant', help=argparse.SUPPRESS)
+    ap.add_argument('--movie-ids', default='', help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, [int(x) for x in args.movie_ids.split(',') if x])
+        return
+
+    if not catalog_db.TORRENTS_DB_PATH.exists() or not catalog_db.TMDB_DB_PATH.exists():
+        print("❌ Базы не найдены (запускать из корня проекта)")
+        return
+    with catalog_db.connect(readonly=True) as conn:
+        has_data = 'data' in catalog_db.attached(conn)
+        movies = [r[0] for r in conn.execute(
+            "SELECT tmdb_id FROM torrents GROUP BY tmdb_id ORDER BY COUNT(*) DESC LIMIT ?", (args.movies,))]
+        total = conn.execute("SELECT COUNT(*) FROM torrents").fetchone()[0]
+    print(f"🧪 Раздач: {total}, фильмов для каскада: {len(movies)}. Все изменения откатываются.")
+
+    print(f"{'вариант':<14}{'время, с':>10}{'пик RSS, МБ':>13}{'прирост, МБ':>13}   результат")
+    for op in args.only or list(VARIANTS):
+        if op != 'year' and not has_data:
+            print(f"⚠️ {op}: нет torrents_data.db — пропуск")
+            continue
+        rows = [spawn(name, movies) for name in VARIANTS[op]]
+        for r in rows:
+            print(f"{r['name']:<14}{r['time']:>10.2f}{r['peak']:>13.1f}{r['delta']:>13.1f}   {r['result']}")
+        old, new = rows
+        note = "" if old['result'] == new['result'] else " ⚠️ результаты расходятся"
+        if op == 'cascade' and old['result'][0] == new['result'][0]:
+            note = " (метаданные общих с другими фильмами хешей catalog_db оставляет)"
+        print(f"   ∟ {op}: ×{old['time'] / new['time']:.1f} по времени, "
+              f"память {new['delta'] - old['delta']:+.1f} МБ{note}")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nПрервано.")
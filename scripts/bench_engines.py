@@ -0,0 +1,190 @@
+import asyncio
+import argparse
+import json
+import sqlite3
+import threading
+import time
+import os
+from pathlib import Path
+
+from adaptive_limiter import percentile
+from jacred_fixture_server import FIXTURES_DIR, create_server, load_fixture, synthetic_results
+from torrent_merge import torrent_key
+
+# --- КОНФИГУРАЦИЯ ---
+BASE_DIR = Path(os.getcwd())
+TMDB_DB_PATH = BASE_DIR / "tmdb_data" / "tmdb_minimal_no_original.db"
+SYNTHETIC = 50                      # Раздач на запрос у встроенного сервера без фикстур
+DEFAULT_CONFIGS = "browser,browser:extract=walk,browser:wait=fixed,http"
+DIFF_FIELDS = ('torrent_title', 'seeders', 'leechers', 'size')
+RESULTS_LIMIT = 50
+
+def load_queries(count):
+    """Запросы как в updat.py (kpID или название). Без базы — синтетические kpN."""
+    queries = []
+    if TMDB_DB_PATH.exists():
+        with sqlite3.connect(TMDB_DB_PATH) as conn:
+            rows = conn.execute(
+                "SELECT id, title, kp_id, year FROM items_minimal ORDER BY updated_at ASC LIMIT ?", (count,)
+            ).fetchall()
+        for tmdb_id, title, kp_id, year in rows:
+            if kp_id: queries.append((tmdb_id, f"kp{kp_id}", year))
+            elif title: queries.append((tmdb_id, title, year))
+    if not queries:
+        queries = [(i, f"kp{1000 + i}", None) for i in range(count)]
+    return queries
+
+def load_recorded_queries(fixtures_dir, count):
+    """Набор запросов, записанный jacred_recorder.py (index.json)"""
+    with open(Path(fixtures_dir) / "index.json", encoding='utf-8') as f:
+        entries = json.load(f)
+    return [(e['tmdb_id'], e['query'], e['year']) for e in entries[:count]]
+
+# --- КОНФИГУРАЦИИ ---
+def parse_config(spec, default_tabs):
+    """'browser:tabs=20:wait=fixed:extract=rows' -> словарь конфигурации"""
+    engine, *opts = spec.split(':')
+    if engine not in ('browser', 'http'):
+        raise SystemExit(f"Неизвестный движок '{engine}' в '{spec}'")
+    cfg = {'engine': engine, 'tabs': default_tabs, 'wait': 'ready', 'extract': 'rows'}
+    for opt in opts:
+        key, _, value = opt.partition('=')
+        if key not in cfg or key == 'engine':
+            raise SystemExit(f"Неизвестный параметр конфигурации '{key}' в '{spec}'")
+        cfg[key] = int(value) if key == 'tabs' else value
+    if engine == 'http':
+        cfg['label'] = f"http/{cfg['tabs']}"
+    else:
+        cfg['label'] = f"browser/{cfg['tabs']}/{cfg['wait']}/{cfg['extract']}"
+    return cfg
+
+def create_engine(cfg, base_url):
+    if cfg['engine'] == 'http':
+        from jacred_http import JacredHttpParser
+        return JacredHttpParser(max_concurrent=cfg['tabs'], base_url=base_url)
+    from jacred_browser import JacredParser
+    return JacredParser(max_concurrent=cfg['tabs'], base_url=base_url, wait=cfg['wait'], extractor=cfg['extract'])
+
+async def run_config(cfg, queries, base_url):
+    """Прогон одной конфигурации: (время, задержки по запросам, результаты)"""
+    parser = create_engine(cfg, base_url)
+    # Свой семафор того же размера: задержка меряется с момента, когда запрос получил вкладку
+    sem = asyncio.Semaphore(cfg['tabs'])
+    latencies = []
+
+    async def one(q):
+        async with sem:
+            started = time.perf_counter()
+            res = await parser.parse_movie(q[0], q[1], q[2])
+            latencies.append(time.perf_counter() - started)
+            return res
+
+    await parser.start()
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*[one(q) for q in queries])
+        elapsed = time.perf_counter() - start
+    finally:
+        await parser.stop()
+    return elapsed, latencies, results
+
+# --- ЭТАЛОН И ДИФФЫ ---
+def expected_torrents(reference, fixtures_dir, synthetic, query, year):
+    """Что должен вернуть идеальный экстрактор: ответ API после тех же лимита и фильтра по году"""
+    from jacred_http import convert_item
+    raw = load_fixture(fixtures_dir, query)
+    if raw is None:
+        raw = synthetic_results(query, synthetic) if synthetic else []
+    torrents = [t for t in (convert_item(item) for item in raw) if t][:RESULTS_LIMIT]
+    return reference.filter_by_year(torrents, year)
+
+def diff_results(expected, got):
+    """(пропущенные ключи, лишние ключи, расхождения по полям) для одного запроса"""
+    exp = {torrent_key(t['magnet']): t for t in expected}
+    act = {torrent_key(t['magnet']): t for t in got}
+    missing = [k for k in exp if k not in act]
+    extra = [k for k in act if k not in exp]
+    mismatched = []
+    for k in exp.keys() & act.keys():
+        for f in DIFF_FIELDS:
+            if exp[k][f] != act[k][f]:
+                mismatched.append((k, f, exp[k][f], act[k][f]))
+    return missing, extra, mismatched
+
+async def main():
+    ap = argparse.ArgumentParser(description="Замер движков парсера на локальных фикстурах: скорость, задержки, дифф извлечения")
+    ap.add_argument('--configs', default=None,
+                    help=f"Через запятую: engine[:tabs=N][:wait=ready|fixed][:extract=имя] (по умолчанию {DEFAULT_CONFIGS})")
+    ap.add_argument('--engines', default=None, help="Краткая форма --configs: просто список движков")
+    ap.add_argument('--count', type=int, default=200, help="Сколько фильмов прогнать через каждую конфигурацию")
+    ap.add_argument('--concurrency', type=int, default=40, help="Вкладок по умолчанию, если в конфигурации нет tabs=")
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--delay-ms', type=int, default=150, help="Задержка API фикстур (имитация трекера)")
+    ap.add_argument('--fixtures', default=str(FIXTURES_DIR))
+    ap.add_argument('--replay', action='store_true',
+                    help="Только записанные фикстуры и их набор запросов (index.json рекордера)")
+    ap.add_argument('--show-diffs', type=int, default=3, help="Сколько примеров расхождений печатать на конфигурацию")
+    ap.add_argument('--base-url', default=None, help="Внешний сервер вместо встроенного (например, живой трекер)")
+    args = ap.parse_args()
+
+    specs = args.configs or args.engines or DEFAULT_CONFIGS
+    configs = [parse_config(s.strip(), args.concurrency) for s in specs.split(',') if s.strip()]
+    synthetic = 0 if args.replay else SYNTHETIC
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = create_server(port=args.port, fixtures_dir=args.fixtures, delay_ms=args.delay_ms, synthetic=synthetic)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    queries = load_recorded_queries(args.fixtures, args.count) if args.replay else load_queries(args.count)
+    # Эталон известен только для встроенного сервера: он отдает ровно то, что лежит в фикстурах
+    expected = None
+    if server:
+        from jacred_http import JacredHttpParser
+        reference = JacredHttpParser(max_concurrent=1)
+        expected = [expected_torrents(reference, args.fixtures, synthetic, q[1], q[2]) for q in queries]
+
+    print(f"📊 {len(queries)} запросов, сервер: {base_url}{' (воспроизведение)' if args.replay else ''}")
+    print(f"{'конфигурация':<28}{'время, с':>9}{'фильм/с':>9}{'p50, с':>8}{'p99, с':>8}{'раздач':>8}"
+          f"{'пропущ':>8}{'лишних':>8}{'поля':>6}{'запр.≠':>8}")
+    try:
+        for cfg in configs:
+            elapsed, latencies, results = await run_config(cfg, queries, base_url)
+            found = sum(len(r['torrents']) for r in results)
+            line = (f"{cfg['label']:<28}{elapsed:>9.1f}{len(queries) / elapsed:>9.2f}"
+                    f"{percentile(latencies, 0.5):>8.2f}{percentile(latencies, 0.99):>8.2f}{found:>8}")
+            if expected is None:
+                print(line + f"{'-':>8}{'-':>8}{'-':>6}{'-':>8}")
+                continue
+
+            by_id = {r['tmdb_id']: r['torrents'] for r in results}
+            missing = extra = fields = bad_queries = 0
+            examples = []
+            for q, exp in zip(queries, expected):
+                m, e, f = diff_results(exp, by_id.get(q[0], []))
+                missing += len(m)
+                extra += len(e)
+                fields += len(f)
+                if m or e or f:
+                    bad_queries += 1
+                    if len(examples) < args.show_diffs:
+                        examples.append((q[1], m, e, f))
+            print(line + f"{missing:>8}{extra:>8}{fields:>6}{bad_queries:>8}")
+            for query, m, e, f in examples:
+                detail = [f"пропущено {len(m)}", f"лишних {len(e)}"]
+                detail += [f"{field}: '{want}' != '{got}'" for _, field, want, got in f[:3]]
+                print(f"    ↳ '{query}': " + ", ".join(detail))
+    finally:
+        if server:
+            s = server.stats
+            print(f"🧪 Сервер: фикстур {s['hits']}, синтетики {s['synthetic']}, промахов {s['misses']}")
+            server.shutdown()
+            server.server_close()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nПрервано.")
@@ -0,0 +1,176 @@
+import asyncio
+import argparse
+import html
+import re
+import time
+from pathlib import Path
+from playwright.async_api import async_playwright
+
+from adaptive_limiter import percentile
+from bench_engines import diff_results
+from jacred_browser import EXTRACTORS, RESULTS_LIMIT, ROWS_EXTRACT_JS, rows_to_torrents
+from jacred_fixture_server import FIXTURES_DIR, synthetic_results
+
+# --- КОНФИГУРАЦИЯ ---
+REPEAT = 20             # Прогонов каждого экстрактора на странице
+SYNTHETIC_PAGES = 20    # Страниц, если записанных (<sha1>.html рекордера) нет
+NOISE_DIVS = 1500       # "Обвязка" синтетической страницы: меню, фильтры, подвал — как у живого сайта
+
+# Старый экстрактор update.py / parser.py: фильтр ВСЕХ div по innerText (для сравнения)
+DIVS_EXTRACT_JS = '''([limit, yearStr]) => {
+    const allDivs = Array.from(document.querySelectorAll('div'));
+    const rows = allDivs.filter(div => {
+        const text = div.innerText || "";
+        return text.includes("GB") || text.includes("ГБ") || text.includes("MB") || text.includes("МБ");
+    });
+    const data = [];
+    const processedMagnets = new Set();
+    let count = 0;
+    for (const el of rows) {
+        if (count >= limit) break;
+        const magnetEl = el.querySelector('a[href^="magnet:"]');
+        if (!magnetEl) continue;
+        const magnet = magnetEl.href;
+        if (processedMagnets.has(magnet)) continue;
+        processedMagnets.add(magnet);
+        const links = Array.from(el.querySelectorAll('a'));
+        const sourceLink = links.find(a => !a.href.startsWith('magnet:') && a.innerText.trim().length > 0);
+        let url = "";
+        let title = "No Title";
+        if (sourceLink) {
+            url = sourceLink.href;
+            title = sourceLink.innerText.trim();
+        } else {
+            title = el.innerText.split('\\n')[0];
+        }
+        if (yearStr && !title.includes(yearStr)) continue;
+        const text = el.innerText;
+        let size = "0 MB";
+        const sizeMatch = text.match(/(\\d+(\\.\\d+)?)\\s*(GB|MB|ГБ|МБ|TB|ТБ)/i);
+        if (sizeMatch) size = sizeMatch[0];
+        let seeders = 0;
+        let leechers = 0;
+        const seedMatch = text.match(/(?:↑|⬆)\\s*(\\d+)/);
+        const leechMatch = text.match(/(?:↓|⬇)\\s*(\\d+)/);
+        if (seedMatch) seeders = parseInt(seedMatch[1]);
+        if (leechMatch) leechers = parseInt(leechMatch[1]);
+        data.push({torrent_title: title, magnet: magnet, seeders: seeders, leechers: leechers, size: size, url: url});
+        count++;
+    }
+    return data;
+}'''
+
+BENCH_EXTRACTORS = {'divs': DIVS_EXTRACT_JS, **EXTRACTORS}
+
+# Время внутри страницы и размер ответа (то, что сериализуется обратно в Python)
+TIMED_JS = '''([src, arg]) => {
+    const fn = (0, eval)('(' + src + ')');
+    const started = performance.now();
+    const out = fn(arg);
+    return [performance.now() - started, JSON.stringify(out).length];
+}'''
+# Инвалидация стилей перед каждым прогоном: на живой странице результаты только что
+# вставлены, и первый innerText платит за полный layout.
+DIRTY_CSS = ".bench-dirty * { letter-spacing: 0.01px; }"
+DIRTY_JS = "() => { document.body.classList.toggle('bench-dirty'); }"
+
+# --- СТРАНИЦЫ ---
+def render_page(items, noise=NOISE_DIVS):
+    """Статическая страница результатов в разметке jacred_fixture_server плюс шум из div"""
+    rows = ''.join(
+        f'<div class="webResult-item"><div class="h2"><a href="{html.escape(t["url"])}">{html.escape(t["title"])}</a></div>'
+        f'<div class="webResult-info"><span>{t["sizeName"]}</span> <span>↑ {t["sid"]}</span> '
+        f'<span>↓ {t["pir"]}</span> <a href="{html.escape(t["magnet"])}">magnet</a></div></div>'
+        for t in items
+    )
+    chrome = ''.join(f'<div class="nav-item"><div><span>Раздел {i}</span></div></div>' for i in range(noise))
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"></head><body>'
+            f'<div class="header">{chrome}</div><div id="results">{rows}</div></body></html>')
+
+def load_pages(fixtures_dir, limit, synthetic):
+    """Записанные страницы (без <script>, чтобы сайт не перерисовал DOM) или синтетика"""
+    pages = []
+    for path in sorted(Path(fixtures_dir).glob('*.html'))[:limit]:
+        text = path.read_text(encoding='utf-8')
+        pages.append(re.sub(r'<script\b.*?</script>', '', text, flags=re.S | re.I))
+    if not pages:
+        for i in range(synthetic):
+            pages.append(render_page(synthetic_results(f"kp{1000 + i}", RESULTS_LIMIT)))
+    return pages
+
+# --- ЗАМЕР ---
+async def measure(page, name, repeat):
+    """(мс внутри страницы, мс с сериализацией, байт ответа, торренты) для одного экстрактора"""
+    js = BENCH_EXTRACTORS[name]
+    arg = [RESULTS_LIMIT, '']
+    in_page, round_trip = [], []
+    size = 0
+    out = None
+    for _ in range(repeat):
+        await page.evaluate(DIRTY_JS)
+        ms, size = await page.evaluate(TIMED_JS, [js, arg])
+        in_page.append(ms)
+        await page.evaluate(DIRTY_JS)
+        started = time.perf_counter()
+        out = await page.evaluate(js, arg)
+        round_trip.append((time.perf_counter() - started) * 1000)
+    torrents = rows_to_torrents(out) if js is ROWS_EXTRACT_JS else out
+    return in_page, round_trip, size, torrents
+
+async def main():
+    ap = argparse.ArgumentParser(description="Микро-бенчмарк JS-экстракторов на сохраненных страницах результатов")
+    ap.add_argument('--fixtures', default=str(FIXTURES_DIR), help="Папка со страницами <sha1>.html от jacred_recorder.py --pages")
+    ap.add_argument('--pages', type=int, default=50, help="Максимум страниц")
+    ap.add_argument('--repeat', type=int, default=REPEAT)
+    ap.add_argument('--extractors', default=','.join(BENCH_EXTRACTORS))
+    ap.add_argument('--reference', default='walk', help="С чьим результатом сравнивать остальные")
+    args = ap.parse_args()
+
+    names = [n.strip() for n in args.extractors.split(',') if n.strip()]
+    pages = load_pages(args.fixtures, args.pages, SYNTHETIC_PAGES)
+    print(f"🧪 Страниц: {len(pages)}, прогонов на страницу: {args.repeat}, эталон: {args.reference}")
+
+    stats = {n: {'in_page': [], 'round_trip': [], 'bytes': 0, 'rows': 0, 'diffs': 0} for n in names}
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=['--no-sandbox', '--disable-gpu'])
+        page = await browser.new_page(viewport={'width': 1920, 'height': 1080})
+        # Страницы открываются без сети: только сохраненный DOM
+        await page.route('**/*', lambda route: route.abort())
+        try:
+            for content in pages:
+                await page.set_content(content, wait_until='domcontentloaded')
+                await page.add_style_tag(content=DIRTY_CSS)
+                outputs = {}
+                for name in names:
+                    in_page, round_trip, size, torrents = await measure(page, name, args.repeat)
+                    s = stats[name]
+                    s['in_page'] += in_page
+                    s['round_trip'] += round_trip
+                    s['bytes'] += size
+                    s['rows'] += len(torrents)
+                    outputs[name] = torrents
+                ref = outputs.get(args.reference)
+                if ref is None: continue
+                for name, torrents in outputs.items():
+                    missing, extra, fields = diff_results(ref, torrents)
+                    stats[name]['diffs'] += len(missing) + len(extra) + len(fields)
+        finally:
+            await browser.close()
+
+    base = stats[names[0]]['in_page']
+    base_ms = sum(base) / len(base) if base else 0
+    print(f"{'экстрактор':<12}{'внутри, мс':>12}{'p50':>8}{'p99':>8}{'evaluate, мс':>14}{'ответ, КБ':>11}"
+          f"{'строк':>8}{'дифф':>7}{'ускорение':>11}")
+    for name in names:
+        s = stats[name]
+        mean = sum(s['in_page']) / len(s['in_page'])
+        rt = sum(s['round_trip']) / len(s['round_trip'])
+        speedup = f"×{base_ms / mean:.1f}" if mean else "-"
+        print(f"{name:<12}{mean:>12.2f}{percentile(s['in_page'], 0.5):>8.2f}{percentile(s['in_page'], 0.99):>8.2f}"
+              f"{rt:>14.2f}{s['bytes'] / len(pages) / 1024:>11.1f}{s['rows']:>8}{s['diffs']:>7}{speedup:>11}")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nПрервано.")
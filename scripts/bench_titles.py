@@ -0,0 +1,169 @@
+import argparse
+import os
+import random
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+from title_analyzer import AUDIO_CHANNELS, AUDIO_TRACKS, AUDIO_TRACKS_DB, QUALITY, RESOLUTIONS, TitleAnalyzer
+
+# --- КОНФИГУРАЦИЯ ---
+BASE_DIR = Path(os.getcwd())
+TORRENTS_DB_PATH = BASE_DIR / "tmdb_data" / "torrents.db"
+REPEAT = 3
+
+# Прежние REGEX_CONFIG и analyze_title (копия из updat.py до перехода на title_analyzer.py) — эталон и база для замера
+LEGACY_CONFIG = {
+    'resolution': {
+        'pattern': re.compile(r'\b(3840x2160|4K|2160p|1920x1080|1080p|1280x720|720p)\b', re.IGNORECASE), 
+        'type': 'resolution'
+    },
+    'audio_channels': {
+        'pattern': re.compile(r'\b(5\.1|7\.1)\b', re.IGNORECASE), 
+        'type': 'audio_channels'
+    },
+    'quality': {
+        'pattern': re.compile(r'\b(HEVC|HDR10\+|HDR10|HDR|Dolby Vision|DV|BDRemux|BluRay|Web-DL|Hybrid|IMAX)\b', re.IGNORECASE), 
+        'type': 'quality'
+    },
+    'audio_track': {
+        'pattern': re.compile(r'\b('
+                              # --- СОВРЕМЕННЫЕ СТУДИИ / РЕЛИЗ ГРУППЫ ---
+                              r'Red Head Sound|RHS|Bluebird|HDRezka|Rezka|Jaskier|'
+                              r'TVShows|NewStudio|BaibaKo|AlexFilm|LostFilm|Кубик в [Кк]убе|'
+                              r'Octopus|LineFilm|Cold Film|AlphaProject|TVG|Good People|'
+                              r'Pazl Voice|Ultradox|RuDub|Sound Film|ViruseProject|IdeaFilm|Novamedia|Кириллица|'
+                              r'Kerob|Sunshine Studio|NewComers|LakeFilms|HamsterStudio|Paramount Comedy|'
+                              r'Кураж-Бамбей|Kuraj-Bambey|Сыендук|Syenduk|'
+                              # --- АНИМЕ ---
+                              r'AniLibria|AniDUB|AnimeVost|SHIZA Project|Jam Club|Studio Band|Студийная Банда|'
+                              r'SovetRomantica|Kansai|AniStar|AniFilm|Dream Cast|AniMaunt|AniRise|Amazing Dubbing|'
+                              # --- АВТОРСКИЕ / VHS (ЛЕГЕНДЫ) ---
+                              r'Гаврилов|Михалев|Володарский|Сербин|Живов|Пучков|Гоблин|Goblin|'
+                              r'Дохалов|Визгунов|Карцев|Иванов|Санаев|Есарев|Штейн|Либерти|Вартан|Горчаков|'
+                              r'Котов|Яковлев|Гланц|Glanz|'
+                              # --- ОФИЦИАЛЬНЫЕ / ПРОФЕССИОНАЛЬНЫЕ ---
+                              r'Пифагор|Flarrow Films|FF|Videofilm|Мосфильм|Невафильм|SDI Media|'
+                              r'Киномания|Tycoon|CPIG|Позитив|Видеосервис|Varus Video|West Video|'
+                              r'iTunes|Amedia|Netflix|'
+                              # --- ОБЩИЕ МЕТКИ ---
+                              r'Дубляж|Dub|MVO|DVO|AVO|Original|ENG|RUS|UKR'
+                              r')\b', re.IGNORECASE), 
+        'type': 'audio_lang'
+    },
+    'subtitles': {
+        'pattern': re.compile(r'Sub\s*[:(]\s*([^)]+)\)?', re.IGNORECASE), 
+        'type': 'subtitles'
+    }
+}
+
+# Вариант auto_update_2025.py / fill_missing_metadata.py / 1.py: та же регулярка с меткой ДБ
+LEGACY_CONFIG_DB = dict(LEGACY_CONFIG, audio_track={
+    'pattern': re.compile(LEGACY_CONFIG['audio_track']['pattern'].pattern.replace('SDI Media|', 'SDI Media|ДБ|'), re.IGNORECASE),
+    'type': 'audio_lang'
+})
+
+def legacy_analyze_title(title, REGEX_CONFIG):
+    if not title: return {}
+    found_tags = set()
+    result = {'resolution': 'N/A', 'audio_tags': [], 'quality_tags': [], 'hdr_type': 'SDR', 'codec': None}
+    for key, config in REGEX_CONFIG.items():
+        matches = config['pattern'].finditer(title)
+        for match in matches:
+            content = match.group(0)
+            if key == 'subtitles':
+                inner = match.group(1)
+                subs = re.split(r'[,+]', inner)
+                for s in subs:
+                    clean_tag = f"Sub: {s.strip()}"
+                    if 'rus' in s.lower(): clean_tag = "Sub: Rus"
+                    elif 'eng' in s.lower(): clean_tag = "Sub: Eng"
+                    if clean_tag.lower() not in found_tags:
+                        found_tags.add(clean_tag.lower())
+                        result['audio_tags'].append(clean_tag)
+                continue
+            clean_content = content.strip()
+            if clean_content.lower() in found_tags: continue
+            found_tags.add(clean_content.lower())
+            if config['type'] == 'resolution': result['resolution'] = clean_content
+            elif config['type'] == 'quality': result['quality_tags'].append(clean_content)
+            elif config['type'] in ['audio_lang', 'audio_channels']: result['audio_tags'].append(clean_content)
+    res = result['resolution']
+    if res and res.lower() == '4k': result['resolution'] = '4K'
+    elif not res: result['resolution'] = 'N/A'
+    quality_combined = " ".join(result['quality_tags'])
+    if re.search(r'Dolby|DV', quality_combined, re.IGNORECASE): result['hdr_type'] = 'Dolby Vision'
+    elif re.search(r'HDR', quality_combined, re.IGNORECASE): result['hdr_type'] = 'HDR'
+    if re.search(r'x265|h265|hevc', title, re.IGNORECASE): result['codec'] = 'HEVC'
+    elif re.search(r'x264|h264|avc', title, re.IGNORECASE): result['codec'] = 'H.264'
+    return result
+
+# --- НАЗВАНИЯ ---
+# Крайние случаи, которые проверяются всегда: "Sub" без текста субтитров после ":" / "("
+EDGE_TITLES = [
+    'Фильм (2024) WEB-DL 1080p Sub:', 'Фильм (2024) WEB-DL 1080p (Sub:)', 'Фильм (2024) Sub()',
+    'Фильм Sub: ', 'Sub(', 'Sub:)', 'Sub:) Sub: rus', 'MVO Sub() Sub(Eng)', 'sub:sub:rus', 'Sub: )(Sub:Eng)',
+]
+
+def load_titles(db_path, limit):
+    """Все непустые названия из torrents (как их видит run_local_parsing)"""
+    if not Path(db_path).exists(): return []
+    sql = "SELECT torrent_title FROM torrents WHERE torrent_title IS NOT NULL AND torrent_title != ''"
+    with sqlite3.connect(db_path) as conn:
+        if limit: return [r[0] for r in conn.execute(sql + " LIMIT ?", (limit,))]
+        return [r[0] for r in conn.execute(sql)]
+
+def synthetic_titles(count, seed=0):
+    """Случайные названия из словарей вперемешку с шумом: перекрытия, регистр, Sub(...) без скобки и без текста"""
+    rnd = random.Random(seed)
+    vocab = RESOLUTIONS + AUDIO_CHANNELS + QUALITY + AUDIO_TRACKS_DB + ['Кубик в кубе']
+    noise = ['Фильм', 'Movie', '(2024)', '|', '/', 'x264', 'x265', 'AVC', 'h.264', 'HDRezka', 'DVO-DV',
+             'Sub: rus, eng', 'Sub(Rus+Ukr)', 'Sub:Eng', 'Sub:', 'Sub()', '(Sub:)', '[', ']', 'Web-DLRip', '4k', 'hdr10+', 'MVO(RHS)', 'ДБ']
+    titles = []
+    for _ in range(count):
+        words = [rnd.choice(vocab if rnd.random() < 0.5 else noise) for _ in range(rnd.randint(1, 14))]
+        if rnd.random() < 0.3: words = [w.upper() if rnd.random() < 0.5 else w.lower() for w in words]
+        titles.append(rnd.choice([' ', ' | ', ', ', '']).join(words))
+    return titles
+
+def measure(fn, titles, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for t in titles: fn(t)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser(description="Замер analyze_title: прежние пять проходов против одного прохода title_analyzer")
+    ap.add_argument('--db', default=str(TORRENTS_DB_PATH))
+    ap.add_argument('--limit', type=int, default=0, help="Максимум названий из базы (0 — вся таблица)")
+    ap.add_argument('--synthetic', type=int, default=0, help="Добавить N случайных названий (проверка крайних случаев)")
+    ap.add_argument('--repeat', type=int, default=REPEAT)
+    ap.add_argument('--vocab', choices=['base', 'db'], default='base', help="db — словарь с меткой ДБ")
+    ap.add_argument('--show-diffs', type=int, default=5)
+    args = ap.parse_args()
+
+    titles = load_titles(args.db, args.limit) + synthetic_titles(args.synthetic)
+    if not titles:
+        raise SystemExit("Названий нет: укажите --db или --synthetic N")
+    titles += EDGE_TITLES
+
+    config = LEGACY_CONFIG_DB if args.vocab == 'db' else LEGACY_CONFIG
+    analyzer = TitleAnalyzer(AUDIO_TRACKS_DB if args.vocab == 'db' else AUDIO_TRACKS)
+    legacy = lambda t: legacy_analyze_title(t, config)
+
+    diffs = [t for t in titles if legacy(t) != analyzer(t)]
+    print(f"🧪 Названий: {len(titles)}, расхождений с прежним analyze_title: {len(diffs)}")
+    for t in diffs[:args.show_diffs]:
+        print(f"    ↳ {t!r}\n      было:  {legacy(t)}\n      стало: {analyzer(t)}")
+
+    old = measure(legacy, titles, args.repeat)
+    new = measure(analyzer, titles, args.repeat)
+    print(f"{'вариант':<14}{'время, с':>10}{'назв/с':>12}")
+    print(f"{'пять проходов':<14}{old:>10.2f}{len(titles) / old:>12.0f}")
+    print(f"{'один проход':<14}{new:>10.2f}{len(titles) / new:>12.0f}   ×{old / new:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import logging
+import os
+import time
+
+# --- КОНФИГУРАЦИЯ ---
+BROWSER_RSS_LIMIT_MB = 3072   # RSS дерева процессов браузера, выше — перезапуск
+WATCHDOG_INTERVAL = 5.0       # Сек между замерами (обход /proc тоже стоит времени)
+FALLBACK_EVERY = 500          # Без /proc (не Linux) — старый перезапуск каждые N фильмов
+
+logger = logging.getLogger(__name__)
+
+try:
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+def _children_map():
+    """ppid -> [pid] по всем процессам из /proc"""
+    children = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit(): continue
+        try:
+            with open(f'/proc/{name}/stat', 'rb') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Имя процесса в скобках может содержать пробелы — поля считаем после последней ')'
+        fields = stat[stat.rfind(b')') + 2:].split()
+        children.setdefault(int(fields[1]), []).append(int(name))
+    return children
+
+def tree_rss_mb(root_pid=None):
+    """
+    Суммарный RSS всех потомков процесса (по умолчанию текущего): драйвер Playwright
+    и все процессы Chromium. Разделяемые страницы считаются в каждом процессе, поэтому
+    это верхняя оценка — для порога перезапуска она и нужна. None, если /proc нет.
+    """
+    if not os.path.isdir('/proc'): return None
+    children = _children_map()
+    stack = list(children.get(root_pid or os.getpid(), []))
+    pages = 0
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                pages += int(f.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            pass  # Процесс успел завершиться
+    return pages * PAGE_SIZE / 1024**2
+
+class MemoryWatchdog:
+    """
+    Решает, когда пересоздать браузер: по RSS дерева процессов, а не по счетчику фильмов.
+    Замер ленивый (не чаще interval), сам перезапуск делает вызывающий после того,
+    как дождался текущих вкладок, — через recycle().
+    """
+    def __init__(self, limit_mb=BROWSER_RSS_LIMIT_MB, interval=WATCHDOG_INTERVAL, fallback_every=FALLBACK_EVERY):
+        self.limit_mb = limit_mb
+        self.interval = interval
+        self.fallback_every = fallback_every
+        self.last_check = 0.0
+        self.rss = None
+        self.peak = 0.0
+        self.restarts = []
+
+    def sample(self):
+        self.last_check = time.monotonic()
+        self.rss = tree_rss_mb()
+        if self.rss is not None:
+            self.peak = max(self.peak, self.rss)
+        return self.rss
+
+    def due(self, processed):
+        """Пора ли перезапускать. processed — фильмов с прошлого перезапуска (для запасного пути)."""
+        if time.monotonic() - self.last_check >= self.interval:
+            self.sample()
+        if self.rss is None:
+            return processed >= self.fallback_every
+        return self.rss > self.limit_mb
+
+    async def recycle(self, parser, processed):
+        """Перезапуск браузера парсера с замером памяти до и после"""
+        before = self.sample()
+        started = time.monotonic()
+        await parser.restart()
+        after = self.sample()
+        self.restarts.append((before, after))
+        if before is None or after is None:
+            logger.info(f"[WATCHDOG] ♻️ Браузер перезапущен после {processed} фильмов (RSS недоступен)")
+            return
+        logger.info(
+            f"[WATCHDOG] ♻️ Браузер перезапущен: RSS {before:.0f} -> {after:.0f} МБ "
+            f"(освобождено {before - after:.0f} МБ, порог {self.limit_mb} МБ), "
+            f"после {processed} фильмов, за {time.monotonic() - started:.1f} с"
+        )
+
+    def report(self):
+        if not self.restarts:
+            peak = f", пик RSS {self.peak:.0f} МБ" if self.peak else ""
+            return f"🩺 Watchdog: перезапусков не было{peak}"
+        freed = sum(b - a for b, a in self.restarts if b is not None and a is not None)
+        return (
+            f"🩺 Watchdog: перезапусков {len(self.restarts)}, освобождено {freed:.0f} МБ, "
+            f"пик RSS {self.peak:.0f} МБ (порог {self.limit_mb} МБ)"
+        )
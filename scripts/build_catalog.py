@@ -0,0 +1,144 @@
+import argparse
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from torrent_merge import (MOVIE_RELEASES_INDEX_SQL, MOVIE_RELEASES_SCHEMA_SQL, RELEASES_SCHEMA_SQL,
+                           TRACKER_SETS_SCHEMA_SQL, info_hash_select)
+
+# --- КОНФИГУРАЦИЯ ---
+# Построение (и пересинхронизация) каталога releases / movie_releases из torrents.
+# Релиз берет название, магнет и размер из последней по rowid строки с этим хешем — ту же строку,
+# чьи метаданные до сих пор оставались в torrent_details; first_seen — самый ранний parsed_at.
+# Связи фильм-релиз — по одной на пару (tmdb_id, info_hash). Повторный запуск дописывает
+# строки, которые записали скрипты без каталога, и убирает связи, которых в torrents уже нет.
+# Отчет: сколько строк схлопнулось, у скольких хешей названия расходились между фильмами
+# (их метаданные перетирали друг друга) и место в файле по таблицам (dbstat).
+BASE_DIR = Path(os.getcwd())
+TORRENTS_DB_PATH = BASE_DIR / "tmdb_data" / "torrents.db"
+
+RELEASES_FILL_SQL = """
+    INSERT INTO releases (info_hash, title, magnet, tracker_set, size, size_bytes, first_seen)
+    SELECT t.info_hash, t.torrent_title, t.magnet, {tracker_set}, t.size, t.size_bytes, g.first_seen
+    FROM torrents t JOIN (
+        SELECT info_hash, MAX(rowid) AS last_rowid, MIN(parsed_at) AS first_seen
+        FROM torrents WHERE info_hash IS NOT NULL GROUP BY info_hash
+    ) g ON t.rowid = g.last_rowid
+    WHERE true
+    ON CONFLICT(info_hash) DO UPDATE SET title = excluded.title, magnet = excluded.magnet,
+        tracker_set = excluded.tracker_set, size = excluded.size, size_bytes = excluded.size_bytes,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE releases.title IS NOT excluded.title OR releases.magnet IS NOT excluded.magnet
+       OR releases.tracker_set IS NOT excluded.tracker_set OR releases.size IS NOT excluded.size
+       OR releases.size_bytes IS NOT excluded.size_bytes
+"""
+MOVIE_RELEASES_FILL_SQL = """
+    INSERT INTO movie_releases (tmdb_id, info_hash, seeders, leechers, url, parsed_at)
+    SELECT tmdb_id, info_hash, seeders, leechers, url, parsed_at FROM torrents
+    WHERE info_hash IS NOT NULL AND tmdb_id IS NOT NULL
+    ON CONFLICT(tmdb_id, info_hash) DO UPDATE SET seeders = excluded.seeders, leechers = excluded.leechers,
+        url = excluded.url, parsed_at = excluded.parsed_at
+    WHERE movie_releases.seeders IS NOT excluded.seeders OR movie_releases.leechers IS NOT excluded.leechers
+       OR movie_releases.url IS NOT excluded.url
+"""
+STALE_LINKS_SQL = """
+    DELETE FROM movie_releases WHERE NOT EXISTS (
+        SELECT 1 FROM torrents t WHERE t.tmdb_id = movie_releases.tmdb_id AND t.info_hash = movie_releases.info_hash
+    )
+"""
+ORPHAN_RELEASES_SQL = """
+    DELETE FROM releases WHERE NOT EXISTS (SELECT 1 FROM movie_releases m WHERE m.info_hash = releases.info_hash)
+"""
+SHARED_SQL = "SELECT COUNT(*) FROM (SELECT info_hash FROM movie_releases GROUP BY info_hash HAVING COUNT(*) > 1)"
+CONFLICTS_SQL = """
+    SELECT COUNT(*) FROM (
+        SELECT info_hash FROM torrents WHERE info_hash IS NOT NULL
+        GROUP BY info_hash HAVING COUNT(DISTINCT torrent_title) > 1 OR COUNT(DISTINCT size) > 1
+    )
+"""
+
+def table_sizes(conn):
+    """Байты в файле по таблицам вместе с их индексами; None, если SQLite собран без dbstat"""
+    try:
+        pages = conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall()
+    except sqlite3.OperationalError:
+        return None
+    owner = dict(conn.execute("SELECT name, tbl_name FROM sqlite_master"))
+    sizes = {}
+    for name, size in pages:
+        table = owner.get(name, name)
+        sizes[table] = sizes.get(table, 0) + size
+    return sizes
+
+def mb(size):
+    return f"{size / 1024 / 1024:.1f} МБ"
+
+def main():
+    ap = argparse.ArgumentParser(description="Построить каталог releases / movie_releases из torrents")
+    ap.add_argument('--dry-run', action='store_true', help="Построить, показать отчет и откатить")
+    args = ap.parse_args()
+
+    if not TORRENTS_DB_PATH.exists():
+        print(f"❌ База {TORRENTS_DB_PATH} не найдена!")
+        return
+
+    conn = sqlite3.connect(TORRENTS_DB_PATH)
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    if info_hash_select(conn) == 'NULL':
+        print("❌ Нет колонки torrents.info_hash — сначала scripts/backfill_info_hash.py")
+        conn.close()
+        return
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(torrents)")}
+    missing = conn.execute("SELECT COUNT(*) FROM torrents WHERE info_hash IS NULL").fetchone()[0]
+    if missing:
+        print(f"⚠️ У {missing} строк нет info_hash — в каталог они не попадут (scripts/backfill_info_hash.py)")
+
+    started = time.monotonic()
+    # Одна транзакция вместе с CREATE TABLE: при --dry-run или сбое каталога не остается вовсе,
+    # а пустой каталог скрипты приняли бы за настоящий
+    conn.execute("BEGIN")
+    conn.execute(TRACKER_SETS_SCHEMA_SQL)
+    conn.execute(RELEASES_SCHEMA_SQL)
+    conn.execute(MOVIE_RELEASES_SCHEMA_SQL)
+    releases = conn.execute(RELEASES_FILL_SQL.format(
+        tracker_set="t.tracker_set" if 'tracker_set' in columns else "NULL")).rowcount
+    links = conn.execute(MOVIE_RELEASES_FILL_SQL).rowcount
+    # Индекс по хешу — до чистки: без него поиск сирот перебирает все связи на каждый релиз
+    conn.execute(MOVIE_RELEASES_INDEX_SQL)
+    stale = conn.execute(STALE_LINKS_SQL).rowcount
+    orphans = conn.execute(ORPHAN_RELEASES_SQL).rowcount
+    print(f"🚀 Релизов записано {releases}, связей {links}; удалено устаревших связей {stale}, "
+          f"релизов без фильма {orphans} ({time.monotonic() - started:.1f} с)")
+
+    rows = conn.execute("SELECT COUNT(*) FROM torrents WHERE info_hash IS NOT NULL").fetchone()[0]
+    total_releases = conn.execute("SELECT COUNT(*) FROM releases").fetchone()[0]
+    total_links = conn.execute("SELECT COUNT(*) FROM movie_releases").fetchone()[0]
+    shared = conn.execute(SHARED_SQL).fetchone()[0]
+    conflicts = conn.execute(CONFLICTS_SQL).fetchone()[0]
+    print(f"📦 Строк torrents: {rows} -> релизов {total_releases} + связей {total_links}")
+    print(f"   ∟ Релизов у нескольких фильмов: {shared}; строк-копий в torrents: {rows - total_releases}")
+    print(f"   ∟ Хешей с разными названием/размером у разных фильмов (метаданные перетирались): {conflicts}")
+    print(f"   ∟ Разборов метаданных за полный проход: {rows} -> {total_releases}")
+
+    sizes = table_sizes(conn)
+    if sizes and sizes.get('torrents'):
+        before = sizes['torrents']
+        after = sizes.get('releases', 0) + sizes.get('movie_releases', 0)
+        print(f"💾 torrents с индексами: {mb(before)}; releases + movie_releases с индексами: {mb(after)} "
+              f"({(after - before) / before:+.0%})")
+
+    if args.dry_run:
+        conn.rollback()
+        print("🧪 Без записи: изменения откачены")
+    else:
+        conn.commit()
+        print("✅ ГОТОВО! Каталог актуален")
+    conn.close()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nПрервано.")
@@ -0,0 +1,169 @@
+import os
+import sqlite3
+from pathlib import Path
+
+from torrent_merge import MAGNET_HASH_SQL, catalog_exists, info_hash_select
+
+# --- ОДНО СОЕДИНЕНИЕ НА ТРИ БАЗЫ ---
+# torrents.db открывается главной базой, items_minimal — как tmdb, torrent_details — как data.
+# Связки, которые скрипты собирали словарями в Python (runtime_map, movie_years, списки хешей),
+# здесь — один SQL-запрос: SQLite сам идет по индексам, в память процесса ничего не грузится.
+# Функции не коммитят: транзакцией управляет вызывающий (conn.commit() / conn.rollback()).
+BASE_DIR = Path(os.getcwd())
+TMDB_DB_PATH = BASE_DIR / "tmdb_data" / "tmdb_minimal_no_original.db"
+TORRENTS_DB_PATH = BASE_DIR / "tmdb_data" / "torrents.db"
+DATA_DB_PATH = BASE_DIR / "tmdb_data" / "torrents_data.db"
+
+def connect(torrents_db=TORRENTS_DB_PATH, tmdb_db=TMDB_DB_PATH, data_db=DATA_DB_PATH, readonly=False):
+    """Соединение с torrents.db и ATTACH tmdb / data (базы, которых нет, не подключаются)"""
+    if readonly:
+        conn = sqlite3.connect(f"file:{torrents_db}?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(torrents_db)
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")
+    for alias, path in (('tmdb', tmdb_db), ('data', data_db)):
+        if Path(path).exists():
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (f"file:{path}?mode=ro" if readonly else str(path),))
+    return conn
+
+def attached(conn):
+    return {row[1] for row in conn.execute("PRAGMA database_list")}
+
+def hash_expr(conn, alias='t'):
+    """Хеш строки torrents: колонка info_hash (индекс), а до backfill_info_hash.py — из hex-магнета"""
+    if info_hash_select(conn) == 'NULL': return MAGNET_HASH_SQL.format(col=f'{alias}.magnet')
+    return f'{alias}.info_hash'
+
+# --- ГОД ВЫХОДА ---
+# Правило cleand.py: у фильма с известным годом раздача должна упоминать в названии
+# год, год + 1 или год - 1 (погрешность релизов). Раздачи без названия не трогаются.
+YEAR_MISMATCH_SQL = """
+    SELECT t.id FROM torrents t JOIN tmdb.items_minimal i ON i.id = t.tmdb_id
+    WHERE i.year IS NOT NULL AND i.year != ''
+      AND t.torrent_title IS NOT NULL
+      AND instr(t.torrent_title, i.year) = 0
+      AND instr(t.torrent_title, i.year + 1) = 0
+      AND instr(t.torrent_title, i.year - 1) = 0
+"""
+
+def count_year_mismatches(conn):
+    return conn.execute(f"SELECT COUNT(*) FROM ({YEAR_MISMATCH_SQL})").fetchone()[0]
+
+def delete_year_mismatches(conn):
+    """Удалить раздачи, в названии которых нет года фильма (±1); возвращает число строк"""
+    if not catalog_exists(conn):
+        return conn.execute(f"DELETE FROM torrents WHERE id IN ({YEAR_MISMATCH_SQL})").rowcount
+    conn.execute(GONE_TABLE_SQL)
+    conn.execute("DELETE FROM temp.gone")
+    conn.execute(f"""
+        INSERT OR IGNORE INTO temp.gone SELECT tmdb_id, info_hash FROM torrents
+        WHERE id IN ({YEAR_MISMATCH_SQL}) AND info_hash IS NOT NULL
+    """)
+    deleted = conn.execute(f"DELETE FROM torrents WHERE id IN ({YEAR_MISMATCH_SQL})").rowcount
+    unlink_gone(conn)
+    return deleted
+
+# --- БИТРЕЙТ ---
+# Как metadata_rows.calculate_bitrate: Мбит/с = байты * 8 / (минуты * 60) / 10^6, два знака.
+# Длительность берется у последней по rowid строки torrents с этим хешем — как при
+# последовательном проходе reparse_all.py (хеш может висеть у нескольких фильмов).
+REFRESH_BITRATE_SQL = """
+    WITH last AS (
+        SELECT {hash} AS info_hash, MAX(t.rowid) AS last_rowid, i.runtime AS runtime
+        FROM torrents t LEFT JOIN tmdb.items_minimal i ON i.id = t.tmdb_id
+        WHERE t.magnet LIKE '%btih:%'
+        GROUP BY 1
+    )
+    UPDATE data.torrent_details AS d SET bitrate = CASE
+        WHEN d.size > 0 AND last.runtime > 0 THEN round(d.size * 8.0 / (last.runtime * 60) / 1000000, 2)
+    END
+    FROM last
+    WHERE last.info_hash = d.info_hash
+      AND d.bitrate IS NOT CASE
+        WHEN d.size > 0 AND last.runtime > 0 THEN round(d.size * 8.0 / (last.runtime * 60) / 1000000, 2)
+      END
+"""
+
+# С каталогом (build_catalog.py) — наибольшая длительность среди фильмов релиза, как в updat.py
+# и reparse_all.py: результат не зависит от того, какой фильм записал раздачу последним.
+CATALOG_BITRATE_SQL = """
+    WITH r AS (
+        SELECT m.info_hash, MAX(i.runtime) AS runtime
+        FROM movie_releases m LEFT JOIN tmdb.items_minimal i ON i.id = m.tmdb_id
+        GROUP BY m.info_hash
+    )
+    UPDATE data.torrent_details AS d SET bitrate = CASE
+        WHEN d.size > 0 AND r.runtime > 0 THEN round(d.size * 8.0 / (r.runtime * 60) / 1000000, 2)
+    END
+    FROM r
+    WHERE r.info_hash = d.info_hash
+      AND d.bitrate IS NOT CASE
+        WHEN d.size > 0 AND r.runtime > 0 THEN round(d.size * 8.0 / (r.runtime * 60) / 1000000, 2)
+      END
+"""
+
+def refresh_bitrates(conn):
+    """Пересчитать torrent_details.bitrate по текущим длительностям фильмов; возвращает число строк"""
+    sql = CATALOG_BITRATE_SQL if catalog_exists(conn) else REFRESH_BITRATE_SQL.format(hash=hash_expr(conn))
+    # rowcount у запроса, начинающегося с WITH, модуль sqlite3 не отдает (-1) — считаем по total_changes
+    before = conn.total_changes
+    conn.execute(sql)
+    return conn.total_changes - before
+
+# --- КАСКАДНОЕ УДАЛЕНИЕ ---
+# Раздачи фильмов удаляются из torrents, их метаданные — из torrent_details, но только
+# хеши, которых больше нет ни у одного фильма (одна раздача бывает у нескольких tmdb_id).
+# Каталог (если есть) чистится так же: связи фильмов — сразу, релиз — когда у него не осталось фильмов.
+GONE_TABLE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS gone (
+    tmdb_id INTEGER,
+    info_hash TEXT,
+    PRIMARY KEY (tmdb_id, info_hash)
+) WITHOUT ROWID
+"""
+
+def unlink_gone(conn):
+    """Убрать из каталога пары temp.gone, которых больше нет в torrents, и релизы без фильмов"""
+    conn.execute("""
+        DELETE FROM movie_releases WHERE (tmdb_id, info_hash) IN (
+            SELECT tmdb_id, info_hash FROM temp.gone g
+            WHERE NOT EXISTS (SELECT 1 FROM torrents t WHERE t.tmdb_id = g.tmdb_id AND t.info_hash = g.info_hash)
+        )
+    """)
+    conn.execute("""
+        DELETE FROM releases WHERE info_hash IN (SELECT info_hash FROM temp.gone)
+          AND NOT EXISTS (SELECT 1 FROM movie_releases m WHERE m.info_hash = releases.info_hash)
+    """)
+    conn.execute("DELETE FROM temp.gone")
+
+def delete_movies(conn, tmdb_ids):
+    """Удалить раздачи фильмов и осиротевшие метаданные; возвращает (раздач, метаданных)"""
+    if not tmdb_ids: return 0, 0
+    placeholders = ','.join('?' * len(tmdb_ids))
+    h = hash_expr(conn)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS doomed (info_hash TEXT PRIMARY KEY) WITHOUT ROWID")
+    conn.execute("DELETE FROM temp.doomed")
+    conn.execute(f"""
+        INSERT OR IGNORE INTO temp.doomed SELECT {h} FROM torrents t
+        WHERE t.tmdb_id IN ({placeholders}) AND t.magnet LIKE '%btih:%'
+    """, tuple(tmdb_ids))
+    catalog = catalog_exists(conn)
+    if catalog:
+        conn.execute(GONE_TABLE_SQL)
+        conn.execute(f"""
+            INSERT OR IGNORE INTO temp.gone SELECT tmdb_id, info_hash FROM movie_releases
+            WHERE tmdb_id IN ({placeholders})
+        """, tuple(tmdb_ids))
+    torrents = conn.execute(f"DELETE FROM torrents WHERE tmdb_id IN ({placeholders})", tuple(tmdb_ids)).rowcount
+    if catalog: unlink_gone(conn)
+    details = 0
+    if 'data' in attached(conn):
+        details = conn.execute(f"""
+            DELETE FROM data.torrent_details WHERE info_hash IN (
+                SELECT info_hash FROM temp.doomed x
+                WHERE NOT EXISTS (SELECT 1 FROM torrents t WHERE {h} = x.info_hash)
+            )
+        """).rowcount
+    conn.execute("DELETE FROM temp.doomed")
+    return torrents, details
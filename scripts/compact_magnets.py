@@ -0,0 +1,168 @@
+import argparse
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from torrent_merge import MAGNET_SQL, TRACKER_SETS_SCHEMA_SQL, catalog_exists, split_magnet
+
+# --- КОНФИГУРАЦИЯ ---
+# Разовое сжатие torrents.magnet у строк, записанных полными магнетами (до появления
+# tracker_sets и скриптами без сжатия). Хвост "&tr=..." каждого магнета уходит в tracker_sets
+# (один раз на одинаковый список), в magnet остаются xt и dn. Каждая пачка перед коммитом
+# сверяется: магнет, собранный через MAGNET_SQL (так его читают сайт и скрипты), должен
+# совпасть с исходным байт в байт — иначе пачка откатывается и скрипт останавливается.
+# В конце — VACUUM, чтобы файл действительно уменьшился, и отчет о размере torrents.db.
+# --expand возвращает полные магнеты (для скриптов, которые читают magnet без tracker_sets).
+BASE_DIR = Path(os.getcwd())
+TORRENTS_DB_PATH = BASE_DIR / "tmdb_data" / "torrents.db"
+
+CHUNK_ROWS = 50000   # rowid на одну транзакцию
+
+ORIGINALS_TABLE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS originals (
+    id INTEGER PRIMARY KEY,
+    magnet TEXT NOT NULL
+)
+"""
+MISMATCH_SQL = f"""
+    SELECT COUNT(*) FROM temp.originals o JOIN torrents t ON t.rowid = o.id
+    WHERE {MAGNET_SQL.format(t='t')} IS NOT o.magnet
+"""
+EXPAND_SQL = """
+    UPDATE torrents SET magnet = torrents.magnet || s.trackers, tracker_set = NULL
+    FROM tracker_sets s WHERE s.id = torrents.tracker_set
+"""
+PRUNE_SQL = """
+    DELETE FROM tracker_sets
+    WHERE id NOT IN (SELECT tracker_set FROM torrents WHERE tracker_set IS NOT NULL)
+"""
+CATALOG_PRUNE_FILTER = " AND id NOT IN (SELECT tracker_set FROM releases WHERE tracker_set IS NOT NULL)"
+
+def ensure_schema(conn):
+    conn.execute(TRACKER_SETS_SCHEMA_SQL)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(torrents)")}
+    if 'tracker_set' not in existing:
+        conn.execute("ALTER TABLE torrents ADD COLUMN tracker_set INTEGER")
+        print("➕ Добавлена колонка torrents.tracker_set")
+    conn.commit()
+
+def file_size(path):
+    """Размер базы вместе с WAL (после checkpoint WAL пустой)"""
+    return sum(p.stat().st_size for p in (Path(path), Path(f"{path}-wal")) if p.exists())
+
+def mb(size):
+    return f"{size / 1024 / 1024:.1f} МБ"
+
+def vacuum(conn):
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def expand(conn, args):
+    before = file_size(TORRENTS_DB_PATH)
+    restored = conn.execute(EXPAND_SQL).rowcount
+    conn.commit()
+    if not args.no_vacuum: vacuum(conn)
+    print(f"✅ Полных магнетов восстановлено: {restored}. torrents.db: {mb(before)} -> {mb(file_size(TORRENTS_DB_PATH))}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Сжать torrents.magnet: хвосты &tr= — в общую таблицу tracker_sets")
+    ap.add_argument('--chunk', type=int, default=CHUNK_ROWS, help="rowid на транзакцию")
+    ap.add_argument('--dry-run', action='store_true', help="Только посчитать, ничего не менять")
+    ap.add_argument('--expand', action='store_true', help="Обратно: записать в magnet полные магнеты")
+    ap.add_argument('--no-vacuum', action='store_true', help="Не сжимать файл после миграции")
+    args = ap.parse_args()
+
+    if not TORRENTS_DB_PATH.exists():
+        print(f"❌ База {TORRENTS_DB_PATH} не найдена!")
+        return
+
+    conn = sqlite3.connect(TORRENTS_DB_PATH)
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    if not args.dry_run:
+        ensure_schema(conn)
+    if args.expand:
+        expand(conn, args)
+        conn.close()
+        return
+    conn.execute(ORIGINALS_TABLE_SQL)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    has_sets = 'tracker_set' in {row[1] for row in conn.execute("PRAGMA table_info(torrents)")}
+    sets = dict(conn.execute("SELECT trackers, id FROM tracker_sets")) if has_sets else {}
+    pending_sql = "tracker_set IS NULL" if has_sets else "1"
+    size_before = file_size(TORRENTS_DB_PATH)
+    magnet_bytes_before = conn.execute("SELECT COALESCE(SUM(length(CAST(magnet AS BLOB))), 0) FROM torrents").fetchone()[0]
+    lo, hi = conn.execute("SELECT MIN(rowid), MAX(rowid) FROM torrents").fetchone()
+    print(f"🚀 torrents.db: {mb(size_before)}, из них магнеты {mb(magnet_bytes_before)}; наборов трекеров: {len(sets)}")
+
+    started = time.monotonic()
+    stats = {'compacted': 0, 'kept': 0, 'new_sets': 0, 'tail_bytes': 0, 'set_bytes': 0}
+    if lo is not None:
+        for start in range(lo, hi + 1, args.chunk):
+            rows = conn.execute(
+                f"SELECT rowid, magnet FROM torrents WHERE rowid >= ? AND rowid < ? AND {pending_sql} AND magnet LIKE '%&tr=%'",
+                (start, start + args.chunk)
+            ).fetchall()
+            updates, originals = [], []
+            for rowid, magnet in rows:
+                head, tail = split_magnet(magnet)
+                if tail is None:
+                    stats['kept'] += 1
+                    continue
+                if tail not in sets:
+                    sets[tail] = None if args.dry_run else \
+                        conn.execute("INSERT INTO tracker_sets (trackers) VALUES (?)", (tail,)).lastrowid
+                    stats['new_sets'] += 1
+                    stats['set_bytes'] += len(tail.encode('utf-8'))
+                updates.append((head, sets[tail], rowid))
+                originals.append((rowid, magnet))
+                stats['tail_bytes'] += len(tail.encode('utf-8'))
+            stats['compacted'] += len(updates)
+            if not args.dry_run and updates:
+                conn.executemany("INSERT INTO temp.originals (id, magnet) VALUES (?, ?)", originals)
+                conn.executemany("UPDATE torrents SET magnet = ?, tracker_set = ? WHERE rowid = ?", updates)
+                mismatched = conn.execute(MISMATCH_SQL).fetchone()[0]
+                if mismatched:
+                    conn.rollback()
+                    print(f"\n❌ rowid {start}..{start + args.chunk - 1}: {mismatched} магнетов после сборки "
+                          f"не совпали с исходными — пачка откачена, остановка")
+                    conn.close()
+                    return
+                conn.execute("DELETE FROM temp.originals")
+                conn.commit()
+            print(f"\r⚡ rowid до {min(start + args.chunk, hi + 1)} из {hi + 1} | сжато: {stats['compacted']} | "
+                  f"оставлено полными: {stats['kept']} | наборов трекеров: {len(sets)}", end="")
+        print()
+
+    if args.dry_run:
+        print(f"🧪 Без записи. Было бы сжато {stats['compacted']}, новых наборов трекеров {stats['new_sets']}; "
+              f"магнеты станут меньше примерно на {mb(stats['tail_bytes'] - stats['set_bytes'])}")
+        conn.close()
+        return
+
+    # Наборы, на которые ссылается каталог релизов (build_catalog.py), тоже используются
+    pruned = conn.execute(PRUNE_SQL + (CATALOG_PRUNE_FILTER if catalog_exists(conn) else "")).rowcount
+    conn.commit()
+    magnet_bytes_after = conn.execute("SELECT COALESCE(SUM(length(CAST(magnet AS BLOB))), 0) FROM torrents").fetchone()[0]
+    set_count, set_bytes = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(length(CAST(trackers AS BLOB))), 0) FROM tracker_sets").fetchone()
+    if not args.no_vacuum:
+        print("   ∟ Оптимизация файла БД (VACUUM)...")
+        vacuum(conn)
+    size_after = file_size(TORRENTS_DB_PATH)
+    conn.close()
+
+    print(f"✅ ГОТОВО! Сжато магнетов: {stats['compacted']} (сборка сверена с исходными — расхождений нет), "
+          f"оставлено полными: {stats['kept']}, удалено неиспользуемых наборов: {pruned}. "
+          f"{time.monotonic() - started:.1f} с")
+    print(f"📦 Магнеты: {mb(magnet_bytes_before)} -> {mb(magnet_bytes_after)} + наборы трекеров {mb(set_bytes)} ({set_count} шт.)")
+    print(f"📦 torrents.db: {mb(size_before)} -> {mb(size_after)} ({(size_after - size_before) / size_before:+.0%})")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nПрервано.")
@@ -0,0 +1,139 @@
+import heapq
+import json
+import math
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from miss_ledger import DUE_SQL
+
+# --- ПЛАНИРОВЩИК СВЕЖЕСТИ ---
+# Вместо прохода по updated_at ASC каждый фильм получает оценку
+#   score = P(раздачи изменились с прошлой проверки) × ценность фильма,
+# где P = 1 - exp(-rate × дней с проверки), а rate (изменений в сутки) растет
+# для новинок, фильмов из now_playing/trending и фильмов, у которых раздачи
+# уже менялись в прошлых прогонах. Ценность — голоса TMDB и попадание в подборки.
+BASE_DIR = Path(os.getcwd())
+CACHE_DB_PATH = BASE_DIR / "tmdb_data" / "cache.db"
+
+RATE_FLOOR = 1 / 180         # Старое кино без раздач: раз в полгода что-то да появится
+RATE_NEW = 0.5               # Фильм текущего года: изменения примерно раз в 2 дня
+RATE_HOT = 0.3               # В now_playing / trending
+RATE_VOLATILE = 0.2          # × доля прошлых проверок, где менялся состав раздач
+AGE_HALF_LIFE = 2.0          # Лет: вклад новизны падает вдвое каждые 2 года
+VOLATILITY_PRIOR = 0.1       # Для фильмов, проверенных меньше двух раз
+W_VOTES = 1.0                # Ценность: log(голосов) относительно максимума
+W_LISTS = 1.0                # Ценность: фильм в любой подборке главной
+W_SEEDED = 0.5               # Ценность: у фильма есть раздачи с сидами
+
+# Подборки главной из api_cache (ключи пишет lib/db.js)
+HOT_LISTS = ('multi_/movie/now_playing_%', 'multi_/trending/movie/week_%')
+POPULAR_LISTS = ('multi_/movie/popular_%', 'home_top_rated')
+
+def parse_date(value):
+    """updated_at пишут разные скрипты: '2025-01-31' и ISO с временем"""
+    if not value: return None
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d')
+    except ValueError:
+        return None
+
+def load_list_ids(cache_db_path, patterns):
+    """tmdb id из подборок api_cache (ids_json), пустое множество без кэша"""
+    ids = set()
+    if not Path(cache_db_path).exists(): return ids
+    with sqlite3.connect(cache_db_path) as conn:
+        for pattern in patterns:
+            for (ids_json,) in conn.execute("SELECT ids_json FROM api_cache WHERE key LIKE ?", (pattern,)):
+                try:
+                    ids.update(int(i) for i in json.loads(ids_json))
+                except (TypeError, ValueError):
+                    continue
+    return ids
+
+def load_torrent_stats(torrents_db_path):
+    """tmdb_id -> (раздач, сидов) и tmdb_id -> волатильность по журналу прогонов"""
+    seeded = {}
+    volatility = {}
+    if not Path(torrents_db_path).exists(): return seeded, volatility
+    with sqlite3.connect(torrents_db_path) as conn:
+        for tmdb_id, count, seeders in conn.execute(
+            "SELECT tmdb_id, COUNT(*), SUM(seeders) FROM torrents GROUP BY tmdb_id"
+        ):
+            seeded[tmdb_id] = (count, seeders or 0)
+        has_journal = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'update_run_items'"
+        ).fetchone()
+        if has_journal:
+            # Доля соседних проверок, между которыми изменилось число раздач
+            for tmdb_id, checks, changes in conn.execute("""
+                SELECT tmdb_id, COUNT(*), SUM(changed) FROM (
+                    SELECT tmdb_id, torrents != LAG(torrents) OVER (PARTITION BY tmdb_id ORDER BY done_at) AS changed
+                    FROM update_run_items WHERE status != 'pending'
+                ) GROUP BY tmdb_id HAVING COUNT(*) > 1
+            """):
+                volatility[tmdb_id] = (changes or 0) / (checks - 1)
+    return seeded, volatility
+
+def score_movie(days, year, votes, max_log_votes, hot, listed, volatility, seeded, this_year):
+    """(оценка, вероятность изменений) для одного фильма"""
+    recency = 0.5 ** (max(0, this_year - year) / AGE_HALF_LIFE) if year else 0.0
+    rate = RATE_FLOOR + RATE_NEW * recency + RATE_HOT * hot + RATE_VOLATILE * volatility
+    p_changed = 1.0 if days is None else 1 - math.exp(-rate * days)
+    value = 1 + W_VOTES * math.log1p(votes) / max_log_votes + W_LISTS * listed + W_SEEDED * seeded
+    return p_changed * value, p_changed
+
+def plan_queue(tmdb_db_path, torrents_db_path, cache_db_path=CACHE_DB_PATH, now=None, due_only=True):
+    """
+    Очередь глобального обновления по убыванию оценки: элементы
+    {'seq', 'id', 'query', 'year', 'score'}, как у load_queue() в updat.py, плюс сводка.
+    due_only — только фильмы, чей next_check (журнал промахов) уже наступил.
+    """
+    now = now or datetime.now()
+    hot_ids = load_list_ids(cache_db_path, HOT_LISTS)
+    popular_ids = load_list_ids(cache_db_path, POPULAR_LISTS)
+    seeded, volatility = load_torrent_stats(torrents_db_path)
+
+    with sqlite3.connect(tmdb_db_path) as conn:
+        rows = conn.execute(
+            "SELECT id, title, kp_id, year, COALESCE(vote_count, 0), updated_at FROM items_minimal"
+            + (f" WHERE {DUE_SQL}" if due_only else "")
+        ).fetchall()
+    max_log_votes = math.log1p(max((r[4] for r in rows), default=0)) or 1.0
+
+    heap = []
+    summary = {'movies': 0, 'never_checked': 0, 'hot': 0, 'listed': 0, 'volatile': 0, 'likely_changed': 0}
+    for tmdb_id, title, kp_id, year, votes, updated_at in rows:
+        if kp_id: search_query = f"kp{kp_id}"
+        elif title: search_query = title
+        else: continue
+
+        checked = parse_date(updated_at)
+        days = (now - checked).total_seconds() / 86400 if checked else None
+        hot = tmdb_id in hot_ids
+        listed = hot or tmdb_id in popular_ids
+        _, seeders = seeded.get(tmdb_id, (0, 0))
+        vol = volatility.get(tmdb_id, VOLATILITY_PRIOR)
+        score, p_changed = score_movie(days, year, votes, max_log_votes, hot, listed, vol, seeders > 0, now.year)
+
+        heapq.heappush(heap, (-score, tmdb_id, search_query, year))
+        summary['movies'] += 1
+        summary['never_checked'] += days is None
+        summary['hot'] += hot
+        summary['listed'] += listed
+        summary['volatile'] += vol > VOLATILITY_PRIOR
+        summary['likely_changed'] += p_changed >= 0.5
+
+    queue = []
+    while heap:
+        neg_score, tmdb_id, search_query, year = heapq.heappop(heap)
+        queue.append({'seq': len(queue), 'id': tmdb_id, 'query': search_query, 'year': year, 'score': -neg_score})
+    return queue, summary
+
+def summary_line(summary):
+    return (
+        f"🎯 План свежести: фильмов {summary['movies']}, ни разу не проверялись {summary['never_checked']}, "
+        f"в now_playing/trending {summary['hot']}, в подборках {summary['listed']}, "
+        f"с меняющимися раздачами {summary['volatile']}, вероятно изменились (P≥0.5) {summary['likely_changed']}"
+    )
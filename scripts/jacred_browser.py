@@ -0,0 +1,350 @@
+import logging
+import re
+import time
+from playwright.async_api import async_playwright
+
+from adaptive_limiter import AdaptiveLimiter
+from page_pool import PagePool
+
+# --- КОНФИГУРАЦИЯ ---
+JACRED_URL = "https://jacred.xyz"
+READY_SETTLE_MS = 400        # Список результатов не меняется столько — значит дорисован
+READY_EMPTY_SETTLE_MS = 3000 # То же для ответа без магнитов (спиннер / "ничего не найдено")
+READY_TIMEOUT_MS = 20000     # Жесткий потолок, как у старого wait_for_selector
+LEGACY_WAIT_MS = 2000        # Фиксированная пауза старого пути после первого магнита
+RESULTS_LIMIT = 50           # Первые N магнитов выдачи
+
+logger = logging.getLogger(__name__)
+
+# Детектор готовности: MutationObserver ставится перед кликом "НАЙТИ" и резолвит
+# window.__jacredReady, когда DOM затих (settle) после последней мутации.
+READY_INSTALL_JS = '''([settleMs, emptySettleMs, timeoutMs]) => {
+    const started = performance.now();
+    const count = () => document.querySelectorAll('a[href^="magnet:"]').length;
+    window.__jacredReady = new Promise(resolve => {
+        let timer = null, mutations = 0, firstMagnet = null;
+        const finish = (status) => {
+            observer.disconnect();
+            clearTimeout(timer);
+            clearTimeout(deadline);
+            resolve({status, waited: performance.now() - started, firstMagnet, mutations});
+        };
+        const observer = new MutationObserver(() => {
+            mutations++;
+            const n = count();
+            if (n > 0 && firstMagnet === null) firstMagnet = performance.now() - started;
+            clearTimeout(timer);
+            timer = setTimeout(() => finish(count() > 0 ? 'results' : 'empty'), n > 0 ? settleMs : emptySettleMs);
+        });
+        observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+        const deadline = setTimeout(() => finish(count() > 0 ? 'results' : 'timeout'), timeoutMs);
+    });
+}'''
+
+# Экстракторы результатов: для каждого магнита (первые 50) ищется блок строки
+# и из его текста достаются название, размер и сиды/пиры.
+WALK_EXTRACT_JS = '''() => {
+    const results = [];
+    // 1. Находим ВСЕ магниты
+    const allMagnets = Array.from(document.querySelectorAll('a[href^="magnet:"]'));
+    
+    // 2. Берем только первые 50 (или меньше, если их нет столько)
+    const top50 = allMagnets.slice(0, 50);
+
+    top50.forEach(magnetLink => {
+        let container = magnetLink.parentElement;
+        let found = false;
+        for (let i = 0; i < 5; i++) {
+            if (!container) break;
+            const titleLink = container.querySelector('a:not([href^="magnet:"])');
+            if (titleLink && titleLink.innerText.length > 2) {
+                found = true;
+                break;
+            }
+            container = container.parentElement;
+        }
+        if (!found || !container) return;
+
+        const magnet = magnetLink.href;
+        const linkEls = Array.from(container.querySelectorAll('a'));
+        const titleLink = linkEls.find(a => !a.href.startsWith('magnet:') && a.innerText.trim().length > 1);
+        const title = titleLink ? titleLink.innerText.trim() : container.innerText.split('\\n')[0];
+
+        let size = "0 MB";
+        const sizeMatch = container.innerText.match(/(\\d+(\\.\\d+)?)\\s*(GB|MB|ГБ|МБ|TB|ТБ)/i);
+        if (sizeMatch) size = sizeMatch[0];
+
+        let seeders = 0, leechers = 0;
+        const text = container.innerText;
+        const sM = text.match(/(?:↑|⬆)\\s*(\\d+)/);
+        const lM = text.match(/(?:↓|⬇)\\s*(\\d+)/);
+        if (sM) seeders = parseInt(sM[1]);
+        if (lM) leechers = parseInt(lM[1]);
+
+        results.push({ 
+            torrent_title: title, 
+            magnet: magnet, 
+            seeders: seeders, 
+            leechers: leechers, 
+            size: size 
+        });
+    });
+    return results;
+}'''
+
+# Однопроходный экстрактор: разметка строки определяется один раз по первому магниту,
+# остальные строки находятся через closest() по ее тегу/классу. Текст собирается из
+# текстовых узлов (textContent, без innerText — не форсирует layout), а результат
+# уходит компактными массивами [title, magnet, seeders, leechers, size, url].
+# yearStr (может быть пустым) — фильтр по вхождению года в название, как в update.py.
+ROWS_EXTRACT_JS = '''([limit, yearStr]) => {
+    const magnets = document.querySelectorAll('a[href^="magnet:"]');
+    const rows = [];
+    if (!magnets.length) return rows;
+
+    const titleOf = (row) => {
+        for (const a of row.getElementsByTagName('a')) {
+            const href = a.getAttribute('href') || '';
+            if (href.startsWith('magnet:')) continue;
+            const text = a.textContent.replace(/\\s+/g, ' ').trim();
+            if (text.length > 1) return [text, a.href];
+        }
+        return null;
+    };
+    const textOf = (row) => {
+        const walker = document.createTreeWalker(row, NodeFilter.SHOW_TEXT);
+        const parts = [];
+        for (let n = walker.nextNode(); n; n = walker.nextNode()) {
+            const t = n.nodeValue.trim();
+            if (t) parts.push(t);
+        }
+        return parts;
+    };
+
+    // Шаблон строки: ближайший предок первого магнита со ссылкой-названием
+    let probe = magnets[0].parentElement, depth = 1;
+    while (probe && probe !== document.body && depth <= 6 && !titleOf(probe)) {
+        probe = probe.parentElement;
+        depth++;
+    }
+    if (!probe || probe === document.body || depth > 6) return rows;
+    const rowSelector = probe.classList.length
+        ? probe.tagName.toLowerCase() + '.' + CSS.escape(probe.classList[0]) : null;
+    const rowOf = (magnet) => {
+        if (rowSelector) return magnet.closest(rowSelector);
+        let el = magnet;
+        for (let i = 0; i < depth && el; i++) el = el.parentElement;
+        return el;
+    };
+
+    const seen = new Set();
+    for (const m of magnets) {
+        if (rows.length >= limit) break;
+        const magnet = m.href;
+        if (seen.has(magnet)) continue;
+        seen.add(magnet);
+        const row = rowOf(m);
+        if (!row) continue;
+
+        const parts = textOf(row);
+        const link = titleOf(row);
+        const title = link ? link[0] : (parts[0] || '');
+        if (yearStr && !title.includes(yearStr)) continue;
+
+        const text = parts.join('\\n');
+        const size = text.match(/(\\d+(\\.\\d+)?)\\s*(GB|MB|ГБ|МБ|TB|ТБ)/i);
+        const s = text.match(/(?:↑|⬆)\\s*(\\d+)/);
+        const l = text.match(/(?:↓|⬇)\\s*(\\d+)/);
+        rows.push([title, magnet, s ? +s[1] : 0, l ? +l[1] : 0, size ? size[0] : '0 MB', link ? link[1] : '']);
+    }
+    return rows;
+}'''
+ROW_FIELDS = ('torrent_title', 'magnet', 'seeders', 'leechers', 'size', 'url')
+
+def rows_to_torrents(rows):
+    """Компактные массивы ROWS_EXTRACT_JS -> словари торрентов"""
+    return [dict(zip(ROW_FIELDS, row)) for row in rows or []]
+
+EXTRACTORS = {'rows': ROWS_EXTRACT_JS, 'walk': WALK_EXTRACT_JS}
+WAIT_STRATEGIES = ('ready', 'fixed')
+
+# --- КЛАСС ПАРСЕРА ---
+class JacredParser:
+    def __init__(self, max_concurrent: int = 5, base_url: str = JACRED_URL, adaptive: bool = False,
+                 wait: str = 'ready', extractor: str = 'rows'):
+        if wait not in WAIT_STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия ожидания: {wait}")
+        if extractor not in EXTRACTORS:
+            raise ValueError(f"Неизвестный экстрактор: {extractor}")
+        self.base_url = base_url.rstrip('/')
+        self.wait = wait
+        self.extractor = extractor
+        self.semaphore = AdaptiveLimiter(max_concurrent, adaptive=adaptive)
+        self.browser = None
+        self.context = None
+        self.playwright = None
+        self.processed_count = 0
+        self.pool = PagePool(self.base_url)
+        self.ready_stats = {'queries': 0, 'waited_ms': 0.0, 'saved_ms': 0.0}
+
+    async def start(self):
+        """Запуск браузера"""
+        if self.playwright is None:
+            self.playwright = await async_playwright().start()
+        
+        self.browser = await self.playwright.chromium.launch(
+            headless=True,
+            args=[
+                '--no-sandbox', 
+                '--disable-setuid-sandbox', 
+                '--disable-dev-shm-usage',
+                '--disable-gpu', 
+                '--disable-extensions', 
+                '--mute-audio',
+                '--dns-server=1.1.1.1'
+            ]
+        )
+        self.context = await self.browser.new_context(
+            viewport={'width': 1920, 'height': 1080},
+            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36'
+        )
+        await self.context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        self.pool.attach(self.context)
+
+    async def stop(self):
+        """Полная остановка"""
+        await self.pool.close()
+        logger.info(self.pool.report())
+        logger.info(self.ready_report())
+        if self.context: await self.context.close()
+        if self.browser: await self.browser.close()
+        if self.playwright: await self.playwright.stop()
+        self.playwright = None
+
+    async def restart(self):
+        """Перезапуск для очистки памяти"""
+        # logger.info("♻️ Перезапуск браузера для очистки RAM...")
+        await self.pool.close()
+        if self.context: await self.context.close()
+        if self.browser: await self.browser.close()
+        # Playwright не стопаем, только браузер
+        self.browser = await self.playwright.chromium.launch(
+            headless=True,
+            args=['--no-sandbox', '--disable-gpu', '--mute-audio', '--dns-server=1.1.1.1']
+        )
+        self.context = await self.browser.new_context(viewport={'width': 1920, 'height': 1080})
+        await self.context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        self.pool.attach(self.context)
+
+    async def wait_results(self, page, search_query):
+        """Ждем затишья DOM после поиска вместо фиксированных пауз. Пишет в лог экономию против старого пути."""
+        try:
+            ready = await page.evaluate("() => window.__jacredReady")
+        except Exception:
+            # Поиск перезагрузил страницу и унес наблюдатель — старый путь с паузами
+            await self.legacy_wait(page)
+            return None
+        # Старый путь: wait_for_selector(магнит, 20 с) + 2 с паузы, а без магнитов — весь таймаут
+        if ready['firstMagnet'] is not None:
+            baseline = ready['firstMagnet'] + LEGACY_WAIT_MS
+        else:
+            baseline = READY_TIMEOUT_MS
+        saved = max(0, baseline - ready['waited'])
+        self.ready_stats['queries'] += 1
+        self.ready_stats['waited_ms'] += ready['waited']
+        self.ready_stats['saved_ms'] += saved
+        logger.debug(
+            f"[READY] '{search_query}': {ready['status']} за {ready['waited']:.0f} мс "
+            f"(мутаций {ready['mutations']}), сэкономлено {saved:.0f} мс"
+        )
+        return ready
+
+    async def legacy_wait(self, page):
+        """Старый путь: первый магнит (до 20 с) + фиксированная пауза"""
+        try:
+            await page.wait_for_selector('a[href^="magnet:"]', timeout=READY_TIMEOUT_MS)
+            await page.wait_for_timeout(LEGACY_WAIT_MS)
+        except Exception:
+            pass
+
+    async def search(self, page, search_query):
+        """Ввести запрос во вкладке со страницей поиска и дождаться результатов (исключение — поиск не состоялся)"""
+        search_input = await page.wait_for_selector('input[type="text"]', state='visible', timeout=15000)
+        await search_input.click()
+        await search_input.fill("") 
+        await search_input.type(search_query, delay=10) 
+
+        if self.wait == 'ready':
+            await page.evaluate(READY_INSTALL_JS, [READY_SETTLE_MS, READY_EMPTY_SETTLE_MS, READY_TIMEOUT_MS])
+        search_button = page.locator('button', has_text="НАЙТИ").first
+        if await search_button.is_visible():
+            await search_button.click()
+        else:
+            await search_input.press('Enter')
+
+        if self.wait == 'ready':
+            await self.wait_results(page, search_query)
+        else:
+            await self.legacy_wait(page)
+
+    async def extract(self, page):
+        """Раздачи с текущей страницы выбранным экстрактором: список словарей торрентов"""
+        if self.extractor == 'rows':
+            return rows_to_torrents(await page.evaluate(ROWS_EXTRACT_JS, [RESULTS_LIMIT, '']))
+        return await page.evaluate(EXTRACTORS[self.extractor])
+
+    def ready_report(self):
+        s = self.ready_stats
+        if not s['queries']:
+            return "Детектор готовности: запросов не было"
+        return (
+            f"⏱ Детектор готовности: запросов {s['queries']}, среднее ожидание "
+            f"{s['waited_ms'] / s['queries']:.0f} мс, сэкономлено {s['saved_ms'] / 1000:.0f} с "
+            f"({s['saved_ms'] / s['queries']:.0f} мс/запрос против фиксированных пауз)"
+        )
+
+    def filter_by_year(self, torrents, target_year):
+        if not target_year: return torrents
+        valid_items = []
+        year_pattern = re.compile(r'\b((?:19|20)\d{2})\b')
+        allowed_years = {target_year - 1, target_year, target_year + 1}
+        
+        for t in torrents:
+            title = t['torrent_title']
+            found_years = [int(y) for y in year_pattern.findall(title)]
+            if not found_years:
+                valid_items.append(t)
+            else:
+                if any(y in allowed_years for y in found_years):
+                    valid_items.append(t)
+        return valid_items
+
+    async def parse_movie(self, tmdb_id: int, search_query: str, target_year: int) -> dict:
+        async with self.semaphore:
+            # Вкладка из пула уже стоит на странице поиска — без new_page и goto
+            pooled = await self.pool.acquire()
+            page = pooled.page
+            ok = False
+            started = time.monotonic()
+            latency = None
+            try:
+                try:
+                    await self.search(page, search_query)
+                except Exception:
+                    return {'tmdb_id': tmdb_id, 'torrents': [], 'failed': True}
+                ok = True
+
+                raw_torrents = await self.extract(page)
+                
+                if raw_torrents:
+                    latency = time.monotonic() - started
+                filtered_torrents = self.filter_by_year(raw_torrents, target_year)
+                return {'tmdb_id': tmdb_id, 'torrents': filtered_torrents}
+
+            except Exception:
+                ok = False
+                return {'tmdb_id': tmdb_id, 'torrents': [], 'failed': True}
+            finally:
+                await self.semaphore.record(latency, failed=not ok)
+                await self.pool.release(pooled, ok)
+                self.processed_count += 1
@@ -0,0 +1,165 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import random
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+# --- КОНФИГУРАЦИЯ ---
+BASE_DIR = Path(os.getcwd())
+FIXTURES_DIR = BASE_DIR / "fixtures" / "jacred"
+HOST = "127.0.0.1"
+PORT = 8765
+
+# Упрощенная копия главной страницы трекера: поле ввода, кнопка "НАЙТИ" и список
+# результатов той же структуры (ссылка-название, размер, ↑/↓, магнит в одном блоке).
+INDEX_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>jacred fixture</title></head>
+<body>
+<div class="search"><input type="text" id="q"><button id="go">НАЙТИ</button></div>
+<div id="results"></div>
+<script>
+function esc(s) { return String(s).replace(/[&<>"]/g, c => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;'}[c])); }
+async function run() {
+  const q = document.getElementById('q').value;
+  const resp = await fetch('/api/v1.0/torrents?search=' + encodeURIComponent(q));
+  const items = await resp.json();
+  document.getElementById('results').innerHTML = items.map(t =>
+    '<div class="webResult-item"><div class="h2"><a href="' + esc(t.url) + '">' + esc(t.title) + '</a></div>' +
+    '<div class="webResult-info"><span>' + esc(t.sizeName) + '</span> <span>↑ ' + t.sid + '</span> ' +
+    '<span>↓ ' + t.pir + '</span> <a href="' + esc(t.magnet) + '">magnet</a></div></div>'
+  ).join('');
+}
+document.getElementById('go').addEventListener('click', run);
+document.getElementById('q').addEventListener('keydown', e => { if (e.key === 'Enter') run(); });
+</script>
+</body></html>
+"""
+
+# --- ФИКСТУРЫ ---
+def fixture_key(query):
+    """Имя файла фикстуры для поискового запроса"""
+    return hashlib.sha1(query.strip().lower().encode('utf-8')).hexdigest()
+
+def load_fixture(fixtures_dir, query):
+    path = Path(fixtures_dir) / f"{fixture_key(query)}.json"
+    if not path.exists(): return None
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    # Фикстура хранит запрос рядом с ответом, чтобы файлы можно было читать глазами
+    return data.get('results', []) if isinstance(data, dict) else data
+
+def load_page(fixtures_dir, key):
+    """Записанная рекордером отрисованная страница результатов (для замеров экстракторов)"""
+    path = Path(fixtures_dir) / f"{key}.html"
+    if not path.exists(): return None
+    return path.read_text(encoding='utf-8')
+
+def synthetic_results(query, count):
+    """Детерминированный ответ для запросов без записанной фикстуры"""
+    rnd = random.Random(query)
+    year = rnd.randint(1980, 2025)
+    tags = ['BDRip 1080p', 'WEB-DL 2160p HDR', 'BDRemux 1080p | MVO', 'WEBRip 720p | Дубляж', 'HEVC 4K | RHS']
+    items = []
+    for i in range(rnd.randint(0, count)):
+        info_hash = hashlib.sha1(f"{query}:{i}".encode('utf-8')).hexdigest().upper()
+        size = rnd.randint(700, 80000) * 1024**2
+        title = f"{query} ({year + rnd.choice([-1, 0, 0, 1])}) {rnd.choice(tags)}"
+        items.append({
+            'tracker': 'fixture',
+            'url': f"http://fixture.local/t/{info_hash[:8]}",
+            'title': title,
+            'size': size,
+            'sizeName': f"{size / 1024**3:.2f} GB",
+            'sid': rnd.randint(0, 500),
+            'pir': rnd.randint(0, 50),
+            'magnet': f"magnet:?xt=urn:btih:{info_hash}&dn={info_hash[:8]}&tr=udp://tracker.fixture.local:6969/announce"
+        })
+    return items
+
+# --- HTTP СЕРВЕР ---
+class FixtureHandler(BaseHTTPRequestHandler):
+    server_version = "JacredFixture/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_body(self, status, body, content_type):
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path in ('/', '/index.html'):
+            self.send_body(200, INDEX_HTML, 'text/html; charset=utf-8')
+            return
+        if url.path == '/api/v1.0/torrents':
+            query = parse_qs(url.query).get('search', [''])[0]
+            if self.server.delay_ms:
+                # Имитация задержки трекера (± 50%)
+                time.sleep(self.server.delay_ms * random.uniform(0.5, 1.5) / 1000)
+            results = load_fixture(self.server.fixtures_dir, query)
+            if results is not None:
+                self.server.stats['hits'] += 1
+            elif self.server.synthetic:
+                self.server.stats['synthetic'] += 1
+                results = synthetic_results(query, self.server.synthetic)
+            else:
+                # Режим воспроизведения: незаписанный запрос — пустой ответ, но его видно в статистике
+                self.server.stats['misses'] += 1
+                results = []
+            self.send_body(200, json.dumps(results, ensure_ascii=False), 'application/json; charset=utf-8')
+            return
+        if url.path.startswith('/pages/'):
+            page = load_page(self.server.fixtures_dir, url.path[len('/pages/'):])
+            if page is not None:
+                self.send_body(200, page, 'text/html; charset=utf-8')
+                return
+        self.send_body(404, html.escape(url.path), 'text/plain; charset=utf-8')
+
+def create_server(host=HOST, port=PORT, fixtures_dir=FIXTURES_DIR, delay_ms=0, synthetic=0, verbose=False):
+    server = ThreadingHTTPServer((host, port), FixtureHandler)
+    server.daemon_threads = True
+    server.fixtures_dir = Path(fixtures_dir)
+    server.delay_ms = delay_ms
+    server.synthetic = synthetic
+    server.verbose = verbose
+    server.stats = {'hits': 0, 'synthetic': 0, 'misses': 0}
+    return server
+
+def main():
+    ap = argparse.ArgumentParser(description="Локальный двойник jacred.xyz для офлайн замеров движков")
+    ap.add_argument('--host', default=HOST)
+    ap.add_argument('--port', type=int, default=PORT)
+    ap.add_argument('--fixtures', default=str(FIXTURES_DIR), help="Папка с записанными ответами")
+    ap.add_argument('--delay-ms', type=int, default=0, help="Искусственная задержка ответа API")
+    ap.add_argument('--synthetic', type=int, default=50,
+                    help="Генерировать до N раздач для запросов без фикстуры (0 — пустой ответ)")
+    ap.add_argument('--replay', action='store_true',
+                    help="Только записанные фикстуры (то же, что --synthetic 0), промахи в итоге")
+    ap.add_argument('--verbose', action='store_true')
+    args = ap.parse_args()
+
+    synthetic = 0 if args.replay else args.synthetic
+    server = create_server(args.host, args.port, args.fixtures, args.delay_ms, synthetic, args.verbose)
+    mode = "воспроизведение" if args.replay else f"синтетика до {synthetic}"
+    print(f"🧪 Fixture server: http://{args.host}:{args.port} (фикстуры: {args.fixtures}, {mode})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        s = server.stats
+        print(f"\nОстановлено. Фикстур: {s['hits']}, синтетики: {s['synthetic']}, промахов: {s['misses']}")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import re
+import time
+import aiohttp
+
+from adaptive_limiter import AdaptiveLimiter
+
+# --- КОНФИГУРАЦИЯ ---
+JACRED_URL = "https://jacred.xyz"
+SEARCH_ENDPOINT = "/api/v1.0/torrents"   # Тот же JSON, который рисует главная страница
+REQUEST_TIMEOUT = 20                     # сек на один поисковый запрос
+MAX_RETRIES = 2                          # Повторы при таймаутах / 5xx
+RESULTS_LIMIT = 50                       # Как и в браузерном парсере: первые 50 раздач
+
+logger = logging.getLogger(__name__)
+
+# --- HTTP ДВИЖОК ---
+class JacredHttpParser:
+    """
+    Замена JacredParser без браузера: ходит напрямую в JSON-поиск трекера
+    через один пул соединений aiohttp. Интерфейс (start/stop/restart/parse_movie)
+    и формат результата {'tmdb_id', 'torrents': [...]} совпадают с браузерной версией.
+    """
+    def __init__(self, max_concurrent: int = 5, base_url: str = JACRED_URL, limit: int = RESULTS_LIMIT,
+                 adaptive: bool = False):
+        self.semaphore = AdaptiveLimiter(max_concurrent, adaptive=adaptive)
+        self.max_concurrent = max_concurrent
+        self.base_url = base_url.rstrip('/')
+        self.limit = limit
+        self.session = None
+        self.processed_count = 0
+
+    async def start(self):
+        """Открытие пула соединений"""
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrent,
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+                'Accept': 'application/json'
+            }
+        )
+
+    async def stop(self):
+        """Закрытие пула"""
+        if self.session:
+            await self.session.close()
+        self.session = None
+
+    async def restart(self):
+        """Браузера нет, чистить нечего — просто пересоздаем сессию"""
+        await self.stop()
+        await self.start()
+
+    def filter_by_year(self, torrents, target_year):
+        if not target_year: return torrents
+        valid_items = []
+        year_pattern = re.compile(r'\b((?:19|20)\d{2})\b')
+        allowed_years = {target_year - 1, target_year, target_year + 1}
+
+        for t in torrents:
+            title = t['torrent_title']
+            found_years = [int(y) for y in year_pattern.findall(title)]
+            if not found_years:
+                valid_items.append(t)
+            else:
+                if any(y in allowed_years for y in found_years):
+                    valid_items.append(t)
+        return valid_items
+
+    async def fetch_raw(self, search_query: str) -> list:
+        """Сырой ответ поиска (список словарей трекера). None при ошибке/таймауте."""
+        url = self.base_url + SEARCH_ENDPOINT
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with self.session.get(url, params={'search': search_query}) as resp:
+                    if resp.status >= 500 and attempt < MAX_RETRIES:
+                        await asyncio.sleep(1 + attempt)
+                        continue
+                    if resp.status != 200:
+                        return None
+                    data = await resp.json(content_type=None)
+                    return data if isinstance(data, list) else []
+            except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                if attempt < MAX_RETRIES:
+                    await asyncio.sleep(1 + attempt)
+                    continue
+                logger.debug(f"HTTP поиск '{search_query}' не удался: {e}")
+        return None
+
+    async def parse_movie(self, tmdb_id: int, search_query: str, target_year: int) -> dict:
+        async with self.semaphore:
+            started = time.monotonic()
+            raw = None
+            try:
+                raw = await self.fetch_raw(search_query)
+                if raw is None:
+                    # Трекер не ответил — это не "раздач нет", промахом не считается
+                    return {'tmdb_id': tmdb_id, 'torrents': [], 'failed': True}
+                torrents = [t for t in (convert_item(item) for item in raw or []) if t][:self.limit]
+                return {'tmdb_id': tmdb_id, 'torrents': self.filter_by_year(torrents, target_year)}
+            except Exception:
+                raw = None
+                return {'tmdb_id': tmdb_id, 'torrents': [], 'failed': True}
+            finally:
+                await self.semaphore.record(time.monotonic() - started, failed=raw is None)
+                self.processed_count += 1
+
+# --- ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ---
+def format_size(size_bytes):
+    """Байты -> '10.5 GB' (в том же виде, что и текст на странице)"""
+    if not size_bytes: return "0 MB"
+    size_bytes = float(size_bytes)
+    if size_bytes >= 1024**4: return f"{size_bytes / 1024**4:.2f} TB"
+    if size_bytes >= 1024**3: return f"{size_bytes / 1024**3:.2f} GB"
+    return f"{size_bytes / 1024**2:.2f} MB"
+
+def convert_item(item):
+    """Элемент JSON трекера -> словарь торрента, как его отдает браузерный парсер"""
+    if not isinstance(item, dict): return None
+    magnet = item.get('magnet')
+    if not magnet or not str(magnet).startswith('magnet:'): return None
+    return {
+        'torrent_title': (item.get('title') or '').strip(),
+        'magnet': magnet,
+        'seeders': int(item.get('sid') or 0),
+        'leechers': int(item.get('pir') or 0),
+        'size': item.get('sizeName') or format_size(item.get('size')),
+        'url': item.get('url') or ''
+    }
@@ -0,0 +1,125 @@
+import asyncio
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+from bench_engines import load_queries
+from jacred_fixture_server import FIXTURES_DIR, fixture_key
+from jacred_http import JACRED_URL, JacredHttpParser
+
+# --- КОНФИГУРАЦИЯ ---
+INDEX_FILE = "index.json"   # Список записанных запросов: по нему бенчмарк воспроизводит тот же набор
+CONCURRENCY = 5             # Живой трекер: не долбим сильнее обычного парсера
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- ЗАПИСЬ ---
+# Рекордер снимает с живого трекера ответы поиска в формате jacred_fixture_server
+# (<sha1 запроса>.json), а с --pages еще и отрисованные страницы результатов
+# (<sha1>.html) — на них меряются JS-экстракторы без сети.
+def load_index(fixtures_dir):
+    path = fixtures_dir / INDEX_FILE
+    if not path.exists(): return {}
+    with open(path, encoding='utf-8') as f:
+        return {e['key']: e for e in json.load(f)}
+
+def save_index(fixtures_dir, index):
+    entries = sorted(index.values(), key=lambda e: e['tmdb_id'])
+    with open(fixtures_dir / INDEX_FILE, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=1)
+
+def write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+async def record_responses(queries, fixtures_dir, base_url, concurrency, index):
+    """Сырые JSON-ответы поиска: то, что отдает /api/v1.0/torrents"""
+    parser = JacredHttpParser(max_concurrent=concurrency, base_url=base_url)
+    sem = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    async def one(tmdb_id, query, year):
+        nonlocal failed
+        async with sem:
+            raw = await parser.fetch_raw(query)
+        if raw is None:
+            failed += 1
+            logger.warning(f"⚠️ '{query}': ответ не получен, фикстура не записана")
+            return
+        key = fixture_key(query)
+        write_json(fixtures_dir / f"{key}.json", {
+            'query': query,
+            'recorded_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'results': raw
+        })
+        index[key] = {'key': key, 'tmdb_id': tmdb_id, 'query': query, 'year': year, 'torrents': len(raw)}
+
+    await parser.start()
+    try:
+        await asyncio.gather(*[one(*q) for q in queries])
+    finally:
+        await parser.stop()
+    return failed
+
+async def record_pages(queries, fixtures_dir, base_url, concurrency):
+    """Отрисованные страницы результатов (DOM после поиска) для замеров экстракторов"""
+    from jacred_browser import JacredParser
+    parser = JacredParser(max_concurrent=concurrency, base_url=base_url)
+    saved = 0
+
+    async def one(tmdb_id, query, year):
+        nonlocal saved
+        async with parser.semaphore:
+            pooled = await parser.pool.acquire()
+            ok = False
+            try:
+                await parser.search(pooled.page, query)
+                html = await pooled.page.content()
+                (fixtures_dir / f"{fixture_key(query)}.html").write_text(html, encoding='utf-8')
+                saved += 1
+                ok = True
+            except Exception as e:
+                logger.warning(f"⚠️ '{query}': страница не записана ({e})")
+            finally:
+                await parser.pool.release(pooled, ok)
+
+    await parser.start()
+    try:
+        await asyncio.gather(*[one(*q) for q in queries])
+    finally:
+        await parser.stop()
+    return saved
+
+async def main():
+    ap = argparse.ArgumentParser(description="Запись ответов трекера в фикстуры для офлайн замеров")
+    ap.add_argument('--count', type=int, default=200, help="Сколько фильмов записать (в порядке updated_at)")
+    ap.add_argument('--base-url', default=JACRED_URL)
+    ap.add_argument('--fixtures', default=str(FIXTURES_DIR))
+    ap.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    ap.add_argument('--pages', action='store_true', help="Также сохранить отрисованные страницы (нужен браузер)")
+    args = ap.parse_args()
+
+    fixtures_dir = Path(args.fixtures)
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    queries = load_queries(args.count)
+    index = load_index(fixtures_dir)
+    logger.info(f"🎙 Запись {len(queries)} запросов с {args.base_url} в {fixtures_dir}")
+
+    start = time.time()
+    failed = await record_responses(queries, fixtures_dir, args.base_url, args.concurrency, index)
+    save_index(fixtures_dir, index)
+    logger.info(f"📼 Ответов записано: {len(queries) - failed}, ошибок: {failed}, в индексе: {len(index)}")
+
+    if args.pages:
+        saved = await record_pages(queries, fixtures_dir, args.base_url, args.concurrency)
+        logger.info(f"🖼 Страниц записано: {saved}")
+    logger.info(f"🏁 Готово за {time.time() - start:.1f} сек")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nПрервано.")
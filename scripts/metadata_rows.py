@@ -0,0 +1,85 @@
+import json
+
+from title_analyzer import ANALYZER_VERSION, analyze_title
+from title_cache import title_hash
+from torrent_merge import normalize_info_hash, parse_size_to_bytes
+
+# --- СТРОКИ torrent_details ---
+# Общая часть run_local_parsing / parse_local.py / fill_missing_metadata.py:
+# из (магнет, название, размер, длительность) — строка метаданных по названию раздачи.
+# title_hash и parser_version — от какого названия и какой версией анализатора получена строка:
+# по ним перепарсинг трогает только устаревшие строки. У строк, записанных без них
+# (старые скрипты, lib/db.js), оба поля NULL — такие строки всегда считаются устаревшими.
+DETAILS_SCHEMA_SQL = """CREATE TABLE IF NOT EXISTS torrent_details (
+    info_hash TEXT PRIMARY KEY, resolution TEXT, size INTEGER, files TEXT,
+    hdr_type TEXT, file_type TEXT, codec TEXT, bitrate REAL, audio TEXT,
+    title_hash INTEGER, parser_version TEXT
+)"""
+DETAILS_NEW_COLUMNS = [('title_hash', 'INTEGER'), ('parser_version', 'TEXT')]
+DETAILS_INSERT_SQL = """
+    INSERT OR REPLACE INTO torrent_details
+    (info_hash, resolution, size, files, hdr_type, file_type, codec, bitrate, audio, title_hash, parser_version)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# Словари каждой версии анализатора: по разнице словарей видно, каких названий касается правка
+VERSIONS_SCHEMA_SQL = """CREATE TABLE IF NOT EXISTS analyzer_versions (
+    version TEXT PRIMARY KEY, logic INTEGER NOT NULL, vocabulary TEXT NOT NULL
+)"""
+TITLE_PARSE_FILES = json.dumps(['(title_parse)'])  # Файлы неизвестны — заглушка, как и раньше
+# analyze_title("") возвращает {} — у раздачи без названия просто нет тегов
+EMPTY_META = {'resolution': 'N/A', 'audio_tags': [], 'quality_tags': [], 'hdr_type': 'SDR', 'codec': None}
+
+def calculate_bitrate(size_bytes, runtime_minutes):
+    if not size_bytes or not runtime_minutes or runtime_minutes <= 0: return None
+    size_bits = size_bytes * 8
+    seconds = runtime_minutes * 60
+    mbps = (size_bits / seconds) / 1_000_000
+    return round(mbps, 2)
+
+def info_hash_of(magnet, stored=None):
+    """40-символьный hex info_hash в верхнем регистре или None; stored — готовое torrents.info_hash"""
+    return stored or normalize_info_hash(magnet)
+
+def details_row(info_hash, title, size_str, runtime, analyze=analyze_title, size_bytes=None):
+    """
+    Кортеж для DETAILS_INSERT_SQL (analyze — TitleAnalyzer или TitleCache, нужен .version).
+    size_bytes — готовое torrents.size_bytes; если NULL, размер разбирается из текста.
+    """
+    meta = analyze(title or "") or EMPTY_META
+    if size_bytes is None: size_bytes = parse_size_to_bytes(size_str)
+    bitrate = calculate_bitrate(size_bytes, runtime or 0)
+    return (info_hash, meta['resolution'], size_bytes, TITLE_PARSE_FILES, meta['hdr_type'], 'mkv',
+            meta['codec'], bitrate, " | ".join(meta['audio_tags']), title_hash(title or ""), analyze.version)
+
+# --- ВЕРСИИ РАЗБОРА ---
+def ensure_details_schema(conn):
+    """Создать torrent_details или дописать новые колонки в старую таблицу; без коммита"""
+    conn.execute(DETAILS_SCHEMA_SQL)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(torrent_details)")}
+    for name, col_type in DETAILS_NEW_COLUMNS:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE torrent_details ADD COLUMN {name} {col_type}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_details_version ON torrent_details(parser_version)")
+    conn.execute(VERSIONS_SCHEMA_SQL)
+
+def register_version(conn, analyzer):
+    """Запомнить словари текущей версии анализатора; без коммита"""
+    conn.execute("INSERT OR IGNORE INTO analyzer_versions (version, logic, vocabulary) VALUES (?, ?, ?)",
+                 (analyzer.version, ANALYZER_VERSION, json.dumps(analyzer.vocabulary, ensure_ascii=False)))
+
+def vocabulary_changes(conn, analyzer):
+    """
+    {старая версия: слова в нижнем регистре, которые добавили, убрали или перенесли в другую категорию}
+    для версий, отличающихся от текущей только словарями. Название, в котором нет ни одного
+    такого слова, разбирается обеими версиями одинаково (совпадение нового слова начинается
+    только там, где это слово есть в строке), поэтому строку можно не перепарсивать.
+    Версий с другой логикой (ANALYZER_VERSION) или без записанных словарей здесь нет.
+    """
+    current = {(kind, w.lower()) for kind, words in analyzer.vocabulary.items() for w in words}
+    changes = {}
+    rows = conn.execute("SELECT version, vocabulary FROM analyzer_versions WHERE logic = ? AND version != ?",
+                        (ANALYZER_VERSION, analyzer.version))
+    for version, vocabulary in rows:
+        old = {(kind, w.lower()) for kind, words in json.loads(vocabulary).items() for w in words}
+        changes[version] = frozenset(w for _, w in old ^ current)
+    return changes
@@ -0,0 +1,106 @@
+import argparse
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from torrent_merge import SIZE_INDEX_SQL, parse_size_to_bytes
+
+# --- КОНФИГУРАЦИЯ ---
+# Разовое заполнение torrents.size_bytes у строк, записанных до появления колонки.
+# Без regex на каждую строку: в диапазоне rowid берутся только РАЗНЫЕ тексты размеров
+# ("1.46 GB" повторяется тысячами раз), каждый текст разбирается один раз за весь прогон,
+# а строки диапазона обновляются одним UPDATE ... FROM по временной таблице текст -> байты.
+# Повторный запуск дозаполняет только NULL (строки скриптов, которые колонку не пишут).
+BASE_DIR = Path(os.getcwd())
+TORRENTS_DB_PATH = BASE_DIR / "tmdb_data" / "torrents.db"
+
+CHUNK_ROWS = 50000   # rowid на одну транзакцию
+
+SIZES_TABLE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS sizes (
+    size TEXT PRIMARY KEY,
+    size_bytes INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+DISTINCT_SQL = """
+    SELECT DISTINCT size FROM torrents
+    WHERE rowid >= ? AND rowid < ? AND size_bytes IS NULL AND size IS NOT NULL
+"""
+UPDATE_SQL = """
+    UPDATE torrents SET size_bytes = s.size_bytes FROM temp.sizes s
+    WHERE torrents.rowid >= ? AND torrents.rowid < ? AND torrents.size_bytes IS NULL AND s.size = torrents.size
+"""
+EMPTY_SQL = "UPDATE torrents SET size_bytes = 0 WHERE rowid >= ? AND rowid < ? AND size_bytes IS NULL AND size IS NULL"
+
+def ensure_column(conn):
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(torrents)")}
+    if 'size_bytes' not in existing:
+        conn.execute("ALTER TABLE torrents ADD COLUMN size_bytes INTEGER")
+        conn.commit()
+        print("➕ Добавлена колонка torrents.size_bytes")
+
+def verify(conn):
+    """Построчная сверка с parse_size_to_bytes (медленно, для проверки миграции)"""
+    bad = 0
+    for size, size_bytes in conn.execute("SELECT size, size_bytes FROM torrents"):
+        if size_bytes != parse_size_to_bytes(size):
+            bad += 1
+            if bad <= 5: print(f"    ↳ {size!r}: {size_bytes} вместо {parse_size_to_bytes(size)}")
+    return bad
+
+def main():
+    ap = argparse.ArgumentParser(description="Заполнить torrents.size_bytes из текстового size")
+    ap.add_argument('--chunk', type=int, default=CHUNK_ROWS, help="rowid на транзакцию")
+    ap.add_argument('--verify', action='store_true', help="После миграции сверить каждую строку с parse_size_to_bytes")
+    args = ap.parse_args()
+
+    if not TORRENTS_DB_PATH.exists():
+        print(f"❌ База {TORRENTS_DB_PATH} не найдена!")
+        return
+
+    conn = sqlite3.connect(TORRENTS_DB_PATH)
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    ensure_column(conn)
+    conn.execute(SIZES_TABLE_SQL)
+
+    lo, hi = conn.execute("SELECT MIN(rowid), MAX(rowid) FROM torrents").fetchone()
+    pending = conn.execute("SELECT COUNT(*) FROM torrents WHERE size_bytes IS NULL").fetchone()[0]
+    print(f"🚀 Строк без size_bytes: {pending}")
+
+    started = time.monotonic()
+    parsed = set()
+    updated = 0
+    if lo is not None and pending:
+        for start in range(lo, hi + 1, args.chunk):
+            bounds = (start, start + args.chunk)
+            new = [(size, parse_size_to_bytes(size)) for (size,) in conn.execute(DISTINCT_SQL, bounds)
+                   if size not in parsed]
+            parsed.update(size for size, _ in new)
+            conn.executemany("INSERT INTO temp.sizes (size, size_bytes) VALUES (?, ?)", new)
+            updated += conn.execute(UPDATE_SQL, bounds).rowcount
+            updated += conn.execute(EMPTY_SQL, bounds).rowcount
+            conn.commit()
+            elapsed = time.monotonic() - started
+            print(f"\r⚡ rowid до {min(bounds[1], hi + 1)} из {hi + 1} | Обновлено: {updated} | "
+                  f"Разных размеров: {len(parsed)} | {int(updated / elapsed) if elapsed else 0} шт/сек", end="")
+        print()
+
+    # Индекс строится после заполнения: один проход вместо обновления индекса на каждую строку
+    t0 = time.monotonic()
+    conn.execute(SIZE_INDEX_SQL)
+    conn.commit()
+    print(f"✅ ГОТОВО! Обновлено строк: {updated}, разобрано разных размеров: {len(parsed)} "
+          f"за {time.monotonic() - started:.1f} с (индекс {time.monotonic() - t0:.1f} с)")
+
+    if args.verify:
+        bad = verify(conn)
+        print(f"🧪 Сверка с parse_size_to_bytes: {'расхождений нет' if not bad else f'расхождений {bad}'}")
+    conn.close()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nПрервано.")
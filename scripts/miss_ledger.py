@@ -0,0 +1,66 @@
+from datetime import datetime
+
+# --- ЖУРНАЛ ПРОМАХОВ ---
+# Колонки в items_minimal рядом с updated_at: сколько проверок подряд трекер
+# ничего не нашел и когда фильм проверять в следующий раз. Интервал растет
+# вдвое с каждым промахом (1, 2, 4, ... дней) до потолка; первая же найденная
+# раздача сбрасывает счетчик. Ошибки/таймауты промахом не считаются.
+BACKOFF_MAX_DAYS = 90          # Потолок интервала для старых фильмов
+BACKOFF_RECENT_MAX_DAYS = 7    # ... и для фильмов текущего/прошлого года: релизы появляются быстро
+COLUMNS = {
+    'miss_count': "INTEGER DEFAULT 0",
+    'next_check': "TEXT",       # 'YYYY-MM-DD', NULL — проверять всегда
+}
+
+# Интервал считается от старого miss_count: 1 << 0 = 1 день после первого промаха
+MISS_SQL = """
+    UPDATE items_minimal SET
+        updated_at = ?,
+        miss_count = COALESCE(miss_count, 0) + 1,
+        next_check = date(?, '+' || MIN(
+            CASE WHEN year >= ? THEN ? ELSE ? END,
+            1 << MIN(COALESCE(miss_count, 0), 10)
+        ) || ' days')
+    WHERE id IN ({})
+"""
+HIT_SQL = "UPDATE items_minimal SET updated_at = ?, miss_count = 0, next_check = NULL WHERE id IN ({})"
+CHECKED_SQL = "UPDATE items_minimal SET updated_at = ? WHERE id IN ({})"
+DUE_SQL = "(next_check IS NULL OR next_check <= date('now', 'localtime'))"
+
+async def ensure_columns(tmdb_db):
+    """Добавить колонки журнала в items_minimal (aiosqlite), если их еще нет"""
+    async with tmdb_db.execute("PRAGMA table_info(items_minimal)") as cursor:
+        existing = {row[1] for row in await cursor.fetchall()}
+    for name, decl in COLUMNS.items():
+        if name not in existing:
+            await tmdb_db.execute(f"ALTER TABLE items_minimal ADD COLUMN {name} {decl}")
+    await tmdb_db.execute("CREATE INDEX IF NOT EXISTS idx_items_next_check ON items_minimal(next_check)")
+    await tmdb_db.commit()
+
+async def count_backed_off(tmdb_db):
+    async with tmdb_db.execute(f"SELECT COUNT(*) FROM items_minimal WHERE NOT {DUE_SQL}") as cursor:
+        return (await cursor.fetchone())[0]
+
+async def record_checks(tmdb_db, results):
+    """
+    Отметить проверку пачки (без коммита): найдено — сброс счетчика,
+    пусто — промах и сдвиг next_check, failed — только updated_at.
+    """
+    today = datetime.now().strftime('%Y-%m-%d')
+    hits, misses, failed = [], [], []
+    for r in results:
+        if r.get('failed'): failed.append(r['tmdb_id'])
+        elif r['torrents']: hits.append(r['tmdb_id'])
+        else: misses.append(r['tmdb_id'])
+
+    recent_year = datetime.now().year - 1
+    if misses:
+        await tmdb_db.execute(
+            MISS_SQL.format(','.join('?' * len(misses))),
+            (today, today, recent_year, BACKOFF_RECENT_MAX_DAYS, BACKOFF_MAX_DAYS, *misses)
+        )
+    if hits:
+        await tmdb_db.execute(HIT_SQL.format(','.join('?' * len(hits))), (today, *hits))
+    if failed:
+        await tmdb_db.execute(CHECKED_SQL.format(','.join('?' * len(failed))), (today, *failed))
+    return len(hits), len(misses), len(failed)
@@ -0,0 +1,118 @@
+import time
+
+# --- КОНФИГУРАЦИЯ ---
+PAGE_MAX_USES = 200         # Вкладка пересоздается после N поисков
+PAGE_MAX_HEAP_MB = 256      # ... или когда JS heap вырос больше порога
+HEAP_CHECK_EVERY = 10       # Замер heap раз в N использований (замер тоже стоит времени)
+NAV_TIMEOUT = 15000
+
+# Сброс перед новым поиском: старые магниты теряют href, поэтому ни ожидание
+# 'a[href^="magnet:"]', ни экстрактор не увидят результаты прошлого запроса.
+RESET_JS = '''() => {
+    document.querySelectorAll('a[href^="magnet:"]').forEach(a => a.removeAttribute('href'));
+    window.scrollTo(0, 0);
+}'''
+HEAP_JS = "() => (performance.memory ? performance.memory.usedJSHeapSize : 0)"
+
+class PooledPage:
+    def __init__(self, page):
+        self.page = page
+        self.uses = 0
+
+class PagePool:
+    """
+    Пул вкладок, которые остаются на странице поиска между запросами.
+    Вместо new_page + goto на каждый фильм вкладка только сбрасывается;
+    пересоздается по лимиту использований, по памяти или после ошибки.
+    """
+    def __init__(self, base_url, max_uses=PAGE_MAX_USES, max_heap_mb=PAGE_MAX_HEAP_MB):
+        self.base_url = base_url
+        self.max_uses = max_uses
+        self.max_heap = max_heap_mb * 1024 * 1024
+        self.context = None
+        self.idle = []
+        self.stats = {'created': 0, 'served': 0, 'setup_ms': 0.0,
+                      'retired_uses': [], 'by_uses': 0, 'by_heap': 0, 'by_error': 0}
+
+    def attach(self, context):
+        """Новый контекст браузера (после start/restart): старые вкладки уже закрыты вместе с ним"""
+        self.context = context
+        self.idle = []
+
+    async def acquire(self):
+        pooled = None
+        while self.idle and pooled is None:
+            pooled = self.idle.pop()
+            try:
+                await pooled.page.evaluate(RESET_JS)
+            except Exception:
+                # Вкладка упала, пока лежала в пуле
+                await self._retire(pooled, 'by_error')
+                pooled = None
+        if pooled is None:
+            pooled = await self._create()
+        pooled.uses += 1
+        self.stats['served'] += 1
+        return pooled
+
+    async def _create(self):
+        started = time.perf_counter()
+        page = await self.context.new_page()
+        try:
+            await page.goto(self.base_url, wait_until='domcontentloaded', timeout=NAV_TIMEOUT)
+        except Exception:
+            pass
+        self.stats['created'] += 1
+        self.stats['setup_ms'] += (time.perf_counter() - started) * 1000
+        return PooledPage(page)
+
+    async def release(self, pooled, ok=True):
+        """Вернуть вкладку в пул. ok=False — состояние страницы неизвестно, вкладка пересоздается."""
+        reason = None
+        if not ok:
+            reason = 'by_error'
+        elif pooled.uses >= self.max_uses:
+            reason = 'by_uses'
+        elif pooled.uses % HEAP_CHECK_EVERY == 0:
+            try:
+                if await pooled.page.evaluate(HEAP_JS) > self.max_heap:
+                    reason = 'by_heap'
+            except Exception:
+                reason = 'by_error'
+
+        if reason is None:
+            self.idle.append(pooled)
+            return
+        await self._retire(pooled, reason)
+
+    async def _retire(self, pooled, reason):
+        self.stats[reason] += 1
+        self.stats['retired_uses'].append(pooled.uses)
+        try:
+            await pooled.page.close()
+        except Exception:
+            pass
+
+    async def close(self):
+        for pooled in self.idle:
+            self.stats['retired_uses'].append(pooled.uses)
+            try:
+                await pooled.page.close()
+            except Exception:
+                pass
+        self.idle = []
+
+    def report(self):
+        s = self.stats
+        if not s['created']:
+            return "Пул вкладок: не использовался"
+        uses = s['retired_uses'] + [p.uses for p in self.idle]
+        avg_setup = s['setup_ms'] / s['created']
+        reused = s['served'] - s['created']
+        return (
+            f"♻️ Пул вкладок: создано {s['created']}, поисков {s['served']}, "
+            f"повторных {reused} (в среднем {s['served'] / s['created']:.1f} на вкладку, "
+            f"макс {max(uses, default=0)}); пересоздано: лимит {s['by_uses']}, "
+            f"память {s['by_heap']}, ошибка {s['by_error']}; сэкономлено ~{reused * avg_setup / 1000:.0f} с "
+            f"(new_page+goto ≈ {avg_setup:.0f} мс)"
+        )
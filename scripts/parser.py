@@ -6,6 +6,9 @@ from typing import List, Dict, Any
 from playwright.async_api import async_playwright
 from tqdm import tqdm
 
+from jacred_browser import ROWS_EXTRACT_JS, rows_to_torrents
+from torrent_merge import ensure_info_hash_column, ensure_size_column, ensure_tracker_sets, merge_torrents
+
 # ---------------- Конфигурация ----------------
 SOURCE_DB_PATH = Path("tmdb_data") / "tmdb_minimal_no_original.db"
 DEST_DB_PATH = Path("tmdb_data") / "torrents.db"
@@ -87,76 +90,10 @@ class JacredParser:
                     return {'tmdb_id': tmdb_id, 'movie_name': title_query, 'torrents': []}
 
                 # --- JS Парсинг с ФИЛЬТРАЦИЕЙ ---
-                # Мы передаем год (yearStr) в функцию. 
-                # Скрипт перебирает результаты поиска и берет ТОЛЬКО те, где есть этот год.
-                torrents = await page.evaluate(f'''([limit, yearStr]) => {{
-                    const allDivs = Array.from(document.querySelectorAll('div'));
-                    
-                    const rows = allDivs.filter(div => {{
-                        const text = div.innerText || "";
-                        return text.includes("GB") || text.includes("ГБ") || text.includes("MB") || text.includes("МБ");
-                    }});
-
-                    const data = [];
-                    const processedMagnets = new Set();
-                    let count = 0;
-
-                    for (const el of rows) {{
-                        if (count >= limit) break;
-
-                        const magnetEl = el.querySelector('a[href^="magnet:"]');
-                        if (!magnetEl) continue;
-
-                        const magnet = magnetEl.href;
-                        if (processedMagnets.has(magnet)) continue;
-                        processedMagnets.add(magnet);
-
-                        // Получаем название
-                        const links = Array.from(el.querySelectorAll('a'));
-                        const sourceLink = links.find(a => !a.href.startsWith('magnet:') && a.innerText.trim().length > 0);
-                        
-                        let url = "";
-                        let title = "No Title";
-
-                        if (sourceLink) {{
-                            url = sourceLink.href;
-                            title = sourceLink.innerText.trim();
-                        }} else {{
-                            title = el.innerText.split('\\n')[0];
-                        }}
-
-                        // --- ФИЛЬТР: ЖЕСТКАЯ ПРОВЕРКА ГОДА ---
-                        // Мы ищем "Матрица", сайт выдает "Матрица (1999)" и "Матрица 4 (2021)".
-                        // Если мы ищем 1999 год, то "2021" не пройдет проверку.
-                        if (yearStr && !title.includes(yearStr)) {{
-                             continue;
-                        }}
-
-                        const text = el.innerText;
-                        
-                        let size = "0 MB";
-                        const sizeMatch = text.match(/(\\d+(\\.\\d+)?)\\s*(GB|MB|ГБ|МБ|TB|ТБ)/i);
-                        if (sizeMatch) size = sizeMatch[0];
-
-                        let seeders = 0;
-                        let leechers = 0;
-                        const seedMatch = text.match(/(?:↑|⬆)\\s*(\\d+)/);
-                        const leechMatch = text.match(/(?:↓|⬇)\\s*(\\d+)/);
-                        if (seedMatch) seeders = parseInt(seedMatch[1]);
-                        if (leechMatch) leechers = parseInt(leechMatch[1]);
-
-                        data.push({{
-                            torrent_title: title,
-                            magnet: magnet,
-                            seeders: seeders,
-                            leechers: leechers,
-                            size: size,
-                            url: url
-                        }});
-                        count++;
-                    }}
-                    return data;
-                }}''', [limit, str(year)])
+                # Год (yearStr) передается в экстрактор: в выдачу попадают ТОЛЬКО раздачи,
+                # в названии которых есть этот год. Строки ищутся одним проходом (ROWS_EXTRACT_JS).
+                rows = await page.evaluate(ROWS_EXTRACT_JS, [limit, str(year)])
+                torrents = rows_to_torrents(rows)
 
                 return {'tmdb_id': tmdb_id, 'movie_name': title_query, 'torrents': torrents}
 
@@ -184,6 +121,9 @@ async def init_dest_db():
             )
         """)
         await db.execute("CREATE INDEX IF NOT EXISTS idx_tmdb_id ON torrents(tmdb_id)")
+        await ensure_size_column(db)
+        await ensure_info_hash_column(db)
+        await ensure_tracker_sets(db)
         await db.commit()
 
 async def get_processed_ids() -> set:
@@ -195,33 +135,15 @@ async def get_processed_ids() -> set:
             return {row[0] for row in rows}
 
 async def save_results_batch(db_path, results_list):
-    if not results_list: return
-
-    insert_data = []
-    for res in results_list:
-        t_id = res['tmdb_id']
-        torrents = res['torrents']
-        
-        if len(torrents) > 0:
-            logger.info(f"[WRITE] ID: {t_id} ({res['movie_name']}) -> Found {len(torrents)} valid torrents")
-            for t in torrents:
-                insert_data.append((
-                    t_id, 
-                    t['torrent_title'], 
-                    t['magnet'], 
-                    t['seeders'], 
-                    t['leechers'], 
-                    t['size'], 
-                    t.get('url', '')
-                ))
-    
-    if insert_data:
-        async with aiosqlite.connect(db_path) as db:
-            await db.executemany("""
-                INSERT INTO torrents (tmdb_id, torrent_title, magnet, seeders, leechers, size, url)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, insert_data)
-            await db.commit()
+    """Раздачи пачки — через merge_torrents (torrents и каталог релизов, сжатые магнеты)"""
+    found = [res for res in results_list if res['torrents']]
+    for res in found:
+        logger.info(f"[WRITE] ID: {res['tmdb_id']} ({res['movie_name']}) -> Found {len(res['torrents'])} valid torrents")
+    if not found: return
+
+    async with aiosqlite.connect(db_path) as db:
+        await merge_torrents(db, found)
+        await db.commit()
 
 # ---------------- Main ----------------
 
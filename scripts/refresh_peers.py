@@ -0,0 +1,160 @@
+import asyncio
+import argparse
+import logging
+import aiosqlite
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from torrent_merge import MAGNET_SQL, ensure_info_hash_column, ensure_tracker_sets, update_peers, update_peers_by_hash
+
+# --- БЫСТРОЕ ОБНОВЛЕНИЕ СИДОВ ---
+# Между полными прогонами updat.py у новинок меняются только сиды/пиры.
+# Этот режим опрашивает трекер по фильмам текущего года, у которых раздачи уже есть,
+# и одним UPDATE переписывает seeders/leechers по info_hash. Раздачи не добавляются
+# и не удаляются, updated_at / журнал промахов / torrent_details не трогаются.
+# --source udp спрашивает не сайт, а сами трекеры из магнетов (BEP 15, udp_tracker.py):
+# пакетами по 74 хеша, поэтому за минуты проходит хоть всю таблицу (--year 0).
+# Запуск раз в час из корня проекта (cron):
+#   0 * * * * cd /path/to/cinetorrent && python3 scripts/refresh_peers.py
+BASE_DIR = Path(os.getcwd())
+TMDB_DB_PATH = BASE_DIR / "tmdb_data" / "tmdb_minimal_no_original.db"
+TORRENTS_DB_PATH = BASE_DIR / "tmdb_data" / "torrents.db"
+
+LOG_FILE = "peers_refresh.log"
+MAX_CONCURRENT = 20        # HTTP-запросов одновременно
+ENGINE = "http"            # Для сидов JSON API хватает, браузер не нужен
+JACRED_URL = "https://jacred.xyz"
+
+# --- ЛОГИРОВАНИЕ ---
+# Дозапись: ежечасные запуски не должны затирать историю друг друга
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[
+        logging.FileHandler(LOG_FILE, mode='a', encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+logging.getLogger("aiosqlite").setLevel(logging.WARNING)
+
+def create_parser(engine, max_concurrent, base_url=JACRED_URL):
+    """Копия create_parser из updat.py (без adaptive): импорт updat перезаписал бы его лог"""
+    if engine == 'http':
+        from jacred_http import JacredHttpParser
+        return JacredHttpParser(max_concurrent=max_concurrent, base_url=base_url)
+    from jacred_browser import JacredParser
+    return JacredParser(max_concurrent=max_concurrent, base_url=base_url)
+
+async def load_targets(db, min_year):
+    """Фильмы с year >= min_year, у которых в torrents уже есть раздачи"""
+    await db.execute("ATTACH DATABASE ? AS tmdb", (str(TMDB_DB_PATH),))
+    try:
+        async with db.execute("""
+            SELECT i.id, i.title, i.kp_id, i.year FROM tmdb.items_minimal i
+            WHERE i.year >= ? AND EXISTS (SELECT 1 FROM torrents t WHERE t.tmdb_id = i.id)
+        """, (min_year,)) as cursor:
+            rows = await cursor.fetchall()
+    finally:
+        await db.execute("DETACH DATABASE tmdb")
+
+    targets = []
+    for tmdb_id, title, kp_id, year in rows:
+        if kp_id: targets.append((tmdb_id, f"kp{kp_id}", year))
+        elif title: targets.append((tmdb_id, title, year))
+    return targets
+
+async def load_magnets(db, min_year):
+    """Полные магнеты (с трекерами из tracker_sets) раздач фильмов с year >= min_year (0 — вся таблица)"""
+    magnet = MAGNET_SQL.format(t='torrents')
+    if not min_year:
+        async with db.execute(f"SELECT {magnet} FROM torrents") as cursor:
+            return [row[0] for row in await cursor.fetchall()]
+    await db.execute("ATTACH DATABASE ? AS tmdb", (str(TMDB_DB_PATH),))
+    try:
+        async with db.execute(
+            f"SELECT {magnet} FROM torrents WHERE tmdb_id IN (SELECT id FROM tmdb.items_minimal WHERE year >= ?)",
+            (min_year,)
+        ) as cursor:
+            return [row[0] for row in await cursor.fetchall()]
+    finally:
+        await db.execute("DETACH DATABASE tmdb")
+
+async def refresh_from_site(db, args):
+    targets = await load_targets(db, args.year)
+    if not targets:
+        logger.info(f"✅ Фильмов {args.year}+ года с раздачами нет")
+        return None
+    logger.info(f"🌱 Обновление сидов: {len(targets)} фильмов {args.year}+ года, движок {args.engine}")
+
+    parser = create_parser(args.engine, args.concurrency, args.base_url)
+    await parser.start()
+    try:
+        results = await asyncio.gather(*[parser.parse_movie(*t) for t in targets])
+    finally:
+        await parser.stop()
+    ok = [r for r in results if not r.get('failed')]
+
+    updated, matched, unknown = await update_peers(db, ok)
+    return (f"Раздач обновлено {updated}, без изменений {matched - updated}, "
+            f"новых (ждут полного прогона) {unknown}; ошибок трекера {len(results) - len(ok)}")
+
+async def refresh_from_trackers(db, args):
+    from udp_tracker import group_by_tracker, report, scrape_all
+
+    magnets = await load_magnets(db, args.year)
+    groups = group_by_tracker(magnets, override=args.udp_tracker)
+    hashes = len({h for group in groups.values() for h in group})
+    if not hashes:
+        logger.info("✅ Раздач с UDP-трекерами нет")
+        return None
+    logger.info(f"📡 UDP scrape: {hashes} хешей ({len(magnets)} раздач) у {len(groups)} трекеров")
+
+    peers, trackers = await scrape_all(groups, timeout=args.udp_timeout)
+    logger.info(report(trackers))
+    updated = await update_peers_by_hash(db, peers)
+    return f"Хешей с ответом {len(peers)} из {hashes}, строк обновлено {updated}"
+
+async def main():
+    ap = argparse.ArgumentParser(description="Обновление только сидов/пиров существующих раздач (без полного парсинга)")
+    ap.add_argument('--year', type=int, default=datetime.now().year, help="Минимальный год выхода (по умолчанию текущий)")
+    ap.add_argument('--engine', choices=['browser', 'http'], default=ENGINE)
+    ap.add_argument('--base-url', default=JACRED_URL)
+    ap.add_argument('--concurrency', type=int, default=MAX_CONCURRENT)
+    ap.add_argument('--source', choices=['site', 'udp'], default='site',
+                    help="site — поиск на трекер-агрегаторе, udp — scrape трекеров из магнетов")
+    ap.add_argument('--udp-tracker', default=None, metavar='URL',
+                    help="Спрашивать все хеши у одного трекера (например, udp://127.0.0.1:6969 двойника)")
+    ap.add_argument('--udp-timeout', type=float, default=3.0, help="Первый таймаут UDP-запроса, сек")
+    args = ap.parse_args()
+
+    if not TORRENTS_DB_PATH.exists() or not TMDB_DB_PATH.exists():
+        logger.error("❌ Нет torrents.db или базы TMDB — сначала полный прогон updat.py")
+        return
+
+    started = time.monotonic()
+    async with aiosqlite.connect(TORRENTS_DB_PATH) as db:
+        await db.execute("PRAGMA journal_mode=WAL;")
+        # Сиды сопоставляются по колонке info_hash: строки без нее не обновятся
+        await ensure_info_hash_column(db)
+        await ensure_tracker_sets(db)
+        async with db.execute("SELECT COUNT(*) FROM torrents WHERE info_hash IS NULL") as cursor:
+            missing = (await cursor.fetchone())[0]
+        if missing:
+            logger.warning(f"⚠️ У {missing} раздач не заполнен info_hash — запустите scripts/backfill_info_hash.py")
+        if args.source == 'udp':
+            line = await refresh_from_trackers(db, args)
+        else:
+            line = await refresh_from_site(db, args)
+        if line is None: return
+        await db.commit()
+
+    logger.info(f"🏁 {line}. Всего {time.monotonic() - started:.1f} с")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nПрервано.")
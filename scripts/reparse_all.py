@@ -0,0 +1,253 @@
+import argparse
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from metadata_rows import (DETAILS_INSERT_SQL, calculate_bitrate, details_row, ensure_details_schema,
+                           info_hash_of, parse_size_to_bytes, register_version, vocabulary_changes)
+from title_analyzer import AUDIO_TRACKS, AUDIO_TRACKS_DB, TitleAnalyzer
+from title_cache import CACHE_INSERT_SQL, TitleCache, ensure_table, purge_stale, title_hash
+from torrent_merge import MAGNET_HASH_SQL, RELEASE_RUNTIME_SQL, catalog_exists, info_hash_select
+
+# --- КОНФИГУРАЦИЯ ---
+# Полный перепарсинг метаданных всей таблицы torrents на всех ядрах:
+# таблица режется на диапазоны rowid, диапазоны разбирают процессы пула
+# (каждый читает свой кусок сам, с длительностью фильма через ATTACH),
+# а готовые строки пишет в torrent_details один процесс большими executemany.
+# Разбор идет через кэш названий (title_cache.py): у каждого процесса свой LRU и
+# чтение title_analysis, новые результаты пишет тот же писатель.
+# По умолчанию проход инкрементальный: строка torrent_details переписывается, только если
+# у нее другая версия анализатора, другое название (title_hash), размер или битрейт.
+# Если новая версия отличается от старой лишь словарями, строки старой версии без
+# добавленных/убранных слов в названии не разбираются, а после прохода получают
+# новую версию одним UPDATE.
+BASE_DIR = Path(os.getcwd())
+TMDB_DB_PATH = BASE_DIR / "tmdb_data" / "tmdb_minimal_no_original.db"
+TORRENTS_DB_PATH = BASE_DIR / "tmdb_data" / "torrents.db"
+DATA_DB_PATH = BASE_DIR / "tmdb_data" / "torrents_data.db"
+
+CHUNK_ROWS = 20000       # rowid на одну задачу пула
+WRITE_BATCH = 50000      # Строк на одну транзакцию записи
+VOCABULARIES = {'base': AUDIO_TRACKS, 'db': AUDIO_TRACKS_DB}
+
+# --- ВОРКЕР ---
+# info_hash и размер в байтах (если колонки уже есть), длительность фильма (если есть база TMDB)
+# и сохраненная строка torrent_details (в инкрементальном режиме)
+RANGE_SQL = """
+    SELECT t.magnet, {info_hash}, t.torrent_title, t.size, {size_bytes}, {runtime}, {stored} FROM torrents t {joins}
+    WHERE t.rowid >= ? AND t.rowid < ? ORDER BY t.rowid
+"""
+# С каталогом (build_catalog.py) диапазоны идут по releases: каждый хеш разбирается один раз,
+# длительность — наибольшая среди фильмов релиза, дублей и зависимости от порядка нет
+RELEASES_RANGE_SQL = """
+    SELECT r.magnet, r.info_hash, r.title, r.size, r.size_bytes, {runtime}, {stored} FROM releases r {joins}
+    WHERE r.rowid >= ? AND r.rowid < ? ORDER BY r.rowid
+"""
+RUNTIME_JOIN = "LEFT JOIN tmdb.items_minimal i ON i.id = t.tmdb_id"
+STORED_COLUMNS = "d.title_hash, d.parser_version, d.size, d.bitrate"
+DETAILS_JOIN = "LEFT JOIN data.torrent_details d ON d.info_hash = {hash}"
+# Хеши, встречающиеся в нескольких строках torrents: их строка зависит от порядка записи
+# (побеждает последняя по rowid), поэтому они всегда переписываются целиком
+DUPLICATE_HASHES_SQL = """
+    SELECT {hash} AS h FROM torrents t
+    WHERE t.magnet LIKE '%btih:%' GROUP BY h HAVING COUNT(*) > 1
+"""
+
+def hash_sql(conn):
+    """SQL-выражение хеша строки torrents t: колонка info_hash, а до backfill — хеш из hex-магнета"""
+    from_magnet = MAGNET_HASH_SQL.format(col='t.magnet')
+    if info_hash_select(conn) == 'NULL': return from_magnet
+    return f"COALESCE(t.info_hash, {from_magnet})"
+
+_conn = None
+_sql = None
+_cache = None
+_changes = None
+_duplicates = None
+
+def init_worker(torrents_db, tmdb_db, data_db, vocab, use_cache, incremental, changes, duplicates, catalog):
+    """Одно соединение, один скомпилированный анализатор и один кэш на процесс"""
+    global _conn, _sql, _cache, _changes, _duplicates
+    _conn = sqlite3.connect(f"file:{torrents_db}?mode=ro", uri=True)
+    runtime, stored, joins = "NULL", "NULL, NULL, NULL, NULL", []
+    columns = {row[1] for row in _conn.execute("PRAGMA table_info(torrents)")}
+    size_bytes = "t.size_bytes" if 'size_bytes' in columns else "NULL"
+    info_hash = info_hash_select(_conn, 't.info_hash')
+    if Path(tmdb_db).exists():
+        _conn.execute("ATTACH DATABASE ? AS tmdb", (f"file:{tmdb_db}?mode=ro",))
+        runtime = RELEASE_RUNTIME_SQL.format(r='r') if catalog else "i.runtime"
+        if not catalog: joins.append(RUNTIME_JOIN)
+    if incremental:
+        _conn.execute("ATTACH DATABASE ? AS data", (f"file:{data_db}?mode=ro",))
+        stored = STORED_COLUMNS
+        joins.append(DETAILS_JOIN.format(hash='r.info_hash' if catalog else hash_sql(_conn)))
+    if catalog:
+        _sql = RELEASES_RANGE_SQL.format(runtime=runtime, stored=stored, joins=" ".join(joins))
+    else:
+        _sql = RANGE_SQL.format(info_hash=info_hash, size_bytes=size_bytes, runtime=runtime, stored=stored,
+                                joins=" ".join(joins))
+    cache_conn = sqlite3.connect(f"file:{data_db}?mode=ro", uri=True) if use_cache else None
+    _cache = TitleCache(cache_conn, TitleAnalyzer(VOCABULARIES[vocab]))
+    _changes = changes
+    _duplicates = duplicates
+
+def is_current(info_hash, title, size_str, size_bytes, runtime, stored):
+    """Строка torrent_details уже совпадает с тем, что даст разбор (или даст после UPDATE версии)"""
+    stored_hash, stored_version, stored_size, stored_bitrate = stored
+    if stored_version is None or info_hash in _duplicates: return False
+    if stored_version != _cache.version:
+        changed = _changes.get(stored_version)
+        if changed is None: return False
+        lowered = (title or "").lower()
+        if any(word in lowered for word in changed): return False
+    if stored_hash != title_hash(title or ""): return False
+    if size_bytes is None: size_bytes = parse_size_to_bytes(size_str)
+    return stored_size == size_bytes and stored_bitrate == calculate_bitrate(size_bytes, runtime or 0)
+
+def parse_range(bounds):
+    """
+    Строки torrent_details для rowid torrents (или releases) в [lo, hi):
+    (строки, прочитано, пропущено как актуальные, новые строки кэша, счетчики кэша за диапазон)
+    """
+    rows = []
+    read = skipped = 0
+    before = dict(_cache.stats)
+    for magnet, stored_hash, title, size_str, size_bytes, runtime, *stored in _conn.execute(_sql, bounds):
+        read += 1
+        info_hash = info_hash_of(magnet, stored_hash)
+        if not info_hash: continue
+        if is_current(info_hash, title, size_str, size_bytes, runtime, stored):
+            skipped += 1
+            continue
+        rows.append(details_row(info_hash, title, size_str, runtime, _cache, size_bytes))
+    stats = {k: v - before[k] for k, v in _cache.stats.items()}
+    return rows, read, skipped, _cache.drain(), stats
+
+# --- ЗАПИСЬ ---
+def duplicate_hashes(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return frozenset(row[0] for row in conn.execute(DUPLICATE_HASHES_SQL.format(hash=hash_sql(conn))))
+
+def rowid_ranges(db_path, chunk, table='torrents'):
+    with sqlite3.connect(db_path) as conn:
+        lo, hi = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}").fetchone()
+    if lo is None: return []
+    return [(start, min(start + chunk, hi + 1)) for start in range(lo, hi + 1, chunk)]
+
+def main():
+    ap = argparse.ArgumentParser(description="Параллельный перепарсинг метаданных всех раздач в torrent_details")
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    ap.add_argument('--chunk', type=int, default=CHUNK_ROWS, help="rowid на задачу")
+    ap.add_argument('--vocab', choices=list(VOCABULARIES), default='db',
+                    help="Словарь озвучек: db — как fill_missing_metadata.py (с меткой ДБ), base — как updat.py")
+    ap.add_argument('--dry-run', action='store_true', help="Только разбор, без записи (замер масштабирования)")
+    ap.add_argument('--full', action='store_true',
+                    help="Переписать все строки, не глядя на версию анализатора и title_hash")
+    ap.add_argument('--no-cache', action='store_true', help="Разбирать все названия заново, мимо title_analysis")
+    ap.add_argument('--purge-stale', action='store_true',
+                    help="Удалить из title_analysis результаты других версий анализатора")
+    args = ap.parse_args()
+
+    if not TORRENTS_DB_PATH.exists():
+        print(f"❌ База {TORRENTS_DB_PATH} не найдена!")
+        return
+    with sqlite3.connect(TORRENTS_DB_PATH) as conn:
+        catalog = catalog_exists(conn)
+    table = 'releases' if catalog else 'torrents'
+    ranges = rowid_ranges(TORRENTS_DB_PATH, args.chunk, table)
+    print(f"🚀 Перепарсинг {table}: {len(ranges)} диапазонов rowid по {args.chunk}, процессов {args.workers}, "
+          f"словарь {args.vocab}")
+
+    # Таблицы создаются до старта пула: процессы открывают базу только на чтение
+    analyzer = TitleAnalyzer(VOCABULARIES[args.vocab])
+    conn_data = sqlite3.connect(DATA_DB_PATH)
+    conn_data.execute("PRAGMA journal_mode = WAL;")
+    conn_data.execute("PRAGMA synchronous = NORMAL;")
+    ensure_details_schema(conn_data)
+    ensure_table(conn_data)
+    register_version(conn_data, analyzer)
+    conn_data.commit()
+    changes = {} if args.full else vocabulary_changes(conn_data, analyzer)
+    duplicates = frozenset() if args.full or catalog else duplicate_hashes(TORRENTS_DB_PATH)
+    if not args.full:
+        print(f"🔎 Версия анализатора {analyzer.version}; старых версий, отличающихся только словарями: {len(changes)}, "
+              f"хешей в нескольких строках: {len(duplicates)}")
+        for version, words in changes.items():
+            print(f"    ↳ {version}: {', '.join(sorted(words)) or '—'}")
+    if args.dry_run:
+        conn_data.close()
+        conn_data = None
+
+    started = time.monotonic()
+    read = written = skipped = cached = 0
+    write_time = 0.0
+    pending = []
+    cache_pending = []
+    cache_stats = {'lru': 0, 'db': 0, 'parsed': 0}
+    # map отдает результаты по порядку диапазонов: при дублях info_hash побеждает
+    # последняя строка по rowid — ровно как при последовательном проходе
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                             initargs=(str(TORRENTS_DB_PATH), str(TMDB_DB_PATH), str(DATA_DB_PATH),
+                                       args.vocab, not args.no_cache, not args.full, changes, duplicates,
+                                       catalog)) as pool:
+        for rows, chunk_read, chunk_skipped, cache_rows, stats in pool.map(parse_range, ranges):
+            read += chunk_read
+            skipped += chunk_skipped
+            for k, v in stats.items(): cache_stats[k] += v
+            if args.dry_run:
+                written += len(rows)
+            else:
+                pending.extend(rows)
+                if not args.no_cache: cache_pending.extend(cache_rows)
+            if len(pending) >= WRITE_BATCH:
+                t0 = time.monotonic()
+                conn_data.executemany(DETAILS_INSERT_SQL, pending)
+                conn_data.executemany(CACHE_INSERT_SQL, cache_pending)
+                conn_data.commit()
+                write_time += time.monotonic() - t0
+                written += len(pending)
+                cached += len(cache_pending)
+                pending, cache_pending = [], []
+            elapsed = time.monotonic() - started
+            print(f"\r⚡ Прочитано: {read} | Актуальных: {skipped} | Записано: {written} | "
+                  f"Скорость: {int(read / elapsed)} шт/сек", end="")
+    if conn_data:
+        if pending or cache_pending:
+            t0 = time.monotonic()
+            conn_data.executemany(DETAILS_INSERT_SQL, pending)
+            conn_data.executemany(CACHE_INSERT_SQL, cache_pending)
+            conn_data.commit()
+            write_time += time.monotonic() - t0
+            written += len(pending)
+            cached += len(cache_pending)
+        # Проход завершен: все строки старых версий, которых касались изменения словарей, уже
+        # переписаны, у остальных разбор не меняется — им достаточно новой версии
+        bumped = 0
+        for version in changes:
+            bumped += conn_data.execute("UPDATE torrent_details SET parser_version = ? WHERE parser_version = ?",
+                                        (analyzer.version, version)).rowcount
+        conn_data.commit()
+        if bumped:
+            print(f"\n🏷️ Версия обновлена без разбора у {bumped} строк")
+        if args.purge_stale:
+            print(f"\n🧹 Удалено устаревших результатов разбора: {purge_stale(conn_data, analyzer.version)}")
+            conn_data.commit()
+        conn_data.close()
+
+    elapsed = time.monotonic() - started
+    print(f"\n\n✅ ГОТОВО! Раздач: {read}, актуальных: {skipped}, "
+          f"строк метаданных: {written}{' (без записи)' if args.dry_run else ''}. "
+          f"{elapsed:.1f} с ({int(read / elapsed) if elapsed else 0} шт/сек), из них запись {write_time:.1f} с")
+    total = sum(cache_stats.values())
+    if not args.no_cache and total:
+        print(f"🧠 Кэш названий: из памяти {cache_stats['lru']}, из базы {cache_stats['db']}, "
+              f"разобрано {cache_stats['parsed']} ({(cache_stats['lru'] + cache_stats['db']) / total:.0%} попаданий), "
+              f"новых записей {cached}")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nПрервано.")
@@ -1,116 +1,17 @@
 import sqlite3
-import re
-import json
 import sys
 import os
 from pathlib import Path
 
+from metadata_rows import DETAILS_INSERT_SQL, details_row, ensure_details_schema, info_hash_of
+from torrent_merge import info_hash_select
+
 # --- КОНФИГУРАЦИЯ ПУТЕЙ ---
 BASE_DIR = Path(os.getcwd())
 TMDB_DB_PATH = BASE_DIR / "tmdb_data" / "tmdb_minimal_no_original.db"
 TORRENTS_DB_PATH = BASE_DIR / "tmdb_data" / "torrents.db"
 DATA_DB_PATH = BASE_DIR / "tmdb_data" / "torrents_data.db"
 
-# --- ТВОИ НАСТРОЙКИ REGEX ---
-REGEX_CONFIG = {
-    'resolution': {
-        'pattern': re.compile(r'\b(3840x2160|4K|2160p|1920x1080|1080p|1280x720|720p)\b', re.IGNORECASE), 
-        'type': 'resolution'
-    },
-    'audio_channels': {
-        'pattern': re.compile(r'\b(5\.1|7\.1)\b', re.IGNORECASE), 
-        'type': 'audio_channels'
-    },
-    'quality': {
-        'pattern': re.compile(r'\b(HEVC|HDR10\+|HDR10|HDR|Dolby Vision|DV|BDRemux|BluRay|Web-DL|Hybrid|IMAX)\b', re.IGNORECASE), 
-        'type': 'quality'
-    },
-    'audio_track': {
-        'pattern': re.compile(r'\b('
-                              # --- СОВРЕМЕННЫЕ СТУДИИ / РЕЛИЗ ГРУППЫ ---
-                              r'Red Head Sound|RHS|Bluebird|HDRezka|Rezka|Jaskier|'
-                              r'TVShows|NewStudio|BaibaKo|AlexFilm|LostFilm|Кубик в [Кк]убе|'
-                              r'Octopus|LineFilm|Cold Film|AlphaProject|TVG|Good People|'
-                              r'Pazl Voice|Ultradox|RuDub|Sound Film|ViruseProject|IdeaFilm|Novamedia|Кириллица|'
-                              r'Kerob|Sunshine Studio|NewComers|LakeFilms|HamsterStudio|Paramount Comedy|'
-                              r'Кураж-Бамбей|Kuraj-Bambey|Сыендук|Syenduk|'
-                              # --- АНИМЕ ---
-                              r'AniLibria|AniDUB|AnimeVost|SHIZA Project|Jam Club|Studio Band|Студийная Банда|'
-                              r'SovetRomantica|Kansai|AniStar|AniFilm|Dream Cast|AniMaunt|AniRise|Amazing Dubbing|'
-                              # --- АВТОРСКИЕ / VHS (ЛЕГЕНДЫ) ---
-                              r'Гаврилов|Михалев|Володарский|Сербин|Живов|Пучков|Гоблин|Goblin|'
-                              r'Дохалов|Визгунов|Карцев|Иванов|Санаев|Есарев|Штейн|Либерти|Вартан|Горчаков|'
-                              r'Котов|Яковлев|Гланц|Glanz|'
-                              # --- ОФИЦИАЛЬНЫЕ / ПРОФЕССИОНАЛЬНЫЕ ---
-                              r'Пифагор|Flarrow Films|FF|Videofilm|Мосфильм|Невафильм|SDI Media|'
-                              r'Киномания|Tycoon|CPIG|Позитив|Видеосервис|Varus Video|West Video|'
-                              r'iTunes|Amedia|Netflix|'
-                              # --- ОБЩИЕ МЕТКИ ---
-                              r'Дубляж|Dub|MVO|DVO|AVO|Original|ENG|RUS|UKR'
-                              r')\b', re.IGNORECASE), 
-        'type': 'audio_lang'
-    },
-    'subtitles': {
-        'pattern': re.compile(r'Sub\s*[:(]\s*([^)]+)\)?', re.IGNORECASE), 
-        'type': 'subtitles'
-    }
-}
-
-# --- ТВОИ ФУНКЦИИ ---
-def parse_size_to_bytes(size_str):
-    if not size_str: return 0
-    match = re.search(r'(\d+(\.\d+)?)\s*(GB|MB|KB|TB|ГБ|МБ|КБ|ТБ)', str(size_str), re.IGNORECASE)
-    if not match: return 0
-    val = float(match.group(1))
-    unit = match.group(3).upper().replace('ГБ','GB').replace('МБ','MB').replace('ТБ','TB').replace('КБ','KB')
-    if unit == 'TB': val *= 1024**4
-    elif unit == 'GB': val *= 1024**3
-    elif unit == 'MB': val *= 1024**2
-    elif unit == 'KB': val *= 1024
-    return int(val)
-
-def calculate_bitrate(size_bytes, runtime_minutes):
-    if not size_bytes or not runtime_minutes or runtime_minutes <= 0: return None
-    size_bits = size_bytes * 8
-    seconds = runtime_minutes * 60
-    mbps = (size_bits / seconds) / 1_000_000
-    return round(mbps, 2)
-
-def analyze_title(title):
-    if not title: return {}
-    found_tags = set()
-    result = {'resolution': 'N/A', 'audio_tags': [], 'quality_tags': [], 'hdr_type': 'SDR', 'codec': None}
-    for key, config in REGEX_CONFIG.items():
-        matches = config['pattern'].finditer(title)
-        for match in matches:
-            content = match.group(0)
-            if key == 'subtitles':
-                inner = match.group(1)
-                subs = re.split(r'[,+]', inner)
-                for s in subs:
-                    clean_tag = f"Sub: {s.strip()}"
-                    if 'rus' in s.lower(): clean_tag = "Sub: Rus"
-                    elif 'eng' in s.lower(): clean_tag = "Sub: Eng"
-                    if clean_tag.lower() not in found_tags:
-                        found_tags.add(clean_tag.lower())
-                        result['audio_tags'].append(clean_tag)
-                continue
-            clean_content = content.strip()
-            if clean_content.lower() in found_tags: continue
-            found_tags.add(clean_content.lower())
-            if config['type'] == 'resolution': result['resolution'] = clean_content
-            elif config['type'] == 'quality': result['quality_tags'].append(clean_content)
-            elif config['type'] in ['audio_lang', 'audio_channels']: result['audio_tags'].append(clean_content)
-    res = result['resolution']
-    if res and res.lower() == '4k': result['resolution'] = '4K'
-    elif not res: result['resolution'] = 'N/A'
-    quality_combined = " ".join(result['quality_tags'])
-    if re.search(r'Dolby|DV', quality_combined, re.IGNORECASE): result['hdr_type'] = 'Dolby Vision'
-    elif re.search(r'HDR', quality_combined, re.IGNORECASE): result['hdr_type'] = 'HDR'
-    if re.search(r'x265|h265|hevc', title, re.IGNORECASE): result['codec'] = 'HEVC'
-    elif re.search(r'x264|h264|avc', title, re.IGNORECASE): result['codec'] = 'H.264'
-    return result
-
 # --- ОСНОВНАЯ ЛОГИКА ---
 def reparse_movie(tmdb_id):
     print(f"🔄 Запуск обработки метаданных для ID: {tmdb_id}")
@@ -137,7 +38,7 @@ def reparse_movie(tmdb_id):
     if os.path.exists(TORRENTS_DB_PATH):
         with sqlite3.connect(TORRENTS_DB_PATH) as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT magnet, torrent_title, size FROM torrents WHERE tmdb_id = ?", (tmdb_id,))
+            cursor.execute(f"SELECT magnet, torrent_title, size, {info_hash_select(conn)} FROM torrents WHERE tmdb_id = ?", (tmdb_id,))
             torrents = cursor.fetchall()
     else:
         print(f"❌ База {TORRENTS_DB_PATH} не найдена!")
@@ -152,34 +53,14 @@ def reparse_movie(tmdb_id):
     # 3. Подготовка данных для DATA DB
     to_insert = []
     
-    for magnet, title, size_str in torrents:
-        # Извлекаем Info Hash из магнита
-        hm = re.search(r'btih:([a-zA-Z0-9]{40})', magnet)
-        if not hm:
+    for magnet, title, size_str, stored_hash in torrents:
+        # Хеш из колонки info_hash, у старых строк — из магнета (hex или base32)
+        info_hash = info_hash_of(magnet, stored_hash)
+        if not info_hash:
             continue
-        info_hash = hm.group(1).upper()
-        
-        # Анализ
-        meta = analyze_title(title or "")
-        size_bytes = parse_size_to_bytes(size_str)
-        bitrate = calculate_bitrate(size_bytes, runtime)
-        
-        # Формирование строки аудио
-        audio_str = " | ".join(meta['audio_tags'])
         
-        # Данные для вставки
-        row_data = (
-            info_hash,
-            meta['resolution'],
-            size_bytes,
-            json.dumps(['(title_parse)']), # Заглушка для файлов
-            meta['hdr_type'],
-            'mkv', # Предполагаем mkv, так как парсим только заголовок
-            meta['codec'],
-            bitrate,
-            audio_str
-        )
-        to_insert.append(row_data)
+        # Анализ, размер и битрейт — общая строка metadata_rows (с title_hash и версией анализатора)
+        to_insert.append(details_row(info_hash, title, size_str, runtime))
 
     # 4. Запись в DATA DB
     if to_insert:
@@ -188,25 +69,11 @@ def reparse_movie(tmdb_id):
             # Включаем WAL для быстродействия, если нужно
             conn_data.execute("PRAGMA journal_mode = WAL;") 
             
-            # Создаем таблицу, если её нет
-            conn_data.execute("""CREATE TABLE IF NOT EXISTS torrent_details (
-                info_hash TEXT PRIMARY KEY, 
-                resolution TEXT, 
-                size INTEGER, 
-                files TEXT, 
-                hdr_type TEXT, 
-                file_type TEXT, 
-                codec TEXT, 
-                bitrate REAL, 
-                audio TEXT
-            )""")
+            # Создаем таблицу или дописываем новые колонки в старую
+            ensure_details_schema(conn_data)
             
             # Вставляем данные (REPLACE, чтобы обновить старые данные)
-            conn_data.executemany("""
-                INSERT OR REPLACE INTO torrent_details 
-                (info_hash, resolution, size, files, hdr_type, file_type, codec, bitrate, audio) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, to_insert)
+            conn_data.executemany(DETAILS_INSERT_SQL, to_insert)
             
             conn_data.commit()
             conn_data.close()
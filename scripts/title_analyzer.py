@@ -0,0 +1,139 @@
+import hashlib
+import re
+
+# --- АНАЛИЗ НАЗВАНИЯ РАЗДАЧИ ---
+# Раньше analyze_title гонял по названию пять finditer (по одному на категорию REGEX_CONFIG),
+# потом еще четыре re.search для HDR и кодека. Здесь словари собраны в одну регулярку
+# с именованными группами, а каждый словарь свернут в префиксное дерево (h(?:evc|dr(?:10...)?)
+# вместо сотни альтернатив подряд): один проход по строке раскладывает токены по категориям,
+# результат совпадает с прежним (порядок категорий, дубли, последнее разрешение и т.д.).
+# Словари — обычные строки, регистр не важен.
+ANALYZER_VERSION = 1           # Поднять при изменении логики разбора (правка словарей меняет версию сама)
+RESOLUTIONS = ['3840x2160', '4K', '2160p', '1920x1080', '1080p', '1280x720', '720p']
+AUDIO_CHANNELS = ['5.1', '7.1']
+QUALITY = ['HEVC', 'HDR10+', 'HDR10', 'HDR', 'Dolby Vision', 'DV', 'BDRemux', 'BluRay', 'Web-DL', 'Hybrid', 'IMAX']
+AUDIO_TRACKS = [
+    # --- СОВРЕМЕННЫЕ СТУДИИ / РЕЛИЗ ГРУППЫ ---
+    'Red Head Sound', 'RHS', 'Bluebird', 'HDRezka', 'Rezka', 'Jaskier',
+    'TVShows', 'NewStudio', 'BaibaKo', 'AlexFilm', 'LostFilm', 'Кубик в Кубе',
+    'Octopus', 'LineFilm', 'Cold Film', 'AlphaProject', 'TVG', 'Good People',
+    'Pazl Voice', 'Ultradox', 'RuDub', 'Sound Film', 'ViruseProject', 'IdeaFilm', 'Novamedia', 'Кириллица',
+    'Kerob', 'Sunshine Studio', 'NewComers', 'LakeFilms', 'HamsterStudio', 'Paramount Comedy',
+    'Кураж-Бамбей', 'Kuraj-Bambey', 'Сыендук', 'Syenduk',
+    # --- АНИМЕ ---
+    'AniLibria', 'AniDUB', 'AnimeVost', 'SHIZA Project', 'Jam Club', 'Studio Band', 'Студийная Банда',
+    'SovetRomantica', 'Kansai', 'AniStar', 'AniFilm', 'Dream Cast', 'AniMaunt', 'AniRise', 'Amazing Dubbing',
+    # --- АВТОРСКИЕ / VHS (ЛЕГЕНДЫ) ---
+    'Гаврилов', 'Михалев', 'Володарский', 'Сербин', 'Живов', 'Пучков', 'Гоблин', 'Goblin',
+    'Дохалов', 'Визгунов', 'Карцев', 'Иванов', 'Санаев', 'Есарев', 'Штейн', 'Либерти', 'Вартан', 'Горчаков',
+    'Котов', 'Яковлев', 'Гланц', 'Glanz',
+    # --- ОФИЦИАЛЬНЫЕ / ПРОФЕССИОНАЛЬНЫЕ ---
+    'Пифагор', 'Flarrow Films', 'FF', 'Videofilm', 'Мосфильм', 'Невафильм', 'SDI Media',
+    'Киномания', 'Tycoon', 'CPIG', 'Позитив', 'Видеосервис', 'Varus Video', 'West Video',
+    'iTunes', 'Amedia', 'Netflix',
+    # --- ОБЩИЕ МЕТКИ ---
+    'Дубляж', 'Dub', 'MVO', 'DVO', 'AVO', 'Original', 'ENG', 'RUS', 'UKR',
+]
+# Словарь auto_update_2025.py / fill_missing_metadata.py / 1.py: с меткой "ДБ"
+AUDIO_TRACKS_DB = AUDIO_TRACKS[:AUDIO_TRACKS.index('SDI Media') + 1] + ['ДБ'] + AUDIO_TRACKS[AUDIO_TRACKS.index('SDI Media') + 1:]
+
+# Субтитры захватывают все до ')' и могут перекрывать другие токены, поэтому в общем
+# проходе ищется только начало "Sub:" / "Sub(", а сам блок дочитывается отдельно.
+SUBTITLES_RE = re.compile(r'Sub\s*[:(]\s*([^)]+)\)?', re.IGNORECASE)
+SUB_SPLIT_RE = re.compile(r'[,+]')
+
+def trie_pattern(words):
+    """
+    Словарь -> регулярка-дерево по общим префиксам. Более длинное продолжение пробуется
+    первым (HDR10+ раньше HDR10 и HDR) — в словарях длинные варианты и так стоят первыми,
+    поэтому с \\b на концах совпадения те же, что у плоской альтернативы.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word.lower():
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def emit(node):
+        alts = [re.escape(ch) + emit(child) for ch, child in node.items() if ch]
+        if not alts: return ''
+        body = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+        return f'(?:{body})?' if '' in node else body
+    return emit(trie)
+
+class TitleAnalyzer:
+    """
+    analyze_title одной регуляркой. Экземпляр вызывается как функция:
+    analyze_title = TitleAnalyzer(); analyze_title("Фильм 2160p HDR | MVO").
+    """
+    def __init__(self, audio_tracks=AUDIO_TRACKS):
+        # Опережающая проверка первого символа отсекает большинство позиций без перебора веток
+        words = RESOLUTIONS + AUDIO_CHANNELS + QUALITY + list(audio_tracks) + ['Sub']
+        self.vocabulary = {'resolution': RESOLUTIONS, 'audio_channels': AUDIO_CHANNELS,
+                           'quality': QUALITY, 'audio_track': list(audio_tracks)}
+        # Версия для кэшей разбора: номер логики + отпечаток словарей
+        self.version = f"{ANALYZER_VERSION}:{hashlib.sha1('|'.join(words).encode('utf-8')).hexdigest()[:8]}"
+        first = {ch for w in words for ch in (w[0].lower(), w[0].upper())}
+        self.pattern = re.compile(
+            rf"(?=[{''.join(re.escape(ch) for ch in sorted(first))}])(?:"
+            rf"\b(?:(?P<resolution>{trie_pattern(RESOLUTIONS)})\b"
+            rf"|(?P<audio_channels>{trie_pattern(AUDIO_CHANNELS)})\b"
+            rf"|(?P<quality>{trie_pattern(QUALITY)})\b"
+            rf"|(?P<audio_track>{trie_pattern(audio_tracks)})\b)"
+            r"|(?P<subtitles>Sub\s*[:(]))",
+            re.IGNORECASE
+        )
+
+    def __call__(self, title):
+        if not title: return {}
+        resolutions, channels, quality, tracks, subtitles = [], [], [], [], []
+        buckets = {'resolution': resolutions, 'audio_channels': channels, 'quality': quality,
+                   'audio_track': tracks, 'subtitles': subtitles}
+        sub_end = 0
+        for match in self.pattern.finditer(title):
+            kind = match.lastgroup
+            if kind == 'subtitles':
+                # Как finditer по SUBTITLES_RE: следующий блок ищется после конца предыдущего
+                if match.start() < sub_end: continue
+                sub = SUBTITLES_RE.match(title, match.start())
+                # "Sub:" / "Sub()" без текста после: общий шаблон совпал, SUBTITLES_RE — нет
+                if sub is None: continue
+                sub_end = sub.end()
+                subtitles.append(sub.group(1))
+            else:
+                buckets[kind].append(match.group(kind))
+
+        found_tags = set()
+        result = {'resolution': 'N/A', 'audio_tags': [], 'quality_tags': [], 'hdr_type': 'SDR', 'codec': None}
+        audio_tags = result['audio_tags']
+        for content in resolutions:
+            if content.lower() in found_tags: continue
+            found_tags.add(content.lower())
+            result['resolution'] = content
+        for kind in (channels, quality, tracks):
+            target = result['quality_tags'] if kind is quality else audio_tags
+            for content in kind:
+                if content.lower() in found_tags: continue
+                found_tags.add(content.lower())
+                target.append(content)
+        for inner in subtitles:
+            for s in SUB_SPLIT_RE.split(inner):
+                clean_tag = f"Sub: {s.strip()}"
+                if 'rus' in s.lower(): clean_tag = "Sub: Rus"
+                elif 'eng' in s.lower(): clean_tag = "Sub: Eng"
+                if clean_tag.lower() not in found_tags:
+                    found_tags.add(clean_tag.lower())
+                    audio_tags.append(clean_tag)
+
+        if result['resolution'].lower() == '4k': result['resolution'] = '4K'
+        # Теги качества разделены пробелами, так что подстрока не склеится из двух тегов
+        quality_combined = " ".join(result['quality_tags']).lower()
+        if 'dolby' in quality_combined or 'dv' in quality_combined: result['hdr_type'] = 'Dolby Vision'
+        elif 'hdr' in quality_combined: result['hdr_type'] = 'HDR'
+        lowered = title.lower()
+        if 'x265' in lowered or 'h265' in lowered or 'hevc' in lowered: result['codec'] = 'HEVC'
+        elif 'x264' in lowered or 'h264' in lowered or 'avc' in lowered: result['codec'] = 'H.264'
+        return result
+
+analyze_title = TitleAnalyzer()
@@ -0,0 +1,89 @@
+import hashlib
+import json
+from collections import OrderedDict
+
+from title_analyzer import analyze_title
+
+# --- КЭШ РАЗБОРА НАЗВАНИЙ ---
+# Одно и то же название релиза висит на многих хешах и не меняется между прогонами.
+# Результат analyze_title хранится в torrents_data.db под (хеш названия, версия анализатора),
+# а перед таблицей стоит LRU в памяти процесса. Версия включает отпечаток словарей,
+# поэтому новая студия в словаре или поднятый ANALYZER_VERSION просто дают промахи,
+# а старые строки удаляет purge_stale().
+# Ключ — точное название: даже strip() меняет результат (хвост "Sub:  " дает тег "Sub: ").
+LRU_SIZE = 100000
+CACHE_SCHEMA_SQL = """CREATE TABLE IF NOT EXISTS title_analysis (
+    title_hash INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (title_hash, version)
+) WITHOUT ROWID"""
+CACHE_INSERT_SQL = "INSERT OR REPLACE INTO title_analysis (title_hash, version, result) VALUES (?, ?, ?)"
+CACHE_LOOKUP_SQL = "SELECT result FROM title_analysis WHERE title_hash = ? AND version = ?"
+
+def title_hash(title):
+    """64-битный хеш названия (знаковый — помещается в INTEGER SQLite)"""
+    return int.from_bytes(hashlib.blake2b((title or '').encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+def ensure_table(conn):
+    conn.execute(CACHE_SCHEMA_SQL)
+
+def purge_stale(conn, version):
+    """Удалить результаты других версий анализатора; возвращает число строк"""
+    return conn.execute("DELETE FROM title_analysis WHERE version != ?", (version,)).rowcount
+
+class TitleCache:
+    """
+    Вызывается вместо analyze_title. Результаты общие для всех вызовов — не изменять.
+    conn — соединение с torrents_data.db (можно только для чтения) или None (только LRU);
+    новые результаты копятся в pending и пишутся flush() — в той же транзакции, что и
+    torrent_details, или отдельным писателем, если кэш живет в процессе пула.
+    """
+    def __init__(self, conn, analyzer=analyze_title, lru_size=LRU_SIZE):
+        self.conn = conn
+        self.analyzer = analyzer
+        self.version = analyzer.version
+        self.lru = OrderedDict()
+        self.lru_size = lru_size
+        self.pending = []
+        self.stats = {'lru': 0, 'db': 0, 'parsed': 0}
+
+    def remember(self, title, meta):
+        self.lru[title] = meta
+        if len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    def __call__(self, title):
+        meta = self.lru.get(title)
+        if meta is not None:
+            self.lru.move_to_end(title)
+            self.stats['lru'] += 1
+            return meta
+        h = title_hash(title)
+        row = self.conn.execute(CACHE_LOOKUP_SQL, (h, self.version)).fetchone() if self.conn else None
+        if row:
+            meta = json.loads(row[0])
+            self.stats['db'] += 1
+        else:
+            meta = self.analyzer(title)
+            self.stats['parsed'] += 1
+            self.pending.append((h, self.version, json.dumps(meta, ensure_ascii=False)))
+        self.remember(title, meta)
+        return meta
+
+    def drain(self):
+        """Забрать новые результаты (для записи другим соединением)"""
+        rows, self.pending = self.pending, []
+        return rows
+
+    def flush(self, conn=None):
+        """Записать новые результаты (без коммита); возвращает их число"""
+        rows = self.drain()
+        if rows: (conn or self.conn).executemany(CACHE_INSERT_SQL, rows)
+        return len(rows)
+
+    def report(self):
+        s = self.stats
+        total = s['lru'] + s['db'] + s['parsed']
+        hit = (s['lru'] + s['db']) / total if total else 0
+        return f"🧠 Кэш названий: из памяти {s['lru']}, из базы {s['db']}, разобрано {s['parsed']} (попаданий {hit:.0%})"
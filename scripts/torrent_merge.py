@@ -0,0 +1,444 @@
+import base64
+import re
+
+# --- ДИФФ-СЛИЯНИЕ РАЗДАЧ ---
+# Вместо DELETE всех строк фильма + INSERT заново: новые хеши вставляются,
+# у существующих обновляются только изменившиеся поля, удаляются только пропавшие.
+# id строк (AUTOINCREMENT) остаются стабильными, а WAL растет на реальные изменения.
+DELETE_CHUNK = 900  # Лимит переменных SQLite
+
+# --- INFO_HASH ---
+# BTIH в магнете бывает 40 hex-символами или 32 символами base32 (RFC 4648, без паддинга).
+# Оба вида приводятся к одному: 40 hex в верхнем регистре — так хеш хранится
+# в torrents.info_hash и в torrent_details, и так его понимает сайт.
+INFO_HASH_RE = re.compile(r'btih:([0-9a-f]{40}|[a-z2-7]{32})(?![0-9a-z])', re.IGNORECASE)
+# Колонка заполняется при вставке (merge_torrents) и backfill_info_hash.py для старых строк.
+# Уникальность в пределах фильма (как ключ слияния) и отдельный индекс для поиска по хешу
+# между фильмами (сиды по хешу, join с torrent_details).
+INFO_HASH_INDEX_SQLS = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_torrents_movie_hash ON torrents(tmdb_id, info_hash)",
+    "CREATE INDEX IF NOT EXISTS idx_torrents_info_hash ON torrents(info_hash)",
+)
+
+def normalize_info_hash(magnet):
+    """40-символьный hex info_hash в верхнем регистре (из hex или base32) или None"""
+    m = INFO_HASH_RE.search(magnet or '')
+    if not m: return None
+    value = m.group(1)
+    if len(value) == 32:
+        return base64.b32decode(value.upper()).hex().upper()
+    return value.upper()
+
+def torrent_key(magnet):
+    """Ключ раздачи: info_hash из магнета, иначе сам магнет"""
+    return normalize_info_hash(magnet) or magnet
+
+async def ensure_info_hash_column(db):
+    """Добавить torrents.info_hash и индексы (aiosqlite), если их еще нет; без коммита"""
+    async with db.execute("PRAGMA table_info(torrents)") as cursor:
+        existing = {row[1] for row in await cursor.fetchall()}
+    if 'info_hash' not in existing:
+        await db.execute("ALTER TABLE torrents ADD COLUMN info_hash TEXT")
+    for sql in INFO_HASH_INDEX_SQLS:
+        await db.execute(sql)
+
+def info_hash_select(conn, col='info_hash'):
+    """
+    Выражение для SELECT в синхронных скриптах: колонка, если она уже есть, иначе NULL
+    (тогда хеш берется из магнета через normalize_info_hash).
+    """
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(torrents)")}
+    return col if 'info_hash' in existing else 'NULL'
+
+# --- РАЗМЕР В БАЙТАХ ---
+# torrents.size — текст с трекера ("10.5 GB", "700 МБ"). Рядом хранится size_bytes INTEGER,
+# который пишется при вставке/обновлении раздачи: метаданным и сайту не нужно разбирать
+# текст, а сортировка по размеру внутри фильма идет по индексу (tmdb_id, size_bytes).
+# Старые строки заполняет migrate_size_bytes.py; нераспознанный размер — 0, как и раньше.
+SIZE_RE = re.compile(r'(\d+(\.\d+)?)\s*(GB|MB|KB|TB|ГБ|МБ|КБ|ТБ)', re.IGNORECASE)
+SIZE_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_torrents_size ON torrents(tmdb_id, size_bytes)"
+
+def parse_size_to_bytes(size_str):
+    if not size_str: return 0
+    match = SIZE_RE.search(str(size_str))
+    if not match: return 0
+    val = float(match.group(1))
+    unit = match.group(3).upper().replace('ГБ','GB').replace('МБ','MB').replace('ТБ','TB').replace('КБ','KB')
+    if unit == 'TB': val *= 1024**4
+    elif unit == 'GB': val *= 1024**3
+    elif unit == 'MB': val *= 1024**2
+    elif unit == 'KB': val *= 1024
+    return int(val)
+
+async def ensure_size_column(db):
+    """Добавить torrents.size_bytes и индекс (aiosqlite), если их еще нет; без коммита"""
+    async with db.execute("PRAGMA table_info(torrents)") as cursor:
+        existing = {row[1] for row in await cursor.fetchall()}
+    if 'size_bytes' not in existing:
+        await db.execute("ALTER TABLE torrents ADD COLUMN size_bytes INTEGER")
+    await db.execute(SIZE_INDEX_SQL)
+
+# --- СЖАТЫЕ МАГНЕТЫ ---
+# Хвост магнета "&tr=...&tr=..." (списки анонсеров) у тысяч раздач одинаковый и занимает
+# большую часть строки. В сжатой строке torrents.magnet хранит только начало
+# "magnet:?xt=urn:btih:<хеш>&dn=<имя>", хвост лежит один раз в tracker_sets, а строка
+# ссылается на него через torrents.tracker_set. Полный магнет — MAGNET_SQL (начало || хвост).
+# tracker_set IS NULL — в magnet полный магнет (строки до compact_magnets.py и скриптов без сжатия).
+# Хеш и dn остаются в magnet: normalize_info_hash и LIKE '%btih:%' работают без join.
+# Кто пишет magnet, выставляет и tracker_set — иначе хвост допишется к полному магнету второй раз.
+TRACKER_SETS_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS tracker_sets (
+    id INTEGER PRIMARY KEY,
+    trackers TEXT NOT NULL UNIQUE
+)
+"""
+MAGNET_SQL = "{t}.magnet || COALESCE((SELECT trackers FROM tracker_sets WHERE id = {t}.tracker_set), '')"
+
+def split_magnet(magnet):
+    """
+    (начало, хвост из одних &tr=) — начало + хвост == magnet, или (magnet, None),
+    если трекеров нет или после них идут другие параметры (такой хвост не повторяется).
+    """
+    i = (magnet or '').find('&tr=')
+    if i < 0: return magnet, None
+    tail = magnet[i:]
+    if not all(p.startswith('tr=') for p in tail[1:].split('&')): return magnet, None
+    return magnet[:i], tail
+
+async def ensure_tracker_sets(db):
+    """Таблица tracker_sets и колонка torrents.tracker_set (aiosqlite), если их еще нет; без коммита"""
+    await db.execute(TRACKER_SETS_SCHEMA_SQL)
+    async with db.execute("PRAGMA table_info(torrents)") as cursor:
+        existing = {row[1] for row in await cursor.fetchall()}
+    if 'tracker_set' not in existing:
+        await db.execute("ALTER TABLE torrents ADD COLUMN tracker_set INTEGER")
+
+async def intern_tracker_sets(db, tails):
+    """{хвост: id в tracker_sets}; новых хвостов в таблице еще нет — они вставляются (без коммита)"""
+    tails = list({t for t in tails if t})
+    if not tails: return {}
+    await db.executemany("INSERT OR IGNORE INTO tracker_sets (trackers) VALUES (?)", [(t,) for t in tails])
+    ids = {}
+    for i in range(0, len(tails), DELETE_CHUNK):
+        chunk = tails[i:i + DELETE_CHUNK]
+        async with db.execute(
+            f"SELECT trackers, id FROM tracker_sets WHERE trackers IN ({','.join('?' * len(chunk))})", tuple(chunk)
+        ) as cursor:
+            ids.update(await cursor.fetchall())
+    return ids
+
+# --- КАТАЛОГ РЕЛИЗОВ ---
+# Один релиз (info_hash) находится поиском у нескольких tmdb_id: в torrents это несколько строк
+# с одинаковыми названием/магнетом/размером, и метаданные таких строк перетирают друг друга.
+# releases — свойства самой раздачи, одна строка на хеш; movie_releases — связь фильм-релиз
+# и то, что зависит от выдачи по фильму (сиды, ссылка). Таблицы создает и заполняет из torrents
+# build_catalog.py; пока их нет, скрипты работают только с torrents. Когда каталог есть,
+# merge_torrents и обновление сидов пишут и в него, а метаданные разбираются по releases —
+# каждый релиз один раз. Все скрейперы (updat.py, update.py, parser.py, 1.py, auto_update_2025.py)
+# пишут раздачи только через merge_torrents: строка, записанная в torrents мимо него, попадет
+# в каталог лишь при следующем build_catalog.py.
+# torrents пока остается (его читают сайт, миграции и старые скрипты) и пишется вместе
+# с каталогом, поэтому файл базы каталог не уменьшает, пока torrents не станет производной от него.
+RELEASES_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS releases (
+    info_hash TEXT PRIMARY KEY,
+    title TEXT,
+    magnet TEXT,
+    tracker_set INTEGER,
+    size TEXT,
+    size_bytes INTEGER,
+    first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+)
+"""
+MOVIE_RELEASES_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS movie_releases (
+    tmdb_id INTEGER NOT NULL,
+    info_hash TEXT NOT NULL,
+    seeders INTEGER,
+    leechers INTEGER,
+    url TEXT,
+    parsed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (tmdb_id, info_hash)
+) WITHOUT ROWID
+"""
+MOVIE_RELEASES_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_movie_releases_hash ON movie_releases(info_hash)"
+RELEASE_UPSERT_SQL = """
+INSERT INTO releases (info_hash, title, magnet, tracker_set, size, size_bytes) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(info_hash) DO UPDATE SET title = excluded.title, magnet = excluded.magnet,
+    tracker_set = excluded.tracker_set, size = excluded.size, size_bytes = excluded.size_bytes,
+    updated_at = CURRENT_TIMESTAMP
+WHERE releases.title IS NOT excluded.title OR releases.magnet IS NOT excluded.magnet
+   OR releases.tracker_set IS NOT excluded.tracker_set OR releases.size IS NOT excluded.size
+   OR releases.size_bytes IS NOT excluded.size_bytes
+"""
+MOVIE_RELEASE_UPSERT_SQL = """
+INSERT INTO movie_releases (tmdb_id, info_hash, seeders, leechers, url) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(tmdb_id, info_hash) DO UPDATE SET seeders = excluded.seeders, leechers = excluded.leechers,
+    url = COALESCE(excluded.url, movie_releases.url), parsed_at = CURRENT_TIMESTAMP
+"""
+# Длительность релиза для битрейта — наибольшая среди его фильмов (не зависит от порядка записи)
+RELEASE_RUNTIME_SQL = """(
+    SELECT MAX(i.runtime) FROM movie_releases m JOIN tmdb.items_minimal i ON i.id = m.tmdb_id
+    WHERE m.info_hash = {r}.info_hash
+)"""
+
+async def has_catalog(db):
+    async with db.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('releases', 'movie_releases')") as cursor:
+        return (await cursor.fetchone())[0] == 2
+
+def catalog_exists(conn):
+    """То же для синхронных скриптов"""
+    return conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('releases', 'movie_releases')"
+    ).fetchone()[0] == 2
+
+async def upsert_catalog(db, rows, removed=()):
+    """
+    rows — (tmdb_id, info_hash, title, magnet, tracker_set, size, size_bytes, seeders, leechers, url)
+    записанных в torrents раздач; removed — (tmdb_id, info_hash) пропавших из выдачи фильма.
+    Релиз без единого фильма удаляется. Без коммита.
+    """
+    rows = [r for r in rows if r[1]]
+    if rows:
+        await db.executemany(RELEASE_UPSERT_SQL, [r[1:7] for r in rows])
+        await db.executemany(MOVIE_RELEASE_UPSERT_SQL, [(r[0], r[1]) + r[7:] for r in rows])
+    removed = [r for r in removed if r[1]]
+    if removed:
+        await db.executemany("DELETE FROM movie_releases WHERE tmdb_id = ? AND info_hash = ?", removed)
+        await db.executemany("""
+            DELETE FROM releases WHERE info_hash = ?
+              AND NOT EXISTS (SELECT 1 FROM movie_releases m WHERE m.info_hash = releases.info_hash)
+        """, [(h,) for _, h in removed])
+
+class MergeStats:
+    """Счетчики вставок/обновлений/удалений и сравнение с полной перезаписью"""
+    FIELDS = ('inserted', 'updated', 'unchanged', 'removed', 'legacy_writes')
+
+    def __init__(self):
+        for f in self.FIELDS:
+            setattr(self, f, 0)
+
+    def add(self, other):
+        for f in self.FIELDS:
+            setattr(self, f, getattr(self, f) + getattr(other, f))
+
+    @property
+    def writes(self):
+        return self.inserted + self.updated + self.removed
+
+    def line(self):
+        ratio = f"×{self.legacy_writes / self.writes:.1f} меньше" if self.writes else "записей нет"
+        return (
+            f"+{self.inserted} ~{self.updated} ={self.unchanged} -{self.removed} | "
+            f"строк записано {self.writes} вместо {self.legacy_writes} ({ratio})"
+        )
+
+async def merge_torrents(db, results):
+    """
+    Слить результаты парсинга с torrents по info_hash внутри каждого tmdb_id (aiosqlite, без коммита).
+    Фильм с пустым списком теряет все раздачи — как и при старом DELETE + INSERT,
+    поэтому вызывающий сам решает, передавать ли пустые результаты.
+    Возвращает (MergeStats, id фильмов, где изменились названия/размеры/состав раздач).
+    """
+    stats = MergeStats()
+    changed_ids = set()
+    if not results:
+        return stats, changed_ids
+
+    ids = [r['tmdb_id'] for r in results]
+    placeholders = ','.join('?' * len(ids))
+    async with db.execute(
+        f"SELECT id, tmdb_id, {MAGNET_SQL.format(t='t')}, torrent_title, seeders, leechers, size "
+        f"FROM torrents t WHERE tmdb_id IN ({placeholders})",
+        tuple(ids)
+    ) as cursor:
+        rows = await cursor.fetchall()
+
+    existing = {}
+    to_delete = []
+    for row in rows:
+        movie = existing.setdefault(row[1], {})
+        key = torrent_key(row[2])
+        if key in movie:
+            to_delete.append(row[0])  # Дубль хеша у одного фильма — лишняя строка
+        else:
+            movie[key] = row
+
+    new = []
+    changed = []
+    removed = []
+    for res in results:
+        t_id = res['tmdb_id']
+        old = existing.get(t_id, {})
+        seen = set()
+        for t in res['torrents']:
+            key = torrent_key(t['magnet'])
+            if key in seen: continue
+            seen.add(key)
+            row = old.get(key)
+            if row is None:
+                new.append((t_id, t))
+                changed_ids.add(t_id)
+            elif (row[2], row[3], row[4], row[5], row[6]) != (t['magnet'], t['torrent_title'], t['seeders'], t['leechers'], t['size']):
+                changed.append((row, t))
+                if (row[3], row[6]) != (t['torrent_title'], t['size']):
+                    changed_ids.add(t_id)
+            else:
+                stats.unchanged += 1
+        for key, row in old.items():
+            if key not in seen:
+                to_delete.append(row[0])
+                removed.append((t_id, normalize_info_hash(row[2])))
+                changed_ids.add(t_id)
+        stats.legacy_writes += len(res['torrents'])
+
+    # Старый путь удалял все строки этих фильмов и вставлял все заново
+    stats.legacy_writes += len(rows)
+
+    # Магнеты пишутся сжатыми: начало в magnet, хвост трекеров — ссылкой в tracker_sets
+    split = {t['magnet']: split_magnet(t['magnet']) for _, t in new + changed}
+    sets = await intern_tracker_sets(db, [tail for _, tail in split.values()])
+    to_insert = []
+    for t_id, t in new:
+        head, tail = split[t['magnet']]
+        to_insert.append((t_id, t['torrent_title'], head, sets.get(tail), t['seeders'], t['leechers'], t['size'],
+                          parse_size_to_bytes(t['size']), normalize_info_hash(t['magnet']), t.get('url')))
+    to_update = []
+    for row, t in changed:
+        head, tail = split[t['magnet']]
+        to_update.append((t['torrent_title'], head, sets.get(tail), t['seeders'], t['leechers'], t['size'],
+                          parse_size_to_bytes(t['size']), normalize_info_hash(t['magnet']), row[0]))
+
+    for i in range(0, len(to_delete), DELETE_CHUNK):
+        chunk = to_delete[i:i + DELETE_CHUNK]
+        await db.execute(f"DELETE FROM torrents WHERE id IN ({','.join('?' * len(chunk))})", tuple(chunk))
+    if to_update:
+        await db.executemany("""
+            UPDATE torrents SET torrent_title = ?, magnet = ?, tracker_set = ?, seeders = ?, leechers = ?, size = ?,
+                size_bytes = ?, info_hash = ?, parsed_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, to_update)
+    if to_insert:
+        await db.executemany("""
+            INSERT INTO torrents (tmdb_id, torrent_title, magnet, tracker_set, seeders, leechers, size, size_bytes, info_hash, url)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, to_insert)
+    if await has_catalog(db):
+        written = [(t_id, t) for t_id, t in new] + [(row[1], t) for row, t in changed]
+        await upsert_catalog(db, [
+            (t_id, normalize_info_hash(t['magnet']), t['torrent_title'], split[t['magnet']][0],
+             sets.get(split[t['magnet']][1]), t['size'], parse_size_to_bytes(t['size']),
+             t['seeders'], t['leechers'], t.get('url'))
+            for t_id, t in written
+        ], removed)
+
+    stats.inserted = len(to_insert)
+    stats.updated = len(to_update)
+    stats.removed = len(to_delete)
+    return stats, changed_ids
+
+# --- ОБНОВЛЕНИЕ ТОЛЬКО СИДОВ/ПИРОВ ---
+# Строки torrents сопоставляются с временной таблицей по колонке info_hash через индексы
+# idx_torrents_movie_hash / idx_torrents_info_hash, без чтения строк в Python.
+# MAGNET_HASH_SQL — хеш из hex-магнета прямо в SQL, для баз, где колонки еще нет.
+MAGNET_HASH_SQL = "upper(substr({col}, instr(lower({col}), 'btih:') + 5, 40))"
+PEERS_TABLE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS peers (
+    tmdb_id INTEGER NOT NULL,
+    info_hash TEXT NOT NULL,
+    seeders INTEGER,
+    leechers INTEGER,
+    PRIMARY KEY (tmdb_id, info_hash)
+) WITHOUT ROWID
+"""
+PEERS_UPDATE_SQL = """
+UPDATE torrents SET seeders = p.seeders, leechers = p.leechers
+FROM temp.peers p
+WHERE p.tmdb_id = torrents.tmdb_id
+  AND p.info_hash = torrents.info_hash
+  AND (torrents.seeders IS NOT p.seeders OR torrents.leechers IS NOT p.leechers)
+"""
+CATALOG_PEERS_UPDATE_SQL = """
+UPDATE movie_releases SET seeders = p.seeders, leechers = p.leechers
+FROM temp.peers p
+WHERE p.tmdb_id = movie_releases.tmdb_id
+  AND p.info_hash = movie_releases.info_hash
+  AND (movie_releases.seeders IS NOT p.seeders OR movie_releases.leechers IS NOT p.leechers)
+"""
+PEERS_UNKNOWN_SQL = """
+SELECT COUNT(*) FROM temp.peers p
+WHERE NOT EXISTS (
+    SELECT 1 FROM torrents t
+    WHERE t.tmdb_id = p.tmdb_id AND t.info_hash = p.info_hash
+)
+"""
+
+async def update_peers(db, results):
+    """
+    Обновить только seeders/leechers уже известных раздач одним UPDATE (aiosqlite, без коммита).
+    Названия, размеры и состав раздач не трогаются — torrent_details остается как есть.
+    Возвращает (обновлено строк, сопоставлено раздач, новых раздач, которых в базе нет).
+    """
+    rows = {}
+    for res in results:
+        for t in res['torrents']:
+            key = torrent_key(t['magnet'])
+            if key and len(key) == 40:
+                rows[(res['tmdb_id'], key)] = (t['seeders'], t['leechers'])
+    if not rows:
+        return 0, 0, 0
+
+    await db.execute(PEERS_TABLE_SQL)
+    await db.execute("DELETE FROM temp.peers")
+    await db.executemany(
+        "INSERT INTO temp.peers (tmdb_id, info_hash, seeders, leechers) VALUES (?, ?, ?, ?)",
+        [(t_id, key, s, l) for (t_id, key), (s, l) in rows.items()]
+    )
+    cursor = await db.execute(PEERS_UPDATE_SQL)
+    updated = cursor.rowcount
+    if await has_catalog(db):
+        await db.execute(CATALOG_PEERS_UPDATE_SQL)
+    async with db.execute(PEERS_UNKNOWN_SQL) as cursor:
+        unknown = (await cursor.fetchone())[0]
+    await db.execute("DELETE FROM temp.peers")
+    return updated, len(rows) - unknown, unknown
+
+SCRAPE_TABLE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS scrape (
+    info_hash TEXT PRIMARY KEY,
+    seeders INTEGER,
+    leechers INTEGER
+) WITHOUT ROWID
+"""
+SCRAPE_UPDATE_SQL = """
+UPDATE torrents SET seeders = s.seeders, leechers = s.leechers
+FROM temp.scrape s
+WHERE s.info_hash = torrents.info_hash
+  AND (torrents.seeders IS NOT s.seeders OR torrents.leechers IS NOT s.leechers)
+"""
+CATALOG_SCRAPE_UPDATE_SQL = """
+UPDATE movie_releases SET seeders = s.seeders, leechers = s.leechers
+FROM temp.scrape s
+WHERE s.info_hash = movie_releases.info_hash
+  AND (movie_releases.seeders IS NOT s.seeders OR movie_releases.leechers IS NOT s.leechers)
+"""
+
+async def update_peers_by_hash(db, peers):
+    """
+    Ответы трекеров {hex hash: (seeders, leechers)} -> torrents одним UPDATE по всем фильмам
+    (одна раздача может висеть у нескольких tmdb_id). Без коммита; возвращает число строк.
+    """
+    if not peers: return 0
+    await db.execute(SCRAPE_TABLE_SQL)
+    await db.execute("DELETE FROM temp.scrape")
+    await db.executemany(
+        "INSERT INTO temp.scrape (info_hash, seeders, leechers) VALUES (?, ?, ?)",
+        [(h, s, l) for h, (s, l) in peers.items()]
+    )
+    cursor = await db.execute(SCRAPE_UPDATE_SQL)
+    updated = cursor.rowcount
+    if await has_catalog(db):
+        await db.execute(CATALOG_SCRAPE_UPDATE_SQL)
+    await db.execute("DELETE FROM temp.scrape")
+    return updated
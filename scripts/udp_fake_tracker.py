@@ -0,0 +1,93 @@
+import asyncio
+import argparse
+import hashlib
+import random
+import struct
+import time
+
+from udp_tracker import ACTION_CONNECT, ACTION_ERROR, ACTION_SCRAPE, PROTOCOL_ID, SCRAPE_MAX_HASHES
+
+# --- КОНФИГУРАЦИЯ ---
+HOST = "127.0.0.1"
+PORT = 6969
+
+# Локальный двойник UDP-трекера (BEP 15) для проверки udp_tracker.py без сети:
+# connect/scrape, истечение connection_id, потеря пакетов и задержка ответа.
+def fake_peers(info_hash):
+    """Детерминированные (сиды, скачиваний, личи) для хеша"""
+    h = hashlib.sha1(info_hash).digest()
+    return h[0] * 2 + h[1] % 3, h[2] * 10, h[3] % 60
+
+class FakeTracker(asyncio.DatagramProtocol):
+    def __init__(self, ttl=60.0, drop=0.0, delay_ms=0, seed=None):
+        self.ttl = ttl
+        self.drop = drop
+        self.delay = delay_ms / 1000
+        self.rnd = random.Random(seed)
+        self.connections = {}
+        self.transport = None
+        self.stats = {'connects': 0, 'scrapes': 0, 'hashes': 0, 'dropped': 0, 'expired': 0}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if self.drop and self.rnd.random() < self.drop:
+            self.stats['dropped'] += 1
+            return
+        reply = self.handle(data)
+        if reply is None: return
+        if self.delay:
+            asyncio.get_running_loop().call_later(self.delay, self.transport.sendto, reply, addr)
+        else:
+            self.transport.sendto(reply, addr)
+
+    def handle(self, data):
+        if len(data) < 16: return None
+        conn_id, action, tx = struct.unpack_from('>QII', data)
+        if action == ACTION_CONNECT:
+            if conn_id != PROTOCOL_ID: return None
+            new_id = self.rnd.getrandbits(64)
+            self.connections[new_id] = time.monotonic()
+            self.stats['connects'] += 1
+            return struct.pack('>IIQ', ACTION_CONNECT, tx, new_id)
+        issued = self.connections.get(conn_id)
+        if issued is None or time.monotonic() - issued > self.ttl:
+            self.stats['expired'] += 1
+            return struct.pack('>II', ACTION_ERROR, tx) + b"Connection ID expired"
+        if action == ACTION_SCRAPE:
+            hashes = [data[i:i + 20] for i in range(16, len(data), 20)][:SCRAPE_MAX_HASHES]
+            self.stats['scrapes'] += 1
+            self.stats['hashes'] += len(hashes)
+            return struct.pack('>II', ACTION_SCRAPE, tx) + b''.join(struct.pack('>III', *fake_peers(h)) for h in hashes)
+        return struct.pack('>II', ACTION_ERROR, tx) + b"Unsupported action"
+
+async def start_fake_tracker(host=HOST, port=PORT, **kwargs):
+    """Запустить двойник в текущем цикле: (transport, протокол со stats)"""
+    loop = asyncio.get_running_loop()
+    return await loop.create_datagram_endpoint(lambda: FakeTracker(**kwargs), local_addr=(host, port))
+
+async def main():
+    ap = argparse.ArgumentParser(description="Локальный UDP-трекер (BEP 15) для офлайн проверки scrape")
+    ap.add_argument('--host', default=HOST)
+    ap.add_argument('--port', type=int, default=PORT)
+    ap.add_argument('--ttl', type=float, default=60.0, help="Сек жизни connection_id (маленький — проверка переподключений)")
+    ap.add_argument('--drop', type=float, default=0.0, help="Доля теряемых пакетов (0..1)")
+    ap.add_argument('--delay-ms', type=int, default=0)
+    args = ap.parse_args()
+
+    transport, tracker = await start_fake_tracker(args.host, args.port, ttl=args.ttl, drop=args.drop, delay_ms=args.delay_ms)
+    print(f"📡 Фейковый трекер: udp://{args.host}:{args.port} (ttl {args.ttl} с, потери {args.drop:.0%})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        transport.close()
+        s = tracker.stats
+        print(f"🧪 connect {s['connects']}, scrape {s['scrapes']} ({s['hashes']} хешей), "
+              f"потеряно {s['dropped']}, истекших id {s['expired']}")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nПрервано.")
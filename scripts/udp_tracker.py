@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import random
+import struct
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from torrent_merge import torrent_key
+
+# --- UDP SCRAPE (BEP 15) ---
+# Сиды/личи берутся прямо у трекеров из магнетов: один пакет scrape — до 74 хешей.
+# Хеши группируются по трекеру, на каждый трекер открывается один UDP-сокет,
+# и несколько пакетов летят одновременно (совпадение по transaction_id).
+# connection_id живет минуту: по истечении или по ошибке трекера — новый connect.
+PROTOCOL_ID = 0x41727101980
+ACTION_CONNECT, ACTION_ANNOUNCE, ACTION_SCRAPE, ACTION_ERROR = 0, 1, 2, 3
+SCRAPE_MAX_HASHES = 74         # (1500 байт MTU - заголовки) / 20 байт хеша
+CONNECTION_TTL = 60.0          # Сек: срок connection_id по BEP 15
+REQUEST_TIMEOUT = 3.0          # Сек: первый таймаут, дальше удваивается (в BEP 15 — 15 × 2^n)
+MAX_RETRIES = 3
+PIPELINE = 8                   # Пакетов scrape в полете на один трекер
+MAX_TRACKERS = 32              # Трекеров опрашивается одновременно
+MAX_TRACKERS_PER_HASH = 3      # У скольких трекеров магнета спрашивать про хеш
+MAX_FAILED_CHUNKS = 3          # Пачек без ответа, после которых трекер считается мертвым
+
+logger = logging.getLogger(__name__)
+
+class TrackerError(Exception):
+    pass
+
+# --- ГРУППИРОВКА ---
+def udp_trackers(magnet):
+    """udp://host:port трекеров из параметров tr= магнета (путь /announce для UDP не нужен)"""
+    trackers = []
+    for tr in parse_qs(urlsplit(magnet or '').query).get('tr', []):
+        parts = urlsplit(tr.strip())
+        if parts.scheme != 'udp' or not parts.hostname: continue
+        try:
+            port = parts.port
+        except ValueError:
+            continue
+        url = f"udp://{parts.hostname.lower()}:{port or 80}"
+        if url not in trackers: trackers.append(url)
+    return trackers
+
+def group_by_tracker(magnets, per_hash=MAX_TRACKERS_PER_HASH, override=None):
+    """
+    tracker -> [hex info_hash]. Магнеты без 40-символьного hex-хеша пропускаются.
+    override — спрашивать про все хеши один трекер (локальный двойник, свой трекер).
+    """
+    groups = {}
+    seen = set()
+    for magnet in magnets:
+        key = torrent_key(magnet)
+        if not key or len(key) != 40 or key in seen: continue
+        seen.add(key)
+        trackers = [override] if override else udp_trackers(magnet)[:per_hash]
+        for url in trackers:
+            groups.setdefault(url, []).append(key)
+    return groups
+
+# --- ПРОТОКОЛ ---
+class _TrackerProtocol(asyncio.DatagramProtocol):
+    """Ответы раздаются ожидающим future по transaction_id"""
+    def __init__(self):
+        self.transport = None
+        self.pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < 8: return
+        action, tx = struct.unpack_from('>II', data)
+        fut = self.pending.pop(tx, None)
+        if fut and not fut.done():
+            fut.set_result((action, data[8:]))
+
+    def error_received(self, exc):
+        # ICMP port unreachable и т.п.: трекер не слушает — будить всех ожидающих сразу
+        for fut in self.pending.values():
+            if not fut.done(): fut.set_exception(TrackerError(str(exc)))
+        self.pending.clear()
+
+    def connection_lost(self, exc):
+        self.error_received(exc or ConnectionError("сокет закрыт"))
+
+class UdpTracker:
+    """Один трекер: сокет, connection_id и конвейер пакетов scrape"""
+    def __init__(self, url, timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES, pipeline=PIPELINE):
+        parts = urlsplit(url)
+        self.url = url
+        self.addr = (parts.hostname, parts.port or 80)
+        self.timeout = timeout
+        self.retries = retries
+        self.sem = asyncio.Semaphore(pipeline)
+        self.connect_lock = asyncio.Lock()
+        self.protocol = None
+        self.conn_id = None
+        self.conn_at = 0.0
+        self.dead = None
+        self.stats = {'packets': 0, 'timeouts': 0, 'reconnects': 0, 'errors': 0, 'lost': 0}
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        _, self.protocol = await loop.create_datagram_endpoint(_TrackerProtocol, remote_addr=self.addr)
+
+    async def close(self):
+        if self.protocol and self.protocol.transport:
+            self.protocol.transport.close()
+
+    async def request(self, packet, tx, timeout):
+        """Отправить пакет и дождаться ответа с тем же transaction_id: (action, тело)"""
+        fut = asyncio.get_running_loop().create_future()
+        self.protocol.pending[tx] = fut
+        self.protocol.transport.sendto(packet)
+        self.stats['packets'] += 1
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise
+        finally:
+            self.protocol.pending.pop(tx, None)
+
+    async def connection_id(self):
+        """Действующий connection_id; connect только одним запросом на все пакеты конвейера"""
+        async with self.connect_lock:
+            if self.conn_id is not None and time.monotonic() - self.conn_at < CONNECTION_TTL:
+                return self.conn_id
+            if self.conn_at:
+                self.stats['reconnects'] += 1
+            for attempt in range(self.retries + 1):
+                tx = random.getrandbits(32)
+                try:
+                    action, body = await self.request(
+                        struct.pack('>QII', PROTOCOL_ID, ACTION_CONNECT, tx), tx, self.timeout * 2 ** attempt
+                    )
+                except asyncio.TimeoutError:
+                    continue
+                if action == ACTION_ERROR:
+                    raise TrackerError(body.decode('utf-8', 'replace'))
+                if action != ACTION_CONNECT or len(body) < 8:
+                    continue
+                self.conn_id = struct.unpack_from('>Q', body)[0]
+                self.conn_at = time.monotonic()
+                return self.conn_id
+            raise TrackerError("нет ответа на connect")
+
+    async def scrape(self, hashes):
+        """{hex hash: (seeders, leechers)} для пачки до SCRAPE_MAX_HASHES хешей"""
+        payload = b''.join(bytes.fromhex(h) for h in hashes)
+        async with self.sem:
+            # Таймауты и ошибки трекера считаются отдельно: ответ "истекший connection_id"
+            # не должен съедать попытки, отведенные на потерю пакетов
+            timeouts = errors = 0
+            while timeouts <= self.retries and errors <= self.retries:
+                conn_id = await self.connection_id()
+                tx = random.getrandbits(32)
+                try:
+                    action, body = await self.request(
+                        struct.pack('>QII', conn_id, ACTION_SCRAPE, tx) + payload, tx, self.timeout * 2 ** timeouts
+                    )
+                except asyncio.TimeoutError:
+                    timeouts += 1
+                    continue
+                if action == ACTION_ERROR:
+                    # Чаще всего это истекший/чужой connection_id — получить новый и повторить
+                    self.stats['errors'] += 1
+                    errors += 1
+                    if self.conn_id == conn_id: self.conn_id = None
+                    continue
+                if action != ACTION_SCRAPE or len(body) < 12 * len(hashes):
+                    errors += 1
+                    continue
+                peers = {}
+                for i, h in enumerate(hashes):
+                    seeders, _completed, leechers = struct.unpack_from('>III', body, 12 * i)
+                    peers[h] = (seeders, leechers)
+                return peers
+            raise TrackerError(f"scrape не удался: таймаутов {timeouts}, ошибок {errors}")
+
+async def scrape_tracker(url, hashes, timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES, pipeline=PIPELINE):
+    """Все хеши одного трекера пачками по SCRAPE_MAX_HASHES: (результаты, трекер со статистикой)"""
+    tracker = UdpTracker(url, timeout=timeout, retries=retries, pipeline=pipeline)
+    results = {}
+    try:
+        await tracker.open()
+    except OSError as e:
+        tracker.dead = str(e)   # DNS не разрешился и т.п.
+        return results, tracker
+
+    async def one(chunk):
+        if tracker.dead: return
+        try:
+            results.update(await tracker.scrape(chunk))
+        except TrackerError as e:
+            # Потеря одной пачки — не повод бросать трекер; но если он так и не ответил
+            # на connect или пачки пропадают раз за разом, остальные к нему не отправляются
+            tracker.stats['lost'] += 1
+            if not tracker.conn_at or tracker.stats['lost'] >= MAX_FAILED_CHUNKS:
+                tracker.dead = str(e)
+
+    try:
+        chunks = [hashes[i:i + SCRAPE_MAX_HASHES] for i in range(0, len(hashes), SCRAPE_MAX_HASHES)]
+        await asyncio.gather(*[one(c) for c in chunks])
+    finally:
+        await tracker.close()
+    return results, tracker
+
+async def scrape_all(groups, max_trackers=MAX_TRACKERS, **kwargs):
+    """
+    Опросить все трекеры групп (tracker -> хеши). Если хеш ответили несколько трекеров,
+    берется ответ с наибольшим числом сидов. Возвращает ({hash: (seeders, leechers)}, [трекеры]).
+    """
+    sem = asyncio.Semaphore(max_trackers)
+    peers = {}
+    trackers = []
+
+    async def one(url, hashes):
+        async with sem:
+            results, tracker = await scrape_tracker(url, hashes, **kwargs)
+        trackers.append(tracker)
+        if tracker.dead:
+            logger.warning(f"[UDP] ⚠️ {url}: {tracker.dead} (ответов {len(results)} из {len(hashes)})")
+        elif tracker.stats['lost']:
+            logger.info(f"[UDP] {url}: без ответа пачек {tracker.stats['lost']} (ответов {len(results)} из {len(hashes)})")
+        for h, (seeders, leechers) in results.items():
+            if h not in peers or seeders > peers[h][0]:
+                peers[h] = (seeders, leechers)
+
+    await asyncio.gather(*[one(url, hashes) for url, hashes in groups.items()])
+    return peers, trackers
+
+def report(trackers):
+    alive = [t for t in trackers if not t.dead]
+    total = {k: sum(t.stats[k] for t in trackers) for k in ('packets', 'timeouts', 'reconnects', 'errors', 'lost')}
+    return (
+        f"📡 Трекеров {len(trackers)} (отвечают {len(alive)}), пакетов {total['packets']}, "
+        f"таймаутов {total['timeouts']}, переподключений {total['reconnects']}, ошибок трекера {total['errors']}, "
+        f"потеряно пачек {total['lost']}"
+    )
@@ -1,15 +1,24 @@
 import asyncio
+import argparse
 import logging
 import aiosqlite
 import sqlite3
 import os
-import re
-import json
+import math
+import multiprocessing as mp
+import queue as queue_lib
+import time
 from pathlib import Path
-from datetime import datetime
-from playwright.async_api import async_playwright
 from tqdm import tqdm
 
+from browser_watchdog import BROWSER_RSS_LIMIT_MB, MemoryWatchdog
+from freshness import plan_queue, summary_line
+from metadata_rows import DETAILS_INSERT_SQL, details_row, ensure_details_schema, info_hash_of
+from miss_ledger import DUE_SQL, count_backed_off, ensure_columns, record_checks
+from torrent_merge import (RELEASE_RUNTIME_SQL, MergeStats, catalog_exists, ensure_info_hash_column, ensure_size_column,
+                           ensure_tracker_sets, merge_torrents)
+from update_journal import RunJournal, print_runs
+
 # --- КОНФИГУРАЦИЯ ---
 BASE_DIR = Path(os.getcwd())
 TMDB_DB_PATH = BASE_DIR / "tmdb_data" / "tmdb_minimal_no_original.db"
@@ -19,326 +28,447 @@ DATA_DB_PATH = BASE_DIR / "tmdb_data" / "torrents_data.db"
 LOG_FILE = "global_updater.log"
 MAX_CONCURRENT_TABS = 40   # Максимальная производительность
 BATCH_SIZE = 50            # Размер пачки
-RESTART_BROWSER_EVERY = 500 # Перезапуск браузера каждые N фильмов (очистка RAM)
+ENGINE = "browser"         # browser (Playwright) | http (JSON API трекера)
+JACRED_URL = "https://jacred.xyz"
+QUEUE_SIZE = MAX_CONCURRENT_TABS * 2  # Буфер между стадиями конвейера
+META_QUEUE_SIZE = 8        # Сколько пачек метаданных может ждать парсинга
+WRITE_INTERVAL = 2.0       # Сек: максимальная задержка групповой записи
+SHARD_REPORT_EVERY = 30    # Сек: как часто печатать суммарную скорость шардов
+SHARD_DONE = '__shard_done__'
 
 # --- ЛОГИРОВАНИЕ ---
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s [%(levelname)s] %(message)s',
     handlers=[
-        logging.FileHandler(LOG_FILE, mode='w', encoding='utf-8'),
+        # Шарды (spawn) заново импортируют модуль — они дописывают в лог родителя, а не затирают его
+        logging.FileHandler(LOG_FILE, mode='w' if __name__ == "__main__" else 'a', encoding='utf-8'),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 logging.getLogger("aiosqlite").setLevel(logging.WARNING)
 
-# --- REGEX CONFIG ---
-REGEX_CONFIG = {
-    'resolution': {
-        'pattern': re.compile(r'\b(3840x2160|4K|2160p|1920x1080|1080p|1280x720|720p)\b', re.IGNORECASE), 
-        'type': 'resolution'
-    },
-    'audio_channels': {
-        'pattern': re.compile(r'\b(5\.1|7\.1)\b', re.IGNORECASE), 
-        'type': 'audio_channels'
-    },
-    'quality': {
-        'pattern': re.compile(r'\b(HEVC|HDR10\+|HDR10|HDR|Dolby Vision|DV|BDRemux|BluRay|Web-DL|Hybrid|IMAX)\b', re.IGNORECASE), 
-        'type': 'quality'
-    },
-    'audio_track': {
-        'pattern': re.compile(r'\b('
-                              # --- СОВРЕМЕННЫЕ СТУДИИ / РЕЛИЗ ГРУППЫ ---
-                              r'Red Head Sound|RHS|Bluebird|HDRezka|Rezka|Jaskier|'
-                              r'TVShows|NewStudio|BaibaKo|AlexFilm|LostFilm|Кубик в [Кк]убе|'
-                              r'Octopus|LineFilm|Cold Film|AlphaProject|TVG|Good People|'
-                              r'Pazl Voice|Ultradox|RuDub|Sound Film|ViruseProject|IdeaFilm|Novamedia|Кириллица|'
-                              r'Kerob|Sunshine Studio|NewComers|LakeFilms|HamsterStudio|Paramount Comedy|'
-                              r'Кураж-Бамбей|Kuraj-Bambey|Сыендук|Syenduk|'
-                              # --- АНИМЕ ---
-                              r'AniLibria|AniDUB|AnimeVost|SHIZA Project|Jam Club|Studio Band|Студийная Банда|'
-                              r'SovetRomantica|Kansai|AniStar|AniFilm|Dream Cast|AniMaunt|AniRise|Amazing Dubbing|'
-                              # --- АВТОРСКИЕ / VHS (ЛЕГЕНДЫ) ---
-                              r'Гаврилов|Михалев|Володарский|Сербин|Живов|Пучков|Гоблин|Goblin|'
-                              r'Дохалов|Визгунов|Карцев|Иванов|Санаев|Есарев|Штейн|Либерти|Вартан|Горчаков|'
-                              r'Котов|Яковлев|Гланц|Glanz|'
-                              # --- ОФИЦИАЛЬНЫЕ / ПРОФЕССИОНАЛЬНЫЕ ---
-                              r'Пифагор|Flarrow Films|FF|Videofilm|Мосфильм|Невафильм|SDI Media|'
-                              r'Киномания|Tycoon|CPIG|Позитив|Видеосервис|Varus Video|West Video|'
-                              r'iTunes|Amedia|Netflix|'
-                              # --- ОБЩИЕ МЕТКИ ---
-                              r'Дубляж|Dub|MVO|DVO|AVO|Original|ENG|RUS|UKR'
-                              r')\b', re.IGNORECASE), 
-        'type': 'audio_lang'
-    },
-    'subtitles': {
-        'pattern': re.compile(r'Sub\s*[:(]\s*([^)]+)\)?', re.IGNORECASE), 
-        'type': 'subtitles'
-    }
-}
-
-# --- КЛАСС ПАРСЕРА ---
-class JacredParser:
-    def __init__(self, max_concurrent: int = 5):
-        self.semaphore = asyncio.Semaphore(max_concurrent)
-        self.browser = None
-        self.context = None
-        self.playwright = None
-        self.processed_count = 0
-
-    async def start(self):
-        """Запуск браузера"""
-        if self.playwright is None:
-            self.playwright = await async_playwright().start()
-        
-        self.browser = await self.playwright.chromium.launch(
-            headless=True,
-            args=[
-                '--no-sandbox', 
-                '--disable-setuid-sandbox', 
-                '--disable-dev-shm-usage',
-                '--disable-gpu', 
-                '--disable-extensions', 
-                '--mute-audio',
-                '--dns-server=1.1.1.1'
-            ]
-        )
-        self.context = await self.browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36'
-        )
-        await self.context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-
-    async def stop(self):
-        """Полная остановка"""
-        if self.context: await self.context.close()
-        if self.browser: await self.browser.close()
-        if self.playwright: await self.playwright.stop()
-        self.playwright = None
-
-    async def restart(self):
-        """Перезапуск для очистки памяти"""
-        # logger.info("♻️ Перезапуск браузера для очистки RAM...")
-        if self.context: await self.context.close()
-        if self.browser: await self.browser.close()
-        # Playwright не стопаем, только браузер
-        self.browser = await self.playwright.chromium.launch(
-            headless=True,
-            args=['--no-sandbox', '--disable-gpu', '--mute-audio', '--dns-server=1.1.1.1']
+# --- ДВИЖКИ ПАРСИНГА ---
+def create_parser(engine, max_concurrent, base_url=JACRED_URL, adaptive=False):
+    """
+    Фабрика движка. Оба возвращают {'tmdb_id', 'torrents': [...]} одинаковой формы.
+    adaptive=True — число вкладок подбирается AIMD-контроллером (max_concurrent — потолок).
+    """
+    if engine == 'http':
+        from jacred_http import JacredHttpParser
+        return JacredHttpParser(max_concurrent=max_concurrent, base_url=base_url, adaptive=adaptive)
+    from jacred_browser import JacredParser
+    return JacredParser(max_concurrent=max_concurrent, base_url=base_url, adaptive=adaptive)
+
+# --- ЛОКАЛЬНЫЙ ПАРСИНГ МЕТАДАННЫХ ---
+# Раньше на каждую пачку открывались три соединения и заново читалась длительность
+# всех фильмов из items_minimal (около тысячи полных проходов за глобальный прогон).
+# Теперь соединения живут весь прогон, а длительность приходит join'ом только по фильмам пачки.
+BATCH_SQL = """
+    SELECT t.magnet, t.info_hash, t.torrent_title, t.size, t.size_bytes, i.runtime FROM torrents t
+    LEFT JOIN tmdb.items_minimal i ON i.id = t.tmdb_id
+    WHERE t.tmdb_id IN ({placeholders})
+"""
+# С каталогом (build_catalog.py) пачка читает releases: общий для нескольких фильмов хеш
+# разбирается один раз, длительность — наибольшая среди его фильмов (не зависит от порядка записи)
+CATALOG_BATCH_SQL = f"""
+    SELECT r.magnet, r.info_hash, r.title, r.size, r.size_bytes, {RELEASE_RUNTIME_SQL.format(r='r')} FROM releases r
+    WHERE r.info_hash IN (SELECT info_hash FROM movie_releases WHERE tmdb_id IN ({{placeholders}}))
+"""
+
+class LocalParser:
+    """
+    Метаданные по названиям для пачек конвейера. Вызывается через asyncio.to_thread
+    строго по одной пачке за раз (стадия metadata), поэтому соединения без check_same_thread.
+    """
+    def __init__(self):
+        self.conn = None
+        self.data = None
+        self.batch_sql = BATCH_SQL
+        self.totals = {'batches': 0, 'torrents': 0, 'select': 0.0, 'parse': 0.0, 'write': 0.0}
+
+    def open(self):
+        self.conn = sqlite3.connect(TORRENTS_DB_PATH, check_same_thread=False)
+        self.conn.execute("ATTACH DATABASE ? AS tmdb", (f"file:{TMDB_DB_PATH}?mode=ro",))
+        self.batch_sql = CATALOG_BATCH_SQL if catalog_exists(self.conn) else BATCH_SQL
+        self.data = sqlite3.connect(DATA_DB_PATH, check_same_thread=False)
+        self.data.execute("PRAGMA journal_mode = WAL;")
+        ensure_details_schema(self.data)
+        self.data.commit()
+
+    def close(self):
+        for conn in (self.conn, self.data):
+            if conn: conn.close()
+        self.conn = self.data = None
+
+    def __call__(self, target_tmdb_ids):
+        if not target_tmdb_ids: return
+        t0 = time.perf_counter()
+        placeholders = ','.join('?' * len(target_tmdb_ids))
+        rows = self.conn.execute(self.batch_sql.format(placeholders=placeholders), tuple(target_tmdb_ids)).fetchall()
+        t1 = time.perf_counter()
+        to_insert = []
+        for magnet, stored_hash, title, size_str, size_bytes, runtime in rows:
+            info_hash = info_hash_of(magnet, stored_hash)
+            if not info_hash: continue
+            to_insert.append(details_row(info_hash, title, size_str, runtime, size_bytes=size_bytes))
+        t2 = time.perf_counter()
+        if to_insert:
+            self.data.executemany(DETAILS_INSERT_SQL, to_insert)
+            self.data.commit()
+        t3 = time.perf_counter()
+
+        totals = self.totals
+        totals['batches'] += 1
+        totals['torrents'] += len(to_insert)
+        totals['select'] += t1 - t0
+        totals['parse'] += t2 - t1
+        totals['write'] += t3 - t2
+        logger.info(f"[META] {len(target_tmdb_ids)} фильмов, {len(to_insert)} раздач: выборка {(t1 - t0) * 1000:.0f} мс, "
+                    f"разбор {(t2 - t1) * 1000:.0f} мс, запись {(t3 - t2) * 1000:.0f} мс")
+
+    def report(self):
+        t = self.totals
+        return (f"[META] Итого: {t['batches']} пачек, {t['torrents']} раздач; выборка {t['select']:.1f} с, "
+                f"разбор {t['parse']:.1f} с, запись {t['write']:.1f} с")
+
+# --- КОНВЕЙЕР ---
+class RestartGate:
+    """
+    Перезапуск браузера без барьера пачек: когда watchdog видит, что RSS браузера
+    превысил порог, новые вкладки ждут, пока текущие доработают, затем браузер пересоздается.
+    """
+    def __init__(self, parser, watchdog):
+        self.parser = parser
+        self.watchdog = watchdog
+        self.inflight = 0
+        self.open = asyncio.Event()
+        self.open.set()
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    async def enter(self):
+        while True:
+            await self.open.wait()
+            if self.watchdog.due(self.parser.processed_count):
+                self.open.clear()
+                try:
+                    await self.idle.wait()
+                    await self.watchdog.recycle(self.parser, self.parser.processed_count)
+                    self.parser.processed_count = 0
+                finally:
+                    self.open.set()
+                continue
+            break
+        self.inflight += 1
+        self.idle.clear()
+
+    def leave(self):
+        self.inflight -= 1
+        if self.inflight == 0:
+            self.idle.set()
+
+async def init_torrents_db(db):
+    await db.execute("PRAGMA journal_mode = WAL;")
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS torrents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tmdb_id INTEGER,
+            torrent_title TEXT,
+            magnet TEXT,
+            seeders INTEGER,
+            leechers INTEGER,
+            size TEXT,
+            url TEXT, 
+            parsed_at DATETIME DEFAULT CURRENT_TIMESTAMP
         )
-        self.context = await self.browser.new_context(viewport={'width': 1920, 'height': 1080})
-        await self.context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-
-    def filter_by_year(self, torrents, target_year):
-        if not target_year: return torrents
-        valid_items = []
-        year_pattern = re.compile(r'\b((?:19|20)\d{2})\b')
-        allowed_years = {target_year - 1, target_year, target_year + 1}
-        
-        for t in torrents:
-            title = t['torrent_title']
-            found_years = [int(y) for y in year_pattern.findall(title)]
-            if not found_years:
-                valid_items.append(t)
-            else:
-                if any(y in allowed_years for y in found_years):
-                    valid_items.append(t)
-        return valid_items
-
-    async def parse_movie(self, tmdb_id: int, search_query: str, target_year: int) -> dict:
-        async with self.semaphore:
-            page = await self.context.new_page()
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_tmdb_id ON torrents(tmdb_id)")
+    await ensure_size_column(db)
+    await ensure_info_hash_column(db)
+    await ensure_tracker_sets(db)
+    await db.commit()
+
+async def save_results(db, tmdb_db, results):
+    """
+    Групповая запись: дифф раздач + updated_at и журнал промахов одним коммитом на базу.
+    Возвращает (id фильмов для перепарсинга метаданных, кол-во раздач, MergeStats).
+    """
+
+    # 1. Слияние по info_hash (только для тех, где что-то нашли: пустой ответ старые раздачи не трогает)
+    found_results = [r for r in results if r['torrents']]
+    merge_stats, changed_ids = await merge_torrents(db, found_results)
+    # Коммит и без новых раздач: в транзакции могут быть отметки журнала
+    await db.commit()
+
+    # 2. Обновление даты проверки в items_minimal для ВСЕХ проверенных (даже если пусто)
+    # Это важно, чтобы при следующем запуске они ушли в конец очереди.
+    # Пустой ответ — промах: следующая проверка откладывается (miss_ledger.py)
+    await record_checks(tmdb_db, results)
+    await tmdb_db.commit()
+    return list(changed_ids), sum(len(r['torrents']) for r in found_results), merge_stats
+
+async def scrape(parser, queue, emit, workers=MAX_CONCURRENT_TABS, rss_limit=BROWSER_RSS_LIMIT_MB, deadline=None):
+    """
+    Продюсер -> N воркеров. Каждая готовая пара (фильм, результат) сразу уходит в emit,
+    медленная вкладка занимает только свой слот. deadline (time.time()) — конец бюджета:
+    новые фильмы больше не выдаются, начатые дорабатывают.
+    """
+    scrape_q = asyncio.Queue(maxsize=QUEUE_SIZE)
+    watchdog = MemoryWatchdog(rss_limit)
+    gate = RestartGate(parser, watchdog)
+
+    async def producer():
+        for m in queue:
+            if deadline and time.time() >= deadline: break
+            await scrape_q.put(m)
+        for _ in range(workers):
+            await scrape_q.put(None)
+
+    expired = False
+
+    async def worker():
+        nonlocal expired
+        while True:
+            m = await scrape_q.get()
+            if m is None: break
+            if deadline and time.time() >= deadline:
+                # Буфер очереди тоже не дорабатываем: эти фильмы останутся pending в журнале
+                if not expired:
+                    expired = True
+                    logger.info("⏰ Бюджет времени исчерпан: новые фильмы не берутся, начатые дорабатывают")
+                continue
+            await gate.enter()
             try:
-                try:
-                    await page.goto('https://jacred.xyz', wait_until='domcontentloaded', timeout=15000)
-                except: pass 
+                res = await parser.parse_movie(m['id'], m['query'], m['year'])
+            finally:
+                gate.leave()
+            await emit((m, res))
 
+    worker_tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    try:
+        await producer()
+        await asyncio.gather(*worker_tasks)
+    finally:
+        for task in worker_tasks:
+            task.cancel()
+        await asyncio.gather(*worker_tasks, return_exceptions=True)
+        logger.info(watchdog.report())
+
+async def run_pipeline(source, db, tmdb_db, pbar, journal=None):
+    """
+    source -> писатель -> метаданные, связанные ограниченными очередями.
+    source(emit) — корутина, отдающая пары (фильм, результат): локальный scrape()
+    или сборщик результатов шардов. Запись и парсинг метаданных идут параллельно
+    со скрапингом. Возвращает число найденных раздач.
+    """
+    write_q = asyncio.Queue(maxsize=QUEUE_SIZE)
+    meta_q = asyncio.Queue(maxsize=META_QUEUE_SIZE)
+    stats = {'new': 0, 'written': 0, 'started': time.monotonic()}
+    merge_total = MergeStats()
+    local_parser = LocalParser()
+    await asyncio.to_thread(local_parser.open)
+
+    async def writer():
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            item = await write_q.get()
+            if item is None: break
+            batch = [item]
+            # Копим до BATCH_SIZE фильмов, но не дольше WRITE_INTERVAL
+            deadline = loop.time() + WRITE_INTERVAL
+            while len(batch) < BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0: break
                 try:
-                    search_input = await page.wait_for_selector('input[type="text"]', state='visible', timeout=15000)
-                    await search_input.click()
-                    await search_input.fill("") 
-                    await search_input.type(search_query, delay=10) 
-                    
-                    search_button = page.locator('button', has_text="НАЙТИ").first
-                    if await search_button.is_visible():
-                        await search_button.click()
-                    else:
-                        await search_input.press('Enter')
-
-                    try:
-                        await page.wait_for_selector('a[href^="magnet:"]', timeout=20000)
-                        await page.wait_for_timeout(2000)
-                    except: 
-                        pass
-                except Exception:
-                    return {'tmdb_id': tmdb_id, 'torrents': []}
-
-                # JS Parsing
-                raw_torrents = await page.evaluate('''() => {
-                    const results = [];
-                    // 1. Находим ВСЕ магниты
-                    const allMagnets = Array.from(document.querySelectorAll('a[href^="magnet:"]'));
-                    
-                    // 2. Берем только первые 50 (или меньше, если их нет столько)
-                    const top50 = allMagnets.slice(0, 50);
-
-                    top50.forEach(magnetLink => {
-                        let container = magnetLink.parentElement;
-                        let found = false;
-                        for (let i = 0; i < 5; i++) {
-                            if (!container) break;
-                            const titleLink = container.querySelector('a:not([href^="magnet:"])');
-                            if (titleLink && titleLink.innerText.length > 2) {
-                                found = true;
-                                break;
-                            }
-                            container = container.parentElement;
-                        }
-                        if (!found || !container) return;
-
-                        const magnet = magnetLink.href;
-                        const linkEls = Array.from(container.querySelectorAll('a'));
-                        const titleLink = linkEls.find(a => !a.href.startsWith('magnet:') && a.innerText.trim().length > 1);
-                        const title = titleLink ? titleLink.innerText.trim() : container.innerText.split('\\n')[0];
-
-                        let size = "0 MB";
-                        const sizeMatch = container.innerText.match(/(\\d+(\\.\\d+)?)\\s*(GB|MB|ГБ|МБ|TB|ТБ)/i);
-                        if (sizeMatch) size = sizeMatch[0];
-
-                        let seeders = 0, leechers = 0;
-                        const text = container.innerText;
-                        const sM = text.match(/(?:↑|⬆)\\s*(\\d+)/);
-                        const lM = text.match(/(?:↓|⬇)\\s*(\\d+)/);
-                        if (sM) seeders = parseInt(sM[1]);
-                        if (lM) leechers = parseInt(lM[1]);
-
-                        results.push({ 
-                            torrent_title: title, 
-                            magnet: magnet, 
-                            seeders: seeders, 
-                            leechers: leechers, 
-                            size: size 
-                        });
-                    });
-                    return results;
-                }''')
-                
-                filtered_torrents = self.filter_by_year(raw_torrents, target_year)
-                return {'tmdb_id': tmdb_id, 'torrents': filtered_torrents}
-
-            except Exception:
-                return {'tmdb_id': tmdb_id, 'torrents': []}
-            finally:
-                await page.close()
-                self.processed_count += 1
-
-# --- ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ---
-def parse_size_to_bytes(size_str):
-    if not size_str: return 0
-    match = re.search(r'(\d+(\.\d+)?)\s*(GB|MB|KB|TB|ГБ|МБ|КБ|ТБ)', str(size_str), re.IGNORECASE)
-    if not match: return 0
-    val = float(match.group(1))
-    unit = match.group(3).upper().replace('ГБ','GB').replace('МБ','MB').replace('ТБ','TB').replace('КБ','KB')
-    if unit == 'TB': val *= 1024**4
-    elif unit == 'GB': val *= 1024**3
-    elif unit == 'MB': val *= 1024**2
-    elif unit == 'KB': val *= 1024
-    return int(val)
-
-def calculate_bitrate(size_bytes, runtime_minutes):
-    if not size_bytes or not runtime_minutes or runtime_minutes <= 0: return None
-    size_bits = size_bytes * 8
-    seconds = runtime_minutes * 60
-    mbps = (size_bits / seconds) / 1_000_000
-    return round(mbps, 2)
-
-def analyze_title(title):
-    if not title: return {}
-    found_tags = set()
-    result = {'resolution': 'N/A', 'audio_tags': [], 'quality_tags': [], 'hdr_type': 'SDR', 'codec': None}
-    for key, config in REGEX_CONFIG.items():
-        matches = config['pattern'].finditer(title)
-        for match in matches:
-            content = match.group(0)
-            if key == 'subtitles':
-                inner = match.group(1)
-                subs = re.split(r'[,+]', inner)
-                for s in subs:
-                    clean_tag = f"Sub: {s.strip()}"
-                    if 'rus' in s.lower(): clean_tag = "Sub: Rus"
-                    elif 'eng' in s.lower(): clean_tag = "Sub: Eng"
-                    if clean_tag.lower() not in found_tags:
-                        found_tags.add(clean_tag.lower())
-                        result['audio_tags'].append(clean_tag)
-                continue
-            clean_content = content.strip()
-            if clean_content.lower() in found_tags: continue
-            found_tags.add(clean_content.lower())
-            if config['type'] == 'resolution': result['resolution'] = clean_content
-            elif config['type'] == 'quality': result['quality_tags'].append(clean_content)
-            elif config['type'] in ['audio_lang', 'audio_channels']: result['audio_tags'].append(clean_content)
-    res = result['resolution']
-    if res and res.lower() == '4k': result['resolution'] = '4K'
-    elif not res: result['resolution'] = 'N/A'
-    quality_combined = " ".join(result['quality_tags'])
-    if re.search(r'Dolby|DV', quality_combined, re.IGNORECASE): result['hdr_type'] = 'Dolby Vision'
-    elif re.search(r'HDR', quality_combined, re.IGNORECASE): result['hdr_type'] = 'HDR'
-    if re.search(r'x265|h265|hevc', title, re.IGNORECASE): result['codec'] = 'HEVC'
-    elif re.search(r'x264|h264|avc', title, re.IGNORECASE): result['codec'] = 'H.264'
-    return result
-
-def run_local_parsing(target_tmdb_ids):
-    if not target_tmdb_ids: return
-    # logger.info(f"⚡ Метаданные ({len(target_tmdb_ids)} шт)...")
-    runtime_map = {}
-    with sqlite3.connect(TMDB_DB_PATH) as conn:
-        for r in conn.execute("SELECT id, runtime FROM items_minimal WHERE runtime IS NOT NULL"):
-            runtime_map[r[0]] = r[1]
-    conn_torrents = sqlite3.connect(TORRENTS_DB_PATH)
-    conn_data = sqlite3.connect(DATA_DB_PATH)
-    conn_data.execute("PRAGMA journal_mode = WAL;") 
-    conn_data.execute("""CREATE TABLE IF NOT EXISTS torrent_details (
-        info_hash TEXT PRIMARY KEY, resolution TEXT, size INTEGER, files TEXT, 
-        hdr_type TEXT, file_type TEXT, codec TEXT, bitrate REAL, audio TEXT
-    )""")
-    placeholders = ','.join('?' * len(target_tmdb_ids))
-    cursor = conn_torrents.execute(f"SELECT magnet, torrent_title, size, tmdb_id FROM torrents WHERE tmdb_id IN ({placeholders})", tuple(target_tmdb_ids))
-    to_insert = []
-    for row in cursor:
-        magnet, title, size_str, tmdb_id = row
-        hm = re.search(r'btih:([a-zA-Z0-9]{40})', magnet)
-        if not hm: continue
-        info_hash = hm.group(1).upper()
-        meta = analyze_title(title or "")
-        size_bytes = parse_size_to_bytes(size_str)
-        bitrate = calculate_bitrate(size_bytes, runtime_map.get(tmdb_id, 0))
-        audio_str = " | ".join(meta['audio_tags'])
-        to_insert.append((info_hash, meta['resolution'], size_bytes, json.dumps(['(title_parse)']), meta['hdr_type'], 'mkv', meta['codec'], bitrate, audio_str))
-    if to_insert:
-        conn_data.executemany("INSERT OR REPLACE INTO torrent_details (info_hash, resolution, size, files, hdr_type, file_type, codec, bitrate, audio) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", to_insert)
-        conn_data.commit()
-    conn_torrents.close()
-    conn_data.close()
+                    item = await asyncio.wait_for(write_q.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+
+            if journal:
+                await journal.mark(batch)
+            found_ids, found, merge_stats = await save_results(db, tmdb_db, [res for _, res in batch])
+            merge_total.add(merge_stats)
+            logger.info(f"[MERGE] {len(batch)} фильмов: {merge_stats.line()}")
+            stats['new'] += found
+            stats['written'] += len(batch)
+            pbar.update(len(batch))
+            if found_ids:
+                await meta_q.put(found_ids)
+
+            elapsed = time.monotonic() - stats['started']
+            logger.debug(
+                f"[PIPE] {stats['written'] / elapsed:.2f} фильм/с | очереди: "
+                f"write={write_q.qsize()} meta={meta_q.qsize()}"
+            )
+
+    async def metadata():
+        while True:
+            ids = await meta_q.get()
+            if ids is None: break
+            # Пока шел прошлый проход, могли накопиться еще пачки — обрабатываем их разом
+            finished = False
+            while not meta_q.empty():
+                more = meta_q.get_nowait()
+                if more is None:
+                    finished = True
+                    break
+                ids.extend(more)
+            try:
+                await asyncio.to_thread(local_parser, ids)
+            except Exception as e:
+                logger.error(f"Ошибка локального парсинга: {e}")
+            if finished: break
+
+    writer_task = asyncio.create_task(writer())
+    meta_task = asyncio.create_task(metadata())
+    try:
+        await source(write_q.put)
+        await write_q.put(None)
+        await writer_task
+        await meta_q.put(None)
+        await meta_task
+    finally:
+        tasks = [writer_task, meta_task]
+        for task in tasks:
+            task.cancel()
+        # Дожидаемся отмены, чтобы писатель не тронул уже закрытую базу
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if merge_total.legacy_writes:
+            logger.info(f"[MERGE] Итого: {merge_total.line()}")
+        if local_parser.totals['batches']:
+            logger.info(local_parser.report())
+        local_parser.close()
+    return stats['new']
+
+# --- ШАРДЫ ---
+def shard_process(shard_id, items, engine, base_url, tabs, adaptive, rss_limit, deadline, out_q):
+    """Процесс-шард: свой движок и event loop, результаты — в общую очередь писателя"""
+    async def run():
+        parser = create_parser(engine, tabs, base_url, adaptive)
+        await parser.start()
+        loop = asyncio.get_running_loop()
+
+        async def emit(item):
+            # Блокирующий put в ограниченную очередь = обратное давление от писателя
+            await loop.run_in_executor(None, out_q.put, item)
+
+        try:
+            await scrape(parser, items, emit, tabs, rss_limit, deadline)
+        finally:
+            await parser.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        out_q.put((SHARD_DONE, shard_id))
+
+async def collect_shards(procs, out_q, emit):
+    """
+    Источник для run_pipeline: сливает результаты всех шардов и печатает общую скорость.
+    Возвращает номера шардов, упавших без маркера завершения.
+    """
+    loop = asyncio.get_running_loop()
+    alive = set(range(len(procs)))
+    crashed = []
+    counts = [0] * len(procs)
+    started = last_report = time.monotonic()
+
+    while alive:
+        try:
+            item = await loop.run_in_executor(None, out_q.get, True, 1.0)
+        except queue_lib.Empty:
+            # Шард, упавший без маркера завершения, больше ничего не пришлет
+            for k in list(alive):
+                if not procs[k].is_alive() and procs[k].exitcode != 0:
+                    logger.error(f"[SHARDS] Шард {k} завершился с кодом {procs[k].exitcode}")
+                    alive.discard(k)
+                    crashed.append(k)
+            continue
+
+        if item[0] == SHARD_DONE:
+            alive.discard(item[1])
+            continue
+
+        counts[item[0]['id'] % len(procs)] += 1
+        await emit(item)
+
+        now = time.monotonic()
+        if now - last_report >= SHARD_REPORT_EVERY:
+            last_report = now
+            total = sum(counts)
+            logger.info(
+                f"[SHARDS] {total / (now - started):.2f} фильм/с суммарно | "
+                f"по шардам: {' '.join(str(c) for c in counts)}"
+            )
+
+    elapsed = time.monotonic() - started
+    if elapsed > 0:
+        logger.info(f"[SHARDS] Итог: {sum(counts)} фильмов, {sum(counts) / elapsed:.2f} фильм/с на {len(procs)} процессах")
+    return crashed
+
+async def run_sharded(args, queue, db, tmdb_db, pbar, journal, deadline=None):
+    """Запускает N процессов по срезам tmdb_id % N; пишет в SQLite только этот процесс"""
+    tabs = args.tabs or max(1, math.ceil(MAX_CONCURRENT_TABS / args.shards))
+    # spawn, а не fork: форк из работающего event loop с живыми потоками может унаследовать захваченные блокировки
+    ctx = mp.get_context('spawn')
+    out_q = ctx.Queue(maxsize=QUEUE_SIZE * args.shards)
+    procs = []
+    for k in range(args.shards):
+        items = [m for m in queue if m['id'] % args.shards == k]
+        proc = ctx.Process(target=shard_process, args=(k, items, args.engine, args.base_url, tabs, args.adaptive, args.rss_limit, deadline, out_q))
+        proc.start()
+        procs.append(proc)
+    logger.info(f"🧩 Запущено шардов: {args.shards} × {tabs} вкладок")
+
+    crashed = []
+
+    async def source(emit):
+        crashed.extend(await collect_shards(procs, out_q, emit))
+
+    try:
+        total_new = await run_pipeline(source, db, tmdb_db, pbar, journal)
+        if crashed:
+            logger.error(f"[SHARDS] Упавшие шарды: {crashed} — их фильмы остались в журнале, продолжите через --resume")
+        return total_new
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
 
 # --- MAIN ---
-async def main():
-    logger.info(f"🌍 ЗАПУСК ГЛОБАЛЬНОГО ОБНОВЛЕНИЯ БАЗЫ (ВСЕ ФИЛЬМЫ)")
-    
+async def load_queue(order='freshness', due_only=True):
+    """
+    План полного прохода. freshness — по оценке планировщика свежести (freshness.py),
+    age — все фильмы, давно не обновлявшиеся — первыми.
+    due_only — без фильмов, чья следующая проверка по журналу промахов еще не наступила.
+    """
+    if order == 'freshness':
+        logger.info("Оценка фильмов планировщиком свежести...")
+        queue, summary = await asyncio.to_thread(plan_queue, TMDB_DB_PATH, TORRENTS_DB_PATH, due_only=due_only)
+        logger.info(summary_line(summary))
+        return queue
+
     async with aiosqlite.connect(TMDB_DB_PATH) as db:
         # Сортировка по updated_at ASC (старые первыми)
         # NULL идет первым (никогда не обновлялись)
         logger.info("Загрузка списка фильмов (это может занять время)...")
-        async with db.execute("""
+        async with db.execute(f"""
             SELECT id, title, kp_id, year 
             FROM items_minimal 
+            {'WHERE ' + DUE_SQL if due_only else ''}
             ORDER BY updated_at ASC
         """) as cursor:
             movies = await cursor.fetchall()
-            
-    if not movies:
-        logger.info("База пуста.")
-        return
 
     logger.info(f"Всего фильмов в базе: {len(movies)}")
     
@@ -354,105 +484,104 @@ async def main():
         elif title: search_query = title
         else: continue 
         
-        queue.append({'id': tmdb_id, 'query': search_query, 'year': year})
-
-    parser = JacredParser(max_concurrent=MAX_CONCURRENT_TABS)
-    await parser.start()
-    
-    processed_tmdb_ids = set() 
-    total_new = 0
+        queue.append({'seq': len(queue), 'id': tmdb_id, 'query': search_query, 'year': year})
+    return queue
 
+async def main(args):
     async with aiosqlite.connect(TORRENTS_DB_PATH) as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS torrents (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                tmdb_id INTEGER,
-                torrent_title TEXT,
-                magnet TEXT,
-                seeders INTEGER,
-                leechers INTEGER,
-                size TEXT,
-                url TEXT, 
-                parsed_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_tmdb_id ON torrents(tmdb_id)")
-        await db.commit()
-
-        with tqdm(total=len(queue), desc="Global Update", unit="mov") as pbar:
-            for i in range(0, len(queue), BATCH_SIZE):
-                batch = queue[i : i + BATCH_SIZE]
-                
-                # Проверка на перезапуск браузера
-                if parser.processed_count > RESTART_BROWSER_EVERY:
-                    await parser.restart()
-                    parser.processed_count = 0
-
-                tasks = [parser.parse_movie(m['id'], m['query'], m['year']) for m in batch]
-                results = await asyncio.gather(*tasks)
-                
-                insert_batch = []
-                delete_ids = []
-                
-                # Дата обновления для всей пачки
-                current_date = datetime.now().strftime('%Y-%m-%d')
-                all_batch_ids = [r['tmdb_id'] for r in results]
-
-                for res in results:
-                    t_id = res['tmdb_id']
-                    
-                    if res['torrents']:
-                        # Если нашли новые - удаляем старые и пишем новые
-                        delete_ids.append(t_id)
-                        processed_tmdb_ids.add(t_id)
-                        total_new += len(res['torrents'])
-                        
-                        for t in res['torrents']:
-                            insert_batch.append((
-                                t_id, 
-                                t['torrent_title'], 
-                                t['magnet'], 
-                                t['seeders'], 
-                                t['leechers'], 
-                                t['size']
-                            ))
-                
-                # 1. Запись торрентов (только для тех, где нашли новое)
-                if insert_batch:
-                    placeholders = ','.join('?' * len(delete_ids))
-                    await db.execute(f"DELETE FROM torrents WHERE tmdb_id IN ({placeholders})", tuple(delete_ids))
-                    await db.executemany("""
-                        INSERT INTO torrents (tmdb_id, torrent_title, magnet, seeders, leechers, size) 
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, insert_batch)
-                    await db.commit()
-                
-                # 2. Обновление даты проверки в items_minimal для ВСЕХ проверенных (даже если пусто)
-                # Это важно, чтобы при следующем запуске они ушли в конец очереди
-                async with aiosqlite.connect(TMDB_DB_PATH) as tmdb_db:
-                    placeholders_all = ','.join('?' * len(all_batch_ids))
-                    params = [current_date] + all_batch_ids
-                    await tmdb_db.execute(
-                        f"UPDATE items_minimal SET updated_at = ? WHERE id IN ({placeholders_all})",
-                        tuple(params)
-                    )
-                    await tmdb_db.commit()
-
-                pbar.update(len(batch))
-                
-                # Локальный парсинг пачками (чтобы не копить 52к ID)
-                if processed_tmdb_ids:
-                    try:
-                        run_local_parsing(list(processed_tmdb_ids))
-                        processed_tmdb_ids.clear()
-                    except Exception:
-                        pass
-
-    await parser.stop()
+        await init_torrents_db(db)
+        journal = RunJournal(db)
+        await journal.init()
+
+        if args.runs:
+            await print_runs(db)
+            return
+
+        if args.resume:
+            run_id = await journal.last_unfinished() if args.resume == 'last' else int(args.resume)
+            if not run_id:
+                logger.info("Незавершенных прогонов нет.")
+                return
+            queue = await journal.resume(run_id)
+            logger.info(f"♻️ Продолжение прогона #{run_id}. Осталось фильмов: {len(queue)}")
+        else:
+            logger.info(f"🌍 ЗАПУСК ГЛОБАЛЬНОГО ОБНОВЛЕНИЯ БАЗЫ (ВСЕ ФИЛЬМЫ). Движок: {args.engine}")
+            async with aiosqlite.connect(TMDB_DB_PATH) as tmdb_db:
+                await ensure_columns(tmdb_db)
+                skipped = 0 if args.ignore_backoff else await count_backed_off(tmdb_db)
+            queue = await load_queue(args.order, due_only=not args.ignore_backoff)
+            if skipped:
+                logger.info(f"💤 Пропущено по журналу промахов (проверка еще не наступила): {skipped}")
+            if not queue:
+                logger.info("База пуста.")
+                return
+            engine_label = f"{args.engine}/{args.shards}" if args.shards > 1 else args.engine
+            run_id = await journal.create(queue, engine_label, skipped)
+            logger.info(f"📝 Прогон #{run_id} записан в журнал.")
+
+        deadline = None
+        if args.budget:
+            deadline = time.time() + args.budget * 3600
+            speed = await journal.recent_speed()
+            estimate = f" ≈ {int(speed * args.budget * 3600)} фильмов при {speed:.2f} фильм/с (по журналу)" if speed else ""
+            logger.info(f"⏳ Бюджет {args.budget:g} ч{estimate}, в плане {len(queue)}")
+
+        total_new = 0
+        status = 'interrupted'
+        try:
+            async with aiosqlite.connect(TMDB_DB_PATH) as tmdb_db:
+                with tqdm(total=len(queue), desc="Global Update", unit="mov") as pbar:
+                    if args.shards > 1:
+                        total_new = await run_sharded(args, queue, db, tmdb_db, pbar, journal, deadline)
+                    else:
+                        tabs = args.tabs or MAX_CONCURRENT_TABS
+                        parser = create_parser(args.engine, tabs, args.base_url, args.adaptive)
+                        await parser.start()
+                        try:
+                            total_new = await run_pipeline(
+                                lambda emit: scrape(parser, queue, emit, tabs, args.rss_limit, deadline), db, tmdb_db, pbar, journal
+                            )
+                        finally:
+                            await parser.stop()
+            # Прогон, остановленный бюджетом, не продолжается через --resume: завтра план пересчитается.
+            # Недоделанный без бюджета (упавший шард) — остается 'interrupted' и доступен для --resume.
+            if journal.session_processed >= len(queue):
+                status = 'done'
+            elif deadline and time.time() >= deadline:
+                status = 'budget'
+        finally:
+            saved = await journal.finish(status)
+            if saved:
+                logger.info(f"💤 Журнал промахов сэкономил ≈ {saved / 60:.1f} мин скрапинга (по скорости прогона)")
     logger.info(f"✅ Глобальное обновление завершено. Найдено новых раздач: {total_new}")
 
+def parse_args():
+    ap = argparse.ArgumentParser(description="Глобальное обновление торрентов для всех фильмов")
+    ap.add_argument('--engine', choices=['browser', 'http'], default=ENGINE,
+                    help="browser — Playwright по HTML, http — прямые запросы к JSON поиску")
+    ap.add_argument('--base-url', default=JACRED_URL,
+                    help="Адрес трекера (например, локальный jacred_fixture_server.py)")
+    ap.add_argument('--resume', nargs='?', const='last', default=None, metavar='RUN_ID',
+                    help="Продолжить прерванный прогон (по умолчанию — последний незавершенный)")
+    ap.add_argument('--runs', action='store_true', help="Показать журнал прогонов и выйти")
+    ap.add_argument('--shards', type=int, default=1,
+                    help="Число процессов-скраперов (срезы tmdb_id %% N), запись остается в одном процессе")
+    ap.add_argument('--tabs', type=int, default=None,
+                    help="Вкладок/запросов на процесс (по умолчанию MAX_CONCURRENT_TABS, делится между шардами)")
+    ap.add_argument('--adaptive', action='store_true',
+                    help="AIMD: подбирать число вкладок по p95, таймаутам и свободной RAM (--tabs — потолок)")
+    ap.add_argument('--order', choices=['freshness', 'age'], default='freshness',
+                    help="freshness — по вероятности изменений и ценности фильма, age — по updated_at ASC")
+    ap.add_argument('--budget', type=float, default=None, metavar='HOURS',
+                    help="Бюджет времени (ночное окно): после него новые фильмы не берутся")
+    ap.add_argument('--ignore-backoff', action='store_true',
+                    help="Проверить и фильмы, отложенные журналом промахов (next_check в будущем)")
+    ap.add_argument('--rss-limit', type=int, default=BROWSER_RSS_LIMIT_MB, metavar='MB',
+                    help="Порог RSS дерева процессов браузера (на процесс/шард), выше — плавный перезапуск")
+    return ap.parse_args()
+
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(main(parse_args()))
     except KeyboardInterrupt:
         print("\nПрервано.")
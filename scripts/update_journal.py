@@ -0,0 +1,163 @@
+import time
+
+# --- ЖУРНАЛ ПРОГОНОВ ---
+# Таблицы живут в torrents.db рядом с torrents: отметка "фильм обработан"
+# коммитится в той же транзакции, что и его раздачи, поэтому после падения
+# журнал никогда не опережает и не отстает от данных.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS update_runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    finished_at DATETIME,
+    status TEXT DEFAULT 'running',      -- running | interrupted | budget | done
+    engine TEXT,
+    planned INTEGER DEFAULT 0,
+    processed INTEGER DEFAULT 0,
+    found_torrents INTEGER DEFAULT 0,
+    sessions INTEGER DEFAULT 0,
+    elapsed_sec REAL DEFAULT 0,
+    movies_per_sec REAL,
+    skipped INTEGER DEFAULT 0,          -- отложено журналом промахов при планировании
+    saved_sec REAL                      -- оценка сэкономленного времени скрапинга
+);
+CREATE TABLE IF NOT EXISTS update_run_items (
+    run_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,               -- позиция в исходной очереди
+    tmdb_id INTEGER NOT NULL,
+    query TEXT,
+    year INTEGER,
+    status TEXT DEFAULT 'pending',      -- pending | found | empty
+    torrents INTEGER,
+    done_at DATETIME,
+    PRIMARY KEY (run_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_run_items_pending ON update_run_items(run_id, seq) WHERE status = 'pending';
+"""
+
+class RunJournal:
+    """Журнал глобального обновления: план, статус каждого фильма и статистика прогона"""
+    def __init__(self, db):
+        self.db = db
+        self.run_id = None
+        self.session_started = None
+        self.session_processed = 0
+        self.session_found = 0
+
+    async def init(self):
+        await self.db.executescript(SCHEMA)
+        # Журналы, созданные до колонок skipped/saved_sec
+        async with self.db.execute("PRAGMA table_info(update_runs)") as cursor:
+            columns = {row[1] for row in await cursor.fetchall()}
+        for name, decl in (('skipped', 'INTEGER DEFAULT 0'), ('saved_sec', 'REAL')):
+            if name not in columns:
+                await self.db.execute(f"ALTER TABLE update_runs ADD COLUMN {name} {decl}")
+        await self.db.commit()
+
+    async def create(self, queue, engine, skipped=0):
+        """Новый прогон: весь план одной транзакцией"""
+        cursor = await self.db.execute(
+            "INSERT INTO update_runs (engine, planned, skipped) VALUES (?, ?, ?)", (engine, len(queue), skipped)
+        )
+        self.run_id = cursor.lastrowid
+        await self.db.executemany(
+            "INSERT INTO update_run_items (run_id, seq, tmdb_id, query, year) VALUES (?, ?, ?, ?, ?)",
+            [(self.run_id, m['seq'], m['id'], m['query'], m['year']) for m in queue]
+        )
+        await self.db.commit()
+        self._start_session()
+        return self.run_id
+
+    async def last_unfinished(self):
+        async with self.db.execute(
+            "SELECT run_id FROM update_runs WHERE status IN ('running', 'interrupted') ORDER BY run_id DESC LIMIT 1"
+        ) as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def resume(self, run_id):
+        """Очередь из необработанных фильмов прогона — O(оставшихся) по частичному индексу"""
+        self.run_id = run_id
+        async with self.db.execute(
+            "SELECT seq, tmdb_id, query, year FROM update_run_items INDEXED BY idx_run_items_pending "
+            "WHERE run_id = ? AND status = 'pending' ORDER BY seq", (run_id,)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        await self.db.execute("UPDATE update_runs SET status = 'running' WHERE run_id = ?", (run_id,))
+        await self.db.commit()
+        self._start_session()
+        return [{'seq': r[0], 'id': r[1], 'query': r[2], 'year': r[3]} for r in rows]
+
+    async def recent_speed(self, limit=5):
+        """Средняя скорость (фильм/с) последних прогонов — для оценки, сколько влезет в бюджет"""
+        async with self.db.execute(
+            "SELECT AVG(movies_per_sec) FROM (SELECT movies_per_sec FROM update_runs "
+            "WHERE movies_per_sec > 0 ORDER BY run_id DESC LIMIT ?)", (limit,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else None
+
+    def _start_session(self):
+        self.session_started = time.monotonic()
+        self.session_processed = 0
+        self.session_found = 0
+
+    async def mark(self, batch):
+        """Отметить пачку (m, res) обработанной. Без коммита — его делает писатель вместе с раздачами."""
+        rows = []
+        for m, res in batch:
+            found = len(res['torrents'])
+            rows.append(('found' if found else 'empty', found, self.run_id, m['seq']))
+            self.session_processed += 1
+            self.session_found += found
+        await self.db.executemany(
+            "UPDATE update_run_items SET status = ?, torrents = ?, done_at = CURRENT_TIMESTAMP "
+            "WHERE run_id = ? AND seq = ?", rows
+        )
+
+    async def finish(self, status):
+        """
+        Закрыть сессию: накопить время и счетчики, пересчитать скорость прогона
+        и оценку сэкономленного (skipped × с/фильм). Возвращает эту оценку в секундах.
+        """
+        if self.run_id is None: return None
+        elapsed = time.monotonic() - self.session_started
+        await self.db.execute("""
+            UPDATE update_runs SET
+                status = ?,
+                finished_at = CASE WHEN ? = 'done' THEN CURRENT_TIMESTAMP ELSE finished_at END,
+                processed = processed + ?,
+                found_torrents = found_torrents + ?,
+                sessions = sessions + 1,
+                elapsed_sec = elapsed_sec + ?,
+                movies_per_sec = CASE WHEN elapsed_sec + ? > 0
+                    THEN ROUND((processed + ?) / (elapsed_sec + ?), 3) END,
+                saved_sec = CASE WHEN processed + ? > 0
+                    THEN ROUND(skipped * (elapsed_sec + ?) / (processed + ?), 1) END
+            WHERE run_id = ?
+        """, (status, status, self.session_processed, self.session_found, elapsed,
+              elapsed, self.session_processed, elapsed,
+              self.session_processed, elapsed, self.session_processed, self.run_id))
+        await self.db.commit()
+        async with self.db.execute("SELECT saved_sec FROM update_runs WHERE run_id = ?", (self.run_id,)) as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else None
+
+async def print_runs(db, limit=20):
+    """Таблица последних прогонов для сравнения скорости"""
+    async with db.execute("""
+        SELECT run_id, started_at, status, engine, planned, processed, found_torrents,
+               sessions, elapsed_sec, movies_per_sec, skipped, saved_sec
+        FROM update_runs ORDER BY run_id DESC LIMIT ?
+    """, (limit,)) as cursor:
+        rows = await cursor.fetchall()
+    if not rows:
+        print("Журнал пуст.")
+        return
+    print(f"{'run':>5}  {'старт':<19}  {'статус':<11} {'движок':<8}{'план':>8}{'готово':>8}"
+          f"{'раздач':>9}{'сесс':>6}{'часы':>7}{'фильм/с':>9}{'пропущ':>8}{'экон,ч':>8}")
+    for r in rows:
+        hours = (r[8] or 0) / 3600
+        speed = f"{r[9]:.2f}" if r[9] is not None else "-"
+        saved = f"{r[11] / 3600:.2f}" if r[11] is not None else "-"
+        print(f"{r[0]:>5}  {r[1]:<19}  {r[2]:<11} {r[3] or '-':<8}{r[4]:>8}{r[5]:>8}{r[6]:>9}{r[7]:>6}{hours:>7.2f}{speed:>9}"
+              f"{r[10] or 0:>8}{saved:>8}")
@@ -1,5 +1,7 @@
 import asyncio
 import logging
+import sys
+import time
 import aiosqlite
 from pathlib import Path
 from typing import List, Dict, Any
@@ -7,6 +9,14 @@ from playwright.async_api import async_playwright
 from tqdm import tqdm
 from datetime import datetime
 
+# Общие модули конвейера лежат в scripts/ (браузер, слияние раздач, схема torrents)
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+# Детектор готовности, экстрактор строк выдачи и RSS дерева процессов браузера —
+# те же, что у конвейера scripts/updat.py
+from browser_watchdog import tree_rss_mb as browser_rss_mb
+from jacred_browser import READY_INSTALL_JS, ROW_FIELDS, ROWS_EXTRACT_JS
+from torrent_merge import ensure_info_hash_column, ensure_size_column, ensure_tracker_sets, merge_torrents
+
 # ---------------- Конфигурация ----------------
 SOURCE_DB_PATH = Path("tmdb_data") / "tmdb_minimal_no_original.db"
 DEST_DB_PATH = Path("tmdb_data") / "torrents.db"
@@ -16,6 +26,15 @@ LOG_FILE = "updater_log.txt"
 MAX_CONCURRENT_TABS = 12 
 BATCH_SIZE = 20
 
+# Ожидание результатов: затишье DOM вместо 1500 мс паузы + networkidle (до 3 с)
+READY_SETTLE_MS = 400
+READY_EMPTY_SETTLE_MS = 1500
+READY_TIMEOUT_MS = 4500      # Потолок старого пути: 1500 + 3000
+LEGACY_WAIT_MS = 1500
+
+# Перезапуск браузера по памяти (между пачками, когда вкладок нет)
+BROWSER_RSS_LIMIT_MB = 2048
+
 # ---------------- Логирование ----------------
 logging.basicConfig(
     level=logging.INFO,
@@ -40,6 +59,9 @@ class JacredParser:
 
     async def start(self):
         self.playwright = await async_playwright().start()
+        await self.launch()
+
+    async def launch(self):
         self.browser = await self.playwright.chromium.launch(
             headless=self.headless,
             args=['--no-sandbox', '--disable-setuid-sandbox']
@@ -56,6 +78,12 @@ class JacredParser:
         if self.browser: await self.browser.close()
         if self.playwright: await self.playwright.stop()
 
+    async def restart(self):
+        """Новый браузер вместо разросшегося (Playwright остается)"""
+        if self.context: await self.context.close()
+        if self.browser: await self.browser.close()
+        await self.launch()
+
     async def parse_movie(self, tmdb_id: int, title_query: str, year: int = None, limit: int = 50) -> Dict[str, Any]:
         async with self.semaphore:
             page = await self.context.new_page()
@@ -73,87 +101,35 @@ class JacredParser:
                     await search_input.fill('') 
                     await search_input.type(search_query, delay=5) 
                     
+                    await page.evaluate(READY_INSTALL_JS, [READY_SETTLE_MS, READY_EMPTY_SETTLE_MS, READY_TIMEOUT_MS])
                     search_button = page.locator('button', has_text="НАЙТИ").first
                     if await search_button.is_visible():
                         await search_button.click()
                     else:
                         await search_input.press('Enter')
 
-                    await page.wait_for_timeout(1500)
                     try:
-                        await page.wait_for_load_state('networkidle', timeout=3000)
-                    except: pass
+                        ready = await page.evaluate("() => window.__jacredReady")
+                        # Экономия против нижней границы старого пути (без учета networkidle); дольше старой
+                        # паузы наблюдатель ждет, когда выдача еще дорисовывается — тогда экономии нет
+                        logger.debug(
+                            f"[READY] '{search_query}': {ready['status']} за {ready['waited']:.0f} мс, "
+                            f"сэкономлено ≥{max(0, LEGACY_WAIT_MS - ready['waited']):.0f} мс"
+                        )
+                    except Exception:
+                        # Поиск перезагрузил страницу — старый путь
+                        await page.wait_for_timeout(LEGACY_WAIT_MS)
+                        try:
+                            await page.wait_for_load_state('networkidle', timeout=3000)
+                        except: pass
 
                 except Exception as e:
                     logger.warning(f"Search interaction failed for '{search_query}': {e}")
                     return {'tmdb_id': tmdb_id, 'movie_name': title_query, 'torrents': []}
 
-                # JS Парсинг
-                torrents = await page.evaluate(f'''([limit, yearStr]) => {{
-                    const allDivs = Array.from(document.querySelectorAll('div'));
-                    
-                    const rows = allDivs.filter(div => {{
-                        const text = div.innerText || "";
-                        return text.includes("GB") || text.includes("ГБ") || text.includes("MB") || text.includes("МБ");
-                    }});
-
-                    const data = [];
-                    const processedMagnets = new Set();
-                    let count = 0;
-
-                    for (const el of rows) {{
-                        if (count >= limit) break;
-
-                        const magnetEl = el.querySelector('a[href^="magnet:"]');
-                        if (!magnetEl) continue;
-
-                        const magnet = magnetEl.href;
-                        if (processedMagnets.has(magnet)) continue;
-                        processedMagnets.add(magnet);
-
-                        const links = Array.from(el.querySelectorAll('a'));
-                        const sourceLink = links.find(a => !a.href.startsWith('magnet:') && a.innerText.trim().length > 0);
-                        
-                        let url = "";
-                        let title = "No Title";
-
-                        if (sourceLink) {{
-                            url = sourceLink.href;
-                            title = sourceLink.innerText.trim();
-                        }} else {{
-                            title = el.innerText.split('\\n')[0];
-                        }}
-
-                        // --- ЛОГИКА ФИЛЬТРАЦИИ ---
-                        // Если yearStr пустой (мы отключили фильтр), условие пропуска не сработает.
-                        if (yearStr && !title.includes(yearStr)) {{
-                             continue;
-                        }}
-
-                        const text = el.innerText;
-                        let size = "0 MB";
-                        const sizeMatch = text.match(/(\\d+(\\.\\d+)?)\\s*(GB|MB|ГБ|МБ|TB|ТБ)/i);
-                        if (sizeMatch) size = sizeMatch[0];
-
-                        let seeders = 0;
-                        let leechers = 0;
-                        const seedMatch = text.match(/(?:↑|⬆)\\s*(\\d+)/);
-                        const leechMatch = text.match(/(?:↓|⬇)\\s*(\\d+)/);
-                        if (seedMatch) seeders = parseInt(seedMatch[1]);
-                        if (leechMatch) leechers = parseInt(leechMatch[1]);
-
-                        data.push({{
-                            torrent_title: title,
-                            magnet: magnet,
-                            seeders: seeders,
-                            leechers: leechers,
-                            size: size,
-                            url: url
-                        }});
-                        count++;
-                    }}
-                    return data;
-                }}''', [limit, year_str_for_js])
+                # JS Парсинг: строки результатов одним проходом, компактными массивами
+                rows = await page.evaluate(ROWS_EXTRACT_JS, [limit, year_str_for_js])
+                torrents = [dict(zip(ROW_FIELDS, row)) for row in rows]
 
                 return {'tmdb_id': tmdb_id, 'movie_name': title_query, 'torrents': torrents}
 
@@ -181,45 +157,28 @@ async def init_dest_db():
             )
         """)
         await db.execute("CREATE INDEX IF NOT EXISTS idx_tmdb_id ON torrents(tmdb_id)")
+        # Размер в байтах, канонический info_hash и сжатые магнеты — как у scripts/updat.py
+        await ensure_size_column(db)
+        await ensure_info_hash_column(db)
+        await ensure_tracker_sets(db)
         await db.commit()
 
 async def update_results_batch(db_path, results_list):
+    """
+    Дифф по info_hash вместо DELETE + INSERT (scripts/torrent_merge.py): новые раздачи вставляются,
+    у старых обновляются только изменившиеся поля, удаляются только пропавшие.
+    Фильмы с пустым ответом пропускаются: их раздачи остаются как были.
+    """
     if not results_list: return
 
-    ids_to_clean = []
-    insert_data = []
-
-    for res in results_list:
-        t_id = res['tmdb_id']
-        torrents = res['torrents']
-        ids_to_clean.append(t_id)
-
-        if len(torrents) > 0:
-            for t in torrents:
-                insert_data.append((
-                    t_id, 
-                    t['torrent_title'], 
-                    t['magnet'], 
-                    t['seeders'], 
-                    t['leechers'], 
-                    t['size'], 
-                    t.get('url', '')
-                ))
-    
-    if ids_to_clean:
-        async with aiosqlite.connect(db_path) as db:
-            placeholders = ','.join('?' * len(ids_to_clean))
-            sql_delete = f"DELETE FROM torrents WHERE tmdb_id IN ({placeholders})"
-            await db.execute(sql_delete, tuple(ids_to_clean))
-            
-            if insert_data:
-                await db.executemany("""
-                    INSERT INTO torrents (tmdb_id, torrent_title, magnet, seeders, leechers, size, url)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, insert_data)
-            await db.commit()
-            
-            logger.info(f"[BATCH] Updated {len(ids_to_clean)} movies. Found {len(insert_data)} new torrents.")
+    # Пустой ответ (нет раздач или сбой поиска) старые раздачи не трогает
+    found_results = [res for res in results_list if res['torrents']]
+    async with aiosqlite.connect(db_path) as db:
+        stats, _ = await merge_torrents(db, found_results)
+        await db.commit()
+
+    found = sum(len(res['torrents']) for res in found_results)
+    logger.info(f"[BATCH] Updated {len(results_list)} movies. Found {found} torrents: {stats.line()}")
 
 # ---------------- Main ----------------
 
@@ -307,6 +266,17 @@ async def main():
                 res = await asyncio.gather(*tasks)
                 await update_results_batch(DEST_DB_PATH, res)
                 pbar.update(len(batch))
+
+                rss = browser_rss_mb()
+                if rss is not None and rss > BROWSER_RSS_LIMIT_MB:
+                    started = time.monotonic()
+                    await parser.restart()
+                    after = browser_rss_mb()
+                    logger.info(
+                        f"[WATCHDOG] Браузер перезапущен: RSS {rss:.0f} -> {after:.0f} МБ "
+                        f"(освобождено {rss - after:.0f} МБ, порог {BROWSER_RSS_LIMIT_MB} МБ), "
+                        f"за {time.monotonic() - started:.1f} с"
+                    )
     except KeyboardInterrupt:
         print("\nСкрипт остановлен пользователем.")
     finally: